@@ -5,6 +5,7 @@ Multi-Agent Grading System — Professional C Autograder
 Agents:
   - design_agent       → Code structure & quality            (15 pts)
   - test_agent         → Self-Oracle functional testing      (30 pts)
+                         (test_inputs: its input-generation step on its own)
   - performance_agent  → Runtime & complexity analysis       (15 pts)
   - optimization_agent → Memory & I/O best-practice checks  (20 pts)
 """
@@ -12,12 +13,16 @@ Agents:
 import re
 import json
 import logging
-import subprocess
-import time
 
-from config import TEST_TIMEOUT_SECONDS
+from config import OUTPUT_EXCERPT_CHARS, STAGE_ESTIMATES
 from llm import groq_generate_inputs
-from ast_generator import generate_inputs_from_ast  # NEW: Import AST generator
+from ast_generator import generate_inputs_from_ast, parse_method, ast_parse_stats
+from c_metrics import analyze_source
+from hotloops import analyze_hot_loops
+from runner import run_binary, excerpt
+from sandbox import limits_for
+from rubric import score_component
+from budget import Budget
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -60,23 +65,10 @@ def _parse_input_list(raw: str) -> list[str] | None:
 # ─────────────────────────────────────────────────────────────────────────────
 # INTERNAL HELPER — run the binary once with a given stdin input
 # ─────────────────────────────────────────────────────────────────────────────
-def _run_binary(binary_path: str, stdin_input: str) -> tuple[str, str | None]:
-    try:
-        proc = subprocess.run(
-            [binary_path],
-            input=stdin_input.encode(),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=TEST_TIMEOUT_SECONDS
-        )
-        return proc.stdout.decode(errors="replace").strip(), None
-
-    except subprocess.TimeoutExpired:
-        return "", f"Timeout (> {TEST_TIMEOUT_SECONDS}s)"
-    except FileNotFoundError:
-        return "", "Binary not found"
-    except Exception as e:
-        return "", f"Runtime Error: {e}"
+def _run_binary(binary_path: str, stdin_input: str,
+                expected: str | None = None, limits: dict | None = None) -> dict:
+    """Sandboxed streaming run; see runner.run_binary for the result keys."""
+    return run_binary(binary_path, stdin_input, expected=expected, limits=limits)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # DESIGN AGENT  (15 pts)
@@ -88,55 +80,78 @@ def design_agent(source_path: str) -> dict:
         logger.error(f"design_agent: cannot read source — {e}")
         return {"score": 0, "report": "Source file could not be read."}
 
-    lines    = src.splitlines()
-    funcs    = re.findall(r'\w+\s+\**\w+\s*\([^)]*\)\s*\{', src)
-    comments = src.count("//") + src.count("/*")
-
-    score      = 15
-    deductions = []
-
-    if len(lines) > 200:
-        score -= 2
-        deductions.append("Exceeds 200 lines (-2)")
-    if len(funcs) < 2:
-        score -= 3
-        deductions.append("Fewer than 2 functions (-3)")
-    if comments < 3:
-        score -= 2
-        deductions.append("Insufficient comments (-2)")
-
-    report = f"Lines: {len(lines)} | Functions: {len(funcs)} | Comments: {comments}"
+    lines   = src.splitlines()
+    metrics = analyze_source(src)
+
+    if metrics["parsed"]:
+        measurements = {
+            "lines":           len(lines),
+            "code_lines":      metrics["code_lines"],
+            "functions":       metrics["function_count"],
+            "comments":        metrics["comments"],
+            "commented_code":  metrics["commented_out_code"],
+            "max_complexity":  metrics["max_complexity"],
+            "worst_function":  metrics["worst_function"],
+            "max_nesting":     metrics["max_nesting"],
+            "max_statements":  metrics["max_statements"],
+            "max_params":      metrics["max_params"],
+            "halstead_volume": metrics["halstead_volume"],
+        }
+    else:
+        # pycparser rejected the file — fall back to the regex heuristics
+        funcs = re.findall(r'\w+\s+\**\w+\s*\([^)]*\)\s*\{', src)
+        measurements = {
+            "lines":          len(lines),
+            "code_lines":     metrics["code_lines"],
+            "functions":      len(funcs),
+            "comments":       metrics["comments"],
+            "commented_code": metrics["commented_out_code"],
+        }
+    score, deductions = score_component("design", measurements)
+
+    report = (f"Lines: {measurements['code_lines']} code / {len(lines)} total | "
+              f"Functions: {measurements['functions']} | Comments: {measurements['comments']}")
+    if metrics["parsed"]:
+        report += (f"\nMax complexity: {measurements['max_complexity']} ({measurements['worst_function']}) | "
+                   f"Max nesting: {measurements['max_nesting']} | "
+                   f"Halstead volume: {measurements['halstead_volume']:g}")
     if deductions:
         report += "\nDeductions: " + "; ".join(deductions)
 
-    return {"score": max(score, 0), "report": report}
+    return {"score": score, "report": report, "measurements": measurements}
 
 # ─────────────────────────────────────────────────────────────────────────────
 # TEST AGENT  (30 pts)  ★ Self-Oracle + AST Implementation ★
 # ─────────────────────────────────────────────────────────────────────────────
-def test_agent(title: str, source_path: str, binary_path: str) -> dict:
-    """
-    Self-Oracle testing strategy with AST Determinism:
+_GENERIC_INPUTS = ("1\n", "0\n", "5\n", "-1\n", "10\n")
 
-      1. Read the C source.
-      2. Attempt to mathematically parse the AST to find scanf expected types
-         and generate strict boundary inputs.
-      3. If AST parsing fails, fallback to Groq LLM input generation.
-      4. Run the compiled binary on each input (Self-Oracle).
-      5. Run the binary a second time to confirm reproducibility.
+_INPUT_SOURCES = {
+    "ast":     "deterministic, from the AST",
+    "llm":     "LLM-generated (AST parsing failed)",
+    "generic": "generic fallback (AST parsing failed; LLM failed or skipped)",
+}
+
+def test_inputs(title: str, src: str, budget: Budget | None = None) -> tuple[list[str], str]:
     """
-    try:
-        src = open(source_path).read()
-    except OSError as e:
-        logger.warning(f"test_agent: cannot read source ({e}); cannot parse AST.")
-        src = "(source code unavailable)"
+    Steps 1–2 of test_agent: (stdin inputs, input source) for a program.
+    Every input ends with a newline. Inputs depend only on the program, so
+    the orchestrator can reuse them for a resubmission with the same binary.
+    """
+    budget = budget or Budget()
 
     # ── Step 1: AST Deterministic Input Generation ───────────────────────────
-    inputs = generate_inputs_from_ast(src)
+    inputs       = generate_inputs_from_ast(src)
+    input_source = "ast"
 
     # ── Step 2: LLM Fallback (if AST fails) ──────────────────────────────────
+    if inputs is None and not budget.allows("llm_inputs"):
+        budget.degrade("llm_inputs", "AST parsing failed and no time for the LLM; generic inputs used.")
+        inputs       = list(_GENERIC_INPUTS)
+        input_source = "generic"
+
     if inputs is None:
-        logger.info("test_agent: AST parsing failed. Falling back to LLM generation.")
+        input_source = "llm"
+        logger.info("test_inputs: AST parsing failed. Falling back to LLM generation.")
         prompt = f"""
         You are a C programming test engineer. Read the C source code below carefully.
 
@@ -155,36 +170,75 @@ def test_agent(title: str, source_path: str, binary_path: str) -> dict:
         - Cover: a typical case, a boundary value, a negative number, a large value, and an edge input.
         - Return ONLY a valid JSON array of 5 strings. No explanation, no markdown.
         """
-        raw = groq_generate_inputs(prompt)
+        raw = groq_generate_inputs(prompt, timeout=budget.timeout(STAGE_ESTIMATES["llm_inputs"]))
         inputs = _parse_input_list(raw)
 
         if inputs is None:
-            logger.error("test_agent: LLM fallback also failed. Using generic inputs.")
-            inputs = ["1\n", "0\n", "5\n", "-1\n", "10\n"]
+            logger.error("test_inputs: LLM fallback also failed. Using generic inputs.")
+            inputs = list(_GENERIC_INPUTS)
+            input_source = "generic"
     else:
-        logger.info("test_agent: Successfully used AST for deterministic input generation.")
+        logger.info("test_inputs: Successfully used AST for deterministic input generation.")
+
+    return [i if i.endswith("\n") else i + "\n" for i in inputs], input_source
+
+
+def test_agent(title: str, source_path: str, binary_path: str, budget: Budget | None = None,
+               shadow=None, inputs: list[str] | None = None, input_source: str = "ast") -> dict:
+    """
+    Self-Oracle testing strategy with AST Determinism:
+
+      1. Read the C source.
+      2. Attempt to mathematically parse the AST to find scanf expected types
+         and generate strict boundary inputs.
+      3. If AST parsing fails, fallback to Groq LLM input generation.
+      4. Run the compiled binary on each input (Self-Oracle).
+      5. Run the binary a second time to confirm reproducibility.
+
+    With a `budget` that is running low (or under overload), step 3 uses
+    generic inputs (recorded as degraded). Step 5 always runs: a case is
+    only ever scored against a second, independent run.
+    A `shadow` (sanitizers.ShadowBuild) receives the same inputs before
+    step 4 and runs them concurrently on its instrumented binary.
+    Steps 1–3 are skipped when `inputs` (from test_inputs) are given.
+    """
+    budget = budget or Budget()
+    try:
+        src = open(source_path).read()
+    except OSError as e:
+        logger.warning(f"test_agent: cannot read source ({e}); cannot parse AST.")
+        src = "(source code unavailable)"
 
+    if inputs is None:
+        inputs, input_source = test_inputs(title, src, budget)
     logger.info(f"test_agent: Running self-oracle tests with inputs: {inputs}")
 
+    limits = limits_for(title)
+    if shadow is not None:
+        shadow.run(inputs, limits)
+
     # ── Step 3: Oracle run → confirm run → compare ───────────────────────────
-    passed  = 0
-    results = []
+    passed       = 0
+    results      = []
+    runtimes     = []
+    memory_peaks = []
 
     for idx, raw_input in enumerate(inputs):
-        if not raw_input.endswith("\n"):
-            raw_input += "\n"
-
         display_input = raw_input.replace("\n", " ↵\n").rstrip()
 
-        expected, oracle_err = _run_binary(binary_path, raw_input)
+        oracle   = _run_binary(binary_path, raw_input, limits=limits)
+        expected = oracle["stdout"]
+        runtimes.append(round(oracle["runtime"], 4))
+        memory_peaks.append(oracle["memory_peak_kb"])
 
-        if oracle_err:
+        if oracle["error"]:
             results.append({
                 "input":         display_input,
                 "input_raw":     raw_input,
-                "expected":      f"[Oracle Error: {oracle_err}]",
-                "actual":        oracle_err,
-                "pass":          False
+                "expected":      f"[Oracle Error: {oracle['error']}]",
+                "actual":        oracle["error"],
+                "pass":          False,
+                "limit_kill":    oracle["limit_kill"]
             })
             continue
 
@@ -198,105 +252,182 @@ def test_agent(title: str, source_path: str, binary_path: str) -> dict:
             })
             continue
 
-        actual, confirm_err = _run_binary(binary_path, raw_input)
+        # Confirm run stops on the first byte that can no longer match
+        confirm = _run_binary(binary_path, raw_input, expected=expected, limits=limits)
 
-        if confirm_err:
+        if confirm["error"]:
             ok     = False
-            actual = confirm_err
+            actual = confirm["error"]
+        elif confirm["diverged"]:
+            ok     = False
+            actual = confirm["stdout"] + "\n[stopped at first divergent byte]"
         else:
-            ok = (actual == expected)
+            actual = confirm["stdout"]
+            ok     = (actual == expected)
 
         if ok:
             passed += 1
+            # Passing output is identical on both runs — keep one excerpt
+            if len(expected) > OUTPUT_EXCERPT_CHARS:
+                expected = actual = excerpt(expected)
 
         results.append({
             "input":         display_input,
             "input_raw":     raw_input,
             "expected":      expected,
             "actual":        actual,
-            "pass":          ok
+            "pass":          ok,
+            "output_hash":   oracle["output_hash"],
+            "output_bytes":  oracle["bytes"],
+            "limit_kill":    confirm["limit_kill"]
         })
 
-    score = round((passed / 5) * 30, 2)
+    measurements = {
+        "passed":         passed,
+        "cases":          len(results),
+        "pass_vector":    [1 if r["pass"] else 0 for r in results],
+        "runtimes":       runtimes,
+        "memory_peak_kb": memory_peaks,
+        "input_source":   input_source,
+        "ast_parsed":     int(parse_method(src) != "failed")
+    }
+    score, _ = score_component("tests", measurements)
+    report   = f"{passed}/{len(results)} test cases passed (Self-Oracle + AST mode)."
+    report  += f"\nInputs: {_INPUT_SOURCES[input_source]}"
+
+    stats = ast_parse_stats()
+    logger.info(f"test_agent: AST parse success rate {stats['success_rate']:.0%} "
+                f"over {stats['total']} source(s) ({stats['preprocessed']} via gcc -E, "
+                f"{stats['cleaned']} via regex cleaning, {stats['failed']} failed).")
+
+    cpu_kills = sum(1 for r in results if r.get("limit_kill") == "cpu")
+    mem_kills = sum(1 for r in results if r.get("limit_kill") == "memory")
+    if cpu_kills:
+        report += f"\n{cpu_kills} case(s) killed for exceeding the CPU limit."
+    if mem_kills:
+        report += f"\n{mem_kills} case(s) killed for exceeding the memory limit."
+
     return {
-        "score":  score,
-        "report": f"{passed}/5 test cases passed (Self-Oracle + AST mode).",
-        "cases":  results
+        "score":        score,
+        "report":       report,
+        "cases":        results,
+        "measurements": measurements
     }
 
 # ─────────────────────────────────────────────────────────────────────────────
 # PERFORMANCE AGENT  (15 pts)
 # ─────────────────────────────────────────────────────────────────────────────
-def performance_agent(source_path: str, binary_path: str) -> dict:
-    try:
-        start = time.time()
-        subprocess.run(
-            [binary_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=1
-        )
-        runtime = time.time() - start
-    except subprocess.TimeoutExpired:
-        runtime = 5.0
-        logger.warning("performance_agent: Binary timed out during timing run.")
-    except Exception as e:
+def time_binary(binary_path: str) -> dict:
+    """The performance agent's timing run: empty stdin, 1 s cap."""
+    timing = run_binary(binary_path, "", timeout=1)
+    return {k: timing[k] for k in ("runtime", "error", "memory_peak_kb")}
+
+
+def performance_agent(source_path: str, binary_path: str, timing: dict | None = None) -> dict:
+    """`timing` (from time_binary) is measured here when not given."""
+    timing = timing or time_binary(binary_path)
+    runtime = timing["runtime"]
+    if timing["error"]:
         runtime = 5.0
-        logger.warning(f"performance_agent: Error timing binary — {e}")
+        if timing["error"].startswith("Timeout"):
+            logger.warning("performance_agent: Binary timed out during timing run.")
+        else:
+            logger.warning(f"performance_agent: Error timing binary — {timing['error']}")
 
     try:
         src = open(source_path).read()
     except OSError:
         src = ""
 
-    loops    = len(re.findall(r"for\s*\(|while\s*\(", src))
-    branches = len(re.findall(r"\bif\b|\bswitch\b|\bcase\b", src))
-
-    score      = 15
-    deductions = []
-
-    if runtime > 0.7:
-        score -= 3
-        deductions.append(f"Slow runtime {runtime:.3f}s > 0.7s (-3)")
-    if runtime > 1.2:
-        score -= 3
-        deductions.append(f"Very slow {runtime:.3f}s > 1.2s (additional -3)")
-    if loops > 5:
-        score -= 2
-        deductions.append(f"High loop count ({loops}) (-2)")
-    if branches > 12:
-        score -= 2
-        deductions.append(f"High branch count ({branches}) (-2)")
-
-    score  = max(score, 0)
+    metrics = analyze_source(src)
+    if metrics["parsed"]:
+        loops, branches = metrics["loops"], metrics["branches"]
+    else:
+        loops    = len(re.findall(r"for\s*\(|while\s*\(", src))
+        branches = len(re.findall(r"\bif\b|\bswitch\b|\bcase\b", src))
+
+    measurements = {
+        "runtime":        round(runtime, 4),
+        "loops":          loops,
+        "branches":       branches,
+        "memory_peak_kb": timing["memory_peak_kb"]
+    }
+    score, deductions = score_component("performance", measurements)
+
     report = f"Runtime: {runtime:.3f}s | Loops: {loops} | Branches: {branches}"
     if deductions:
         report += "\nDeductions: " + "; ".join(deductions)
 
-    return {"score": round(score, 2), "report": report}
+    return {"score": score, "report": report, "measurements": measurements}
 
 # ─────────────────────────────────────────────────────────────────────────────
 # OPTIMIZATION AGENT  (20 pts)
 # ─────────────────────────────────────────────────────────────────────────────
-def optimization_agent(source_path: str) -> dict:
+_MAX_HOT_SPOTS = 8
+
+def optimization_agent(source_path: str, sanitizer: dict | None = None) -> dict:
+    """
+    Static hot-loop analysis plus, when given, the findings of the ASan /
+    UBSan shadow runs (`sanitizer`, from sanitizers.ShadowBuild.collect).
+    Sanitizer findings are scored only when every case ran ("ok"); which
+    cases finish under load varies, so a "partial" collection is listed in
+    the report but does not change the score.
+    """
     try:
         src = open(source_path).read()
     except OSError as e:
         logger.error(f"optimization_agent: cannot read source — {e}")
         return {"score": 0, "report": "Source file could not be read."}
 
-    score = 20
-    notes = []
-
-    if "malloc" in src and "free" not in src:
-        score -= 4
-        notes.append("Potential memory leak: malloc() used without free().")
-
-    if re.search(r'for.*printf', src, re.S):
-        score -= 3
-        notes.append("printf() inside a loop — consider buffered output.")
-
-    return {
-        "score":  max(score, 0),
-        "report": "\n".join(notes) if notes else "No major optimization issues detected."
+    hot = analyze_hot_loops(src)
+    if hot is not None:
+        measurements = {
+            "malloc_without_free":   int(hot["alloc_calls"] > 0 and hot["free_calls"] == 0),
+            "printf_in_loop":        hot["output_in_loop"],
+            "output_in_loop_weight": hot["output_in_loop_weight"],
+            "alloc_in_loop":         hot["alloc_in_loop"],
+            "strlen_in_condition":   hot["strlen_in_condition"],
+            "pow_in_loop":           hot["pow_in_loop"],
+            "loop_invariant":        hot["loop_invariant"],
+            "hot_loop_weight":       hot["hot_loop_weight"],
+        }
+    else:
+        # pycparser rejected the file — fall back to the text heuristics
+        measurements = {
+            "malloc_without_free": int("malloc" in src and "free" not in src),
+            "printf_in_loop":      int(bool(re.search(r'for.*printf', src, re.S)))
+        }
+    if sanitizer and sanitizer["status"] == "ok":
+        measurements["sanitizer_errors"] = sanitizer["errors"]
+        measurements["sanitizer_kinds"]  = ", ".join(sorted({f["kind"] for f in sanitizer["findings"]}))
+        measurements["leaked_bytes"]     = sanitizer["leaked_bytes"]
+    score, notes = score_component("optimization", measurements)
+
+    # Point at the specific hot loops, heaviest first
+    if hot and hot["findings"]:
+        notes.append("Hot spots:")
+        for f in hot["findings"][:_MAX_HOT_SPOTS]:
+            notes.append(f"  line {f['line']} in {f['function']}() "
+                         f"(loop depth {f['depth']}): {f['message']}")
+        if len(hot["findings"]) > _MAX_HOT_SPOTS:
+            notes.append(f"  … {len(hot['findings']) - _MAX_HOT_SPOTS} more")
+
+    if sanitizer and sanitizer["findings"]:
+        unscored = "; not scored" if sanitizer["status"] != "ok" else ""
+        notes.append(f"Sanitizer findings ({sanitizer['cases_run']}/{sanitizer['cases']} "
+                     f"cases run{unscored}):")
+        for f in sanitizer["findings"][:_MAX_HOT_SPOTS]:
+            where = f"line {f['line']}" if f["line"] else "unknown line"
+            cases = ", ".join(map(str, f["cases"]))
+            notes.append(f"  {where} [{f['tool']}] {f['kind']} (case {cases}): {f['message']}")
+        if len(sanitizer["findings"]) > _MAX_HOT_SPOTS:
+            notes.append(f"  … {len(sanitizer['findings']) - _MAX_HOT_SPOTS} more")
+
+    result = {
+        "score":        score,
+        "report":       "\n".join(notes) if notes else "No major optimization issues detected.",
+        "measurements": measurements
     }
+    if sanitizer is not None:
+        result["sanitizer"] = sanitizer
+    return result
@@ -0,0 +1,234 @@
+"""
+analytics.py
+Class-wide statistics over the stored results, computed on NumPy arrays.
+
+Functions:
+  class_analytics(assignment, rubric=None)  → distributions, failure rates, correlations, histograms
+  to_csv(analytics)                         → one CSV row per student (scores, tests, resources)
+
+Usage:
+  python analytics.py "Sum of digits" [--csv class.csv] [--rubric rubric.json]
+
+Inputs come from results_store.load_snapshot(): the per-student scalar
+metrics (rescored with rubric.score_columns) and the per-test-case
+matrices (pass vector, runtimes, peak memory — one row per student, one
+column per case index), both built from the same read of the store.
+Every statistic is a single NumPy reduction over those arrays, so a class
+of thousands is summarised in milliseconds; the arrays themselves are
+cached as .npz next to measurements.jsonl.
+
+Test case i is the i-th generated input of each submission. Inputs are
+derived from each student's own code, so per-case failure rates compare
+positions, not identical inputs — output_index.py clusters by input.
+"""
+
+import io
+import csv
+import sys
+import time
+import logging
+import warnings
+import argparse
+
+import numpy as np
+
+from rubric import COMPONENTS, RUBRIC, load_rubric, score_columns
+from results_store import load_snapshot
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (10, 25, 50, 75, 90)
+_HIST_BINS  = 20
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPERS
+# ─────────────────────────────────────────────────────────────────────────────
+def _histogram(values: np.ndarray, log: bool = False) -> dict:
+    """{"edges", "counts"} over the finite values; log-spaced bins when asked."""
+    values = values[np.isfinite(values)]
+    if log:
+        values = values[values > 0]
+    if values.size == 0:
+        return {"edges": [], "counts": []}
+    lo, hi = float(values.min()), float(values.max())
+    if lo == hi:
+        return {"edges": [lo, hi], "counts": [int(values.size)]}
+    edges = np.geomspace(lo, hi, _HIST_BINS + 1) if log else np.linspace(lo, hi, _HIST_BINS + 1)
+    counts, edges = np.histogram(values, bins=edges)
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def _correlations(matrix: np.ndarray) -> np.ndarray:
+    """Pearson correlation between the rows of `matrix`; NaN for constant rows."""
+    centred = matrix - matrix.mean(axis=1, keepdims=True)
+    norms   = np.sqrt((centred ** 2).sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = (centred @ centred.T) / np.outer(norms, norms)
+    return np.clip(corr, -1.0, 1.0)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# class_analytics
+# ─────────────────────────────────────────────────────────────────────────────
+def class_analytics(assignment: str, rubric: dict | None = None) -> dict:
+    """
+    Summary of one class (latest submission per student):
+      students        — names, row order of every per-student array
+      scores          — {component / "total": array}, rescored with `rubric`
+      distribution    — per component: mean, std, min, p10 … p90, max, max possible
+      total_histogram — {"edges", "counts"} of total scores in 5-point bins
+      tests           — per case index: students who ran it, failure rate;
+                        plus the pass matrix and per-student pass counts
+      correlations    — {"components": [...], "matrix": 2-D array} between scores
+      runtime / memory — per-student mean runtime and max peak memory, and
+                        histograms over every test-case run (log-spaced)
+    """
+    rubric = rubric or RUBRIC
+    # Scores and per-case matrices must describe the same rows in the same order
+    students, columns, vectors = load_snapshot(assignment)
+    if not students:
+        return {"students": []}
+    scores = score_columns(columns, rubric)
+    n = len(students)
+
+    names  = [*COMPONENTS, "total"]
+    matrix = np.vstack([scores[c] for c in names]).astype(float)    # components × students
+    pcts   = np.percentile(matrix, PERCENTILES, axis=1)             # percentiles × components
+    maxima = [rubric[c]["max"] for c in COMPONENTS]
+    maxima.append(sum(maxima))
+    distribution = {
+        name: {
+            "mean": round(float(matrix[i].mean()), 2),
+            "std":  round(float(matrix[i].std()), 2),
+            "min":  float(matrix[i].min()),
+            **{f"p{p}": round(float(pcts[j, i]), 2) for j, p in enumerate(PERCENTILES)},
+            "max":  float(matrix[i].max()),
+            "out_of": maxima[i],
+        }
+        for i, name in enumerate(names)
+    }
+    counts, edges = np.histogram(scores["total"], bins=np.arange(0, maxima[-1] + 5, 5))
+
+    # Per-test-case pass matrix (students × cases, NaN where a student had fewer cases)
+    passes = vectors.get("tests.pass_vector", np.full((n, 0), np.nan))
+    ran    = np.isfinite(passes)
+    passed = np.nansum(passes, axis=1)
+    runtimes = vectors.get("tests.runtimes", np.full((n, 0), np.nan))
+    memory   = vectors.get("tests.memory_peak_kb", np.full((n, 0), np.nan))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)     # all-NaN slices → NaN, as intended
+        failure_rate = 1.0 - np.nanmean(passes, axis=0) if passes.shape[1] else np.zeros(0)
+        mean_runtime = np.nanmean(runtimes, axis=1) if runtimes.shape[1] else np.full(n, np.nan)
+        peak_memory  = np.nanmax(memory, axis=1) if memory.shape[1] else np.full(n, np.nan)
+
+    tests = {
+        "cases":         passes.shape[1],
+        "ran":           ran.sum(axis=0).tolist(),
+        "failure_rate":  np.round(failure_rate, 3).tolist(),
+        "passed":        passed,
+        "run":           ran.sum(axis=1),
+        "pass_matrix":   passes,
+        "all_passed":    int(((passed == ran.sum(axis=1)) & ran.any(axis=1)).sum()),
+    }
+
+    return {
+        "assignment":      assignment,
+        "students":        students,
+        "rubric_version":  rubric["version"],
+        "scores":          scores,
+        "distribution":    distribution,
+        "total_histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+        "tests":           tests,
+        "correlations":    {"components": list(COMPONENTS),
+                            "matrix": _correlations(matrix[:len(COMPONENTS)])},
+        "runtime": {
+            "per_student": mean_runtime,
+            "histogram":   _histogram(runtimes.ravel(), log=True),
+            "p95":         float(np.nanpercentile(runtimes, 95)) if np.isfinite(runtimes).any() else None,
+        },
+        "memory": {
+            "per_student": peak_memory,
+            "histogram":   _histogram(memory.ravel(), log=True),
+            "p95":         float(np.nanpercentile(memory, 95)) if np.isfinite(memory).any() else None,
+        },
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# to_csv
+# ─────────────────────────────────────────────────────────────────────────────
+def to_csv(analytics: dict) -> str:
+    """
+    Per-student export: component scores, total, tests passed / run, mean
+    runtime (s), peak memory (KiB) and one 1 / 0 column per test case
+    (empty where the student had no such case).
+    """
+    out    = io.StringIO()
+    writer = csv.writer(out)
+    if not analytics.get("students"):
+        return ""
+    tests  = analytics["tests"]
+    header = ["student", *COMPONENTS, "total", "tests_passed", "tests_run",
+              "mean_runtime_s", "peak_memory_kb",
+              *(f"case_{i + 1}" for i in range(tests["cases"]))]
+    writer.writerow(header)
+
+    scores  = analytics["scores"]
+    numeric = np.column_stack([
+        *(scores[c] for c in (*COMPONENTS, "total")),
+        tests["passed"], tests["run"],
+        analytics["runtime"]["per_student"], analytics["memory"]["per_student"],
+        tests["pass_matrix"],
+    ])
+    fmt = lambda v: "" if np.isnan(v) else f"{v:g}"
+    for student, row in zip(analytics["students"], numeric.tolist()):
+        writer.writerow([student, *map(fmt, row)])
+    return out.getvalue()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Class-wide analytics from stored results.")
+    ap.add_argument("assignment")
+    ap.add_argument("--rubric", help="JSON rubric file (defaults to RUBRIC_PATH / built-in)")
+    ap.add_argument("--csv", help="write the per-student table to this file ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    start = time.perf_counter()
+    data  = class_analytics(args.assignment, load_rubric(args.rubric))
+    elapsed = time.perf_counter() - start
+    if not data["students"]:
+        sys.exit(f"No stored results for {args.assignment!r}.")
+
+    if args.csv:
+        text = to_csv(data)
+        if args.csv == "-":
+            sys.stdout.write(text)
+            return
+        with open(args.csv, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+
+    print(f"{len(data['students'])} student(s), rubric v{data['rubric_version']}, "
+          f"computed in {elapsed * 1000:.1f} ms\n")
+    print(f"{'component':<14}{'mean':>7}{'std':>7}" + "".join(f"{'p' + str(p):>7}" for p in PERCENTILES))
+    for name, d in data["distribution"].items():
+        print(f"{name:<14}{d['mean']:>7.1f}{d['std']:>7.1f}"
+              + "".join(f"{d['p' + str(p)]:>7.1f}" for p in PERCENTILES) + f"   / {d['out_of']}")
+    rates = ", ".join(f"{i + 1}: {r:.0%}" for i, r in enumerate(data["tests"]["failure_rate"]))
+    print(f"\nfailure rate per test case  {rates or '-'}")
+    corr = data["correlations"]
+    print("\ncorrelations  " + "".join(f"{c[:6]:>8}" for c in corr["components"]))
+    for name, row in zip(corr["components"], corr["matrix"]):
+        print(f"{name:<14}" + "".join(f"{v:>8.2f}" for v in row))
+    runtime_p95, memory_p95 = data["runtime"]["p95"], data["memory"]["p95"]
+    print(f"\np95 test-case runtime {runtime_p95:.4f}s" if runtime_p95 is not None else "")
+    print(f"p95 test-case peak memory {memory_p95:.0f} KiB" if memory_p95 is not None else "")
+    if args.csv:
+        print(f"\nCSV written to {args.csv}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    main()
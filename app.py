@@ -3,10 +3,10 @@ app.py
 Professional University-Grade C Autograder UI
 
 Features:
-✅ Upload or paste C code
+✅ Upload or paste C code — single files, several .c / .h files, or a .zip project
 ✅ OCR for Handwritten Scans (Image/PDF) via Gemini Vision
 ✅ Real gcc compilation
-✅ Gemini 2.5 Flash (LangChain) error explanation + hints
+✅ Gemini 2.5 Flash error explanation + hints
 ✅ AST Parsing — Deterministic boundary test generation
 ✅ Groq LLM — Fallback test generation
 ✅ Multi-agent grading
@@ -20,9 +20,18 @@ Features:
 import streamlit as st
 import tempfile
 import os
-from utils import compile_c_code, run_cppcheck, generate_pdf
+import uuid
+import zipfile
+import pandas as pd
+from utils import compile_c_code, run_cppcheck, pdf_bytes
 from orchestrator import run_orchestration
+from results_store import record as record_result
 from llm import gemini_explain_compiler_errors, gemini_extract_code_from_file
+from ast_generator import warm_parser
+from scheduler import SCHEDULER
+from sanitizers import start_shadow_build
+from budget import Budget
+from build import Project, read_zip
 
 # ── Page config ───────────────────────────────────────────────────────────────
 st.set_page_config(
@@ -31,6 +40,145 @@ st.set_page_config(
     layout="wide"
 )
 
+# ── One-time warm-up (once per server process, not per rerun) ─────────────────
+@st.cache_resource
+def _warm_up():
+    warm_parser()
+    return True
+
+_warm_up()
+
+# ── Test case table helpers ───────────────────────────────────────────────────
+_PAGE_SIZES    = (25, 50, 100)
+_PREVIEW_CHARS = 60      # per cell in the summary table
+_DETAIL_CHARS  = 4000    # per output block before "Show full" is needed
+_CASE_FILTERS  = {
+    "All":       None,
+    "Failed":    {"empty", "timeout", "crash", "limit", "unstable"},
+    "Timeouts":  {"timeout"},
+    "Crashes":   {"crash", "limit"},
+}
+# runner.run_binary error texts (a failed confirm run keeps its real "expected")
+_RUN_ERRORS    = ("Runtime Error", "Output limit", "Binary not found")
+
+
+def _one_line(text: str, limit: int = _PREVIEW_CHARS) -> str:
+    flat = " | ".join(part.strip() for part in text.strip().splitlines())
+    return flat if len(flat) <= limit else flat[:limit] + "…"
+
+
+def _case_outcome(c: dict) -> str:
+    """pass / empty / limit / timeout / crash / unstable — for the filters."""
+    if c["pass"]:
+        return "pass"
+    if c["expected"].startswith("[Empty"):
+        return "empty"
+    if c.get("limit_kill"):
+        return "limit"
+    if c["actual"].startswith("Timeout"):
+        return "timeout"
+    if c["expected"].startswith("[Oracle Error") or c["actual"].startswith(_RUN_ERRORS):
+        return "crash"
+    return "unstable"
+
+
+def _case_summary(cases: list[dict]) -> list[dict]:
+    """One light row per case, built once per graded report (not per rerun)."""
+    return [{
+        "#":       i,
+        "Result":  "✅" if c["pass"] else "❌",
+        "Outcome": _case_outcome(c),
+        "Input":   _one_line(c.get("input_raw", c["input"])),
+        "Output":  _one_line(c["actual"] or "(no output)"),
+        "Bytes":   c.get("output_bytes"),
+    } for i, c in enumerate(cases, 1)]
+
+
+def _code_block(text: str, key: str):
+    """st.code with large text cut to _DETAIL_CHARS unless "Show full" is on."""
+    if len(text) <= _DETAIL_CHARS:
+        st.code(text, language="text")
+        return
+    if st.toggle(f"Show full output ({len(text):,} characters)", key=key):
+        st.code(text, language="text")
+    else:
+        st.code(text[:_DETAIL_CHARS] + f"\n… [{len(text) - _DETAIL_CHARS:,} more characters]",
+                language="text")
+
+
+def _render_case(i: int, c: dict, report_id: str):
+    """Full input / output of one case — only rendered for the opened row."""
+    st.markdown(f"**Test {i}**")
+
+    # ── 1. Clean Input View ─────────────────────
+    st.markdown("**📥 Standard Input (stdin):**")
+    _code_block(c.get("input_raw", c["input"]).strip(), f"{report_id}-in-{i}")
+
+    # ── 2. Clean Output View ────────────────────
+    if c["pass"]:
+        st.markdown("**🖥️ Program Output (stdout):**")
+        output_display = c["actual"] if c["actual"].strip() else "(No output printed)"
+        _code_block(output_display, f"{report_id}-out-{i}")
+        st.success("✅ PASS")
+    elif "Empty" in c["expected"]:
+        st.markdown("**🖥️ Program Output (stdout):**")
+        st.code("(No output printed to terminal)", language="text")
+        st.error("❌ FAIL — Program produced empty output.")
+    elif "Error" in c["expected"] or "Error" in c["actual"]:
+        st.markdown("**🖥️ Execution Error:**")
+        st.code(c["actual"] if c["actual"] else c["expected"], language="text")
+        st.error("❌ FAIL — Program crashed or timed out.")
+    else:
+        st.warning("⚠️ Unstable Output! The program printed different results on consecutive runs with the same input.")
+        col_a, col_b = st.columns(2)
+        with col_a:
+            st.markdown("**Run 1:**")
+            _code_block(c["expected"], f"{report_id}-run1-{i}")
+        with col_b:
+            st.markdown("**Run 2:**")
+            _code_block(c["actual"], f"{report_id}-run2-{i}")
+        st.error("❌ FAIL — Non-deterministic behavior.")
+
+
+def _render_case_table(cases: list[dict], summary: list[dict], report_id: str):
+    """
+    Filterable, paginated summary table; the full detail of a case is only
+    rendered when its row is selected. Work per rerun is one page of rows
+    plus at most one case, however many cases the suite has.
+    """
+    col_f, col_s, col_p = st.columns([3, 1, 1])
+    choice  = col_f.segmented_control("Show", list(_CASE_FILTERS), default="All",
+                                      key=f"{report_id}-filter") or "All"
+    size    = col_s.selectbox("Rows per page", _PAGE_SIZES, key=f"{report_id}-size")
+    wanted  = _CASE_FILTERS[choice]
+    rows    = summary if wanted is None else [r for r in summary if r["Outcome"] in wanted]
+    pages   = max(1, -(-len(rows) // size))
+    page    = col_p.number_input("Page", min_value=1, max_value=pages, value=1, step=1,
+                                 key=f"{report_id}-page-{choice}-{size}")
+    visible = rows[(page - 1) * size: page * size]
+
+    passed = sum(1 for r in summary if r["Outcome"] == "pass")
+    st.caption(f"{passed}/{len(summary)} passed · showing {len(visible)} of {len(rows)} "
+               f"{choice.lower()} case(s) · page {page}/{pages} · select a row to open it")
+    if not visible:
+        st.info("No test cases match this filter.")
+        return
+
+    event = st.dataframe(
+        pd.DataFrame(visible),
+        hide_index=True,
+        width="stretch",
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"{report_id}-table-{choice}-{size}-{page}",
+    )
+    selected = event.selection.rows if event else []
+    if selected:
+        number = visible[selected[0]]["#"]
+        with st.container(border=True):
+            _render_case(number, cases[number - 1], report_id)
+
+
 # ── Sidebar rubric ────────────────────────────────────────────────────────────
 with st.sidebar:
     st.title("📊 Evaluation Rubric")
@@ -98,7 +246,9 @@ with st.form("submission_form"):
     
     # Text area uses session_state value so OCR results auto-populate here
     code_text    = st.text_area("✍️ Paste / Edit Your C Code Here", value=st.session_state["extracted_code"], height=320)
-    uploaded     = st.file_uploader("OR Upload a .c Source File (Overrides Text Area)", type=["c"])
+    uploaded     = st.file_uploader("OR Upload .c / .h Files or a .zip Project (Overrides Text Area)",
+                                    type=["c", "h", "zip"], accept_multiple_files=True)
+    profile_run  = st.checkbox("🔬 Profile this evaluation (cProfile, allocations, flame-graph stacks)")
     submitted    = st.form_submit_button("🚀 Evaluate Code")
 
 # ── Main pipeline ─────────────────────────────────────────────────────────────
@@ -111,83 +261,201 @@ if submitted:
         st.stop()
 
     # ── Load code ─────────────────────────────────────────────────────────────
+    # Several files (or a ZIP) are one multi-file program, built per unit (build.py)
+    project_files = None
     if uploaded:
-        code_bytes = uploaded.read()
-        try:
-            code_text = code_bytes.decode("utf-8")
-        except UnicodeDecodeError:
-            code_text = code_bytes.decode("latin-1")
-
-    if not code_text.strip():
+        files = {}
+        for upload in uploaded:
+            code_bytes = upload.read()
+            if upload.name.lower().endswith(".zip"):
+                try:
+                    files.update(read_zip(code_bytes))
+                except (zipfile.BadZipFile, ValueError) as e:
+                    st.error(f"Cannot read {upload.name}: {e}")
+                    st.stop()
+                continue
+            try:
+                files[upload.name] = code_bytes.decode("utf-8")
+            except UnicodeDecodeError:
+                files[upload.name] = code_bytes.decode("latin-1")
+        if len(files) == 1 and next(iter(files)).endswith(".c"):
+            code_text = next(iter(files.values()))
+        elif files:
+            project_files = files
+
+    if project_files is None and not code_text.strip():
         st.error("No C code provided. Please paste code, extract from an image, or upload a .c file.")
         st.stop()
 
-    # ── Save to temp file ─────────────────────────────────────────────────────
-    with st.status("📂 Preparing Submission...", expanded=True) as status:
-        tmp = tempfile.NamedTemporaryFile(suffix=".c", delete=False)
-        tmp.write(code_text.encode("utf-8"))
-        tmp.flush()
-        tmp.close()
-        source_path = tmp.name
-        st.write(f"✅ Source saved: `{source_path}`")
-        status.update(label="✅ Submission Prepared", state="complete")
-
-    # ── Compile ───────────────────────────────────────────────────────────────
-    with st.status("⚙️ Compiling with gcc...", expanded=True) as status:
-        compile_result = compile_c_code(source_path)
-
-        if not compile_result["success"]:
-            st.error("❌ Compilation Failed")
-
-            st.subheader("🔴 Raw gcc Error Log")
-            st.code(compile_result["errors"])
-
-            st.info("🧠 Sending error log to Gemini 2.5 Flash for explanation...")
-            ai_explanation = gemini_explain_compiler_errors(compile_result["errors"])
-
-            st.subheader("✅ Gemini AI Explanation & Correction Hints")
-            st.write(ai_explanation)
-
-            st.warning(
-                "⚠️ Fix the errors above and resubmit.\n\n"
-                "This system will **NOT auto-correct or generate full solutions.**"
-            )
-            os.unlink(source_path)
-            status.update(label="❌ Compilation Failed", state="error")
-            st.stop()
-
-        status.update(label="✅ Compilation Successful", state="complete")
-
-    binary_path = compile_result["binary"]
-    st.success("✅ Compilation Successful — Binary Generated")
-
-    # ── Static analysis ───────────────────────────────────────────────────────
-    with st.status("🔍 Running cppcheck Static Analysis...", expanded=True) as status:
-        static_report = run_cppcheck(source_path)
-
-        if static_report.strip():
-            st.subheader("⚠️ cppcheck Warnings")
-            st.code(static_report)
-        else:
-            st.success("✅ No cppcheck warnings detected")
-
-        status.update(label="✅ Static Analysis Completed", state="complete")
-
-    # ── Multi-agent orchestration ─────────────────────────────────────────────
-    with st.status("🤖 Running Multi-Agent Evaluation...", expanded=True) as status:
-        st.write("🔬 Test Agent running in **AST + Self-Oracle mode** — System mathematically generates boundary inputs, binary produces expected outputs...")
-        final_report = run_orchestration(
-            title=title,
-            source_c=source_path,
-            binary=binary_path,
-            static_report=static_report
+    # ── Fair queue: wait for a grading slot ───────────────────────────────────
+    # One slot per submission, shared by every session in this process;
+    # students are served round-robin (see scheduler.py).
+    if "session_key" not in st.session_state:
+        st.session_state["session_key"] = f"session-{uuid.uuid4().hex[:8]}"
+    queue_key   = student_name.strip().lower() or st.session_state["session_key"]
+    queue_label = st.empty()
+
+    def _show_queue(position, eta):
+        queue_label.info(f"⏳ You are #{position} in the grading queue — "
+                         f"estimated wait about {max(1, round(eta))} s.")
+
+    # ── Cleanup ───────────────────────────────────────────────────────────────
+    # Runs however the submission ends — st.stop(), a compile error or an
+    # exception in orchestration — so no temp tree or shadow build leaks
+    project = shadow = source_path = binary_path = None
+    compile_failed = False
+
+    def _cleanup_sources():
+        try:
+            if project is None:
+                if shadow:
+                    shadow.cleanup()
+                for path in (source_path, binary_path):
+                    if path and os.path.exists(path):
+                        os.unlink(path)
+            elif shadow:
+                # The shadow compile may not have read the units yet
+                shadow.cleanup(project.workdir)
+            else:
+                project.cleanup()
+        except Exception:
+            pass
+
+    # One budget for the whole submission, as in grade_submission: under load
+    # the shadow build and the optional stages are shed (budget.py)
+    budget = Budget()
+
+    try:
+        with SCHEDULER.admit(queue_key, on_wait=_show_queue):
+            queue_label.empty()
+
+            # ── Save to temp file ─────────────────────────────────────────────
+            with st.status("📂 Preparing Submission...", expanded=True) as status:
+                if project_files is not None:
+                    try:
+                        project = Project(project_files)
+                    except ValueError as e:
+                        status.update(label="❌ Invalid Submission", state="error")
+                        st.error(str(e))
+                        st.stop()
+                    source_path = project.source_path
+                    st.write(f"✅ {len(project.files)} files saved: "
+                             + ", ".join(f"`{name}`" for name in sorted(project.files)))
+                else:
+                    tmp = tempfile.NamedTemporaryFile(suffix=".c", delete=False)
+                    tmp.write(code_text.encode("utf-8"))
+                    tmp.flush()
+                    tmp.close()
+                    source_path = tmp.name
+                    st.write(f"✅ Source saved: `{source_path}`")
+                status.update(label="✅ Submission Prepared", state="complete")
+
+            # ── Compile ───────────────────────────────────────────────────────
+            with st.status("⚙️ Compiling with gcc...", expanded=True) as status:
+                # ASan/UBSan shadow build compiles alongside (sanitizers.py)
+                if project:
+                    shadow = start_shadow_build(project.sources, budget, project.root, project.cflags)
+                    compile_result = project.build()
+                    reused = sum(s == "reused" for s in compile_result["units"].values())
+                    st.write(f"♻️ {reused} of {len(project.sources)} translation unit(s) reused "
+                             f"from the object cache")
+                else:
+                    shadow = start_shadow_build(source_path, budget)
+                    compile_result = compile_c_code(source_path)
+
+                if not compile_result["success"]:
+                    st.error("❌ Compilation Failed")
+
+                    st.subheader("🔴 Raw gcc Error Log")
+                    st.code(compile_result["errors"])
+
+                    status.update(label="❌ Compilation Failed", state="error")
+                    compile_failed = True
+                else:
+                    status.update(label="✅ Compilation Successful", state="complete")
+
+            if not compile_failed:
+                binary_path = compile_result["binary"]
+                st.success("✅ Compilation Successful — Binary Generated")
+
+                # ── Static analysis ───────────────────────────────────────────
+                with st.status("🔍 Running cppcheck Static Analysis...", expanded=True) as status:
+                    static_report = run_cppcheck(".", project.root) if project else run_cppcheck(source_path)
+
+                    if static_report.strip():
+                        st.subheader("⚠️ cppcheck Warnings")
+                        st.code(static_report)
+                    else:
+                        st.success("✅ No cppcheck warnings detected")
+
+                    status.update(label="✅ Static Analysis Completed", state="complete")
+
+                # ── Multi-agent orchestration ─────────────────────────────────
+                with st.status("🤖 Running Multi-Agent Evaluation...", expanded=True) as status:
+                    st.write("🔬 Test Agent running in **AST + Self-Oracle mode** — System mathematically generates boundary inputs, binary produces expected outputs...")
+                    final_report = run_orchestration(
+                        title=title,
+                        source_c=source_path,
+                        binary=binary_path,
+                        static_report=static_report,
+                        budget=budget,
+                        shadow=shadow,
+                        # Unchecked → AUTOGRADER_PROFILE decides
+                        profile=True if profile_run else None
+                    )
+                    if project:
+                        final_report["build"] = {"units": compile_result["units"],
+                                                 "link":  compile_result["link"]}
+                    # Raw measurements are kept per class so a changed rubric can rescore it
+                    record_result(title, student_name.strip(), final_report)
+                    status.update(label="✅ Agentic Evaluation Completed", state="complete")
+
+    finally:
+        _cleanup_sources()
+
+    # ── Compile-error explanation (after the grading slot is released) ────────
+    if compile_failed:
+        st.info("🧠 Sending error log to Gemini 2.5 Flash for explanation...")
+        ai_explanation = gemini_explain_compiler_errors(
+            compile_result["errors"], compile_result.get("diagnostics")
+        )
+
+        st.subheader("✅ Gemini AI Explanation & Correction Hints")
+        st.write(ai_explanation)
+
+        st.warning(
+            "⚠️ Fix the errors above and resubmit.\n\n"
+            "This system will **NOT auto-correct or generate full solutions.**"
         )
-        status.update(label="✅ Agentic Evaluation Completed", state="complete")
+        st.stop()
+
+    # Pagination / filter widgets rerun the script, so the graded report
+    # lives in session_state rather than in this `if submitted:` block
+    st.session_state["graded"] = {
+        "id":      uuid.uuid4().hex[:8],
+        "report":  final_report,
+        "student": student_name.strip(),
+        "summary": _case_summary(final_report["tests"]["cases"]),
+    }
+    st.success("✅ Evaluation Pipeline Completed Successfully")
+
+
+# ── Results (rendered from session_state on every rerun) ──────────────────────
+graded = st.session_state.get("graded")
+if graded:
+    final_report = graded["report"]
+
+    if final_report.get("degraded"):
+        st.warning("⏱️ The server was busy, so some optional steps were simplified: "
+                   + "; ".join(d["reason"] for d in final_report["degraded"]))
 
     # ── Score dashboard ───────────────────────────────────────────────────────
     st.header("📊 Evaluation Dashboard")
-    if student_name.strip():
-        st.markdown(f"**🎓 Student:** {student_name.strip()}")
+    if graded["student"]:
+        st.markdown(f"**🎓 Student:** {graded['student']}")
+    if final_report.get("reused_stages"):
+        st.caption("♻️ Unchanged since an earlier submission, reused: "
+                   + ", ".join(final_report["reused_stages"]))
 
     col1, col2, col3 = st.columns(3)
     col1.metric("🏗️ Design Score",  f"{final_report['design']['score']} / 15")
@@ -223,50 +491,7 @@ if submitted:
         cases = final_report["tests"]["cases"]
         if cases:
             st.markdown("#### Test Case Results")
-
-            for i, c in enumerate(cases, 1):
-                icon   = "✅" if c["pass"] else "❌"
-                
-                # Show a clean preview in the expander title
-                title_preview = c.get("input_raw", c["input"]).replace("\n", " | ").strip()
-                if title_preview.endswith("|"): 
-                    title_preview = title_preview[:-1].strip()
-                if len(title_preview) > 40:
-                    title_preview = title_preview[:40] + "…"
-                header = f"{icon} Test {i} — Input: `{title_preview}`"
-
-                with st.expander(header, expanded=not c["pass"]):
-
-                    # ── 1. Clean Input View ─────────────────────
-                    st.markdown("**📥 Standard Input (stdin):**")
-                    clean_input = c.get("input_raw", c["input"]).strip()
-                    st.code(clean_input, language="text")
-
-                    # ── 2. Clean Output View ────────────────────
-                    if c["pass"]:
-                        st.markdown("**🖥️ Program Output (stdout):**")
-                        output_display = c["actual"] if c["actual"].strip() else "(No output printed)"
-                        st.code(output_display, language="text")
-                        st.success("✅ PASS")
-                    else:
-                        if "Empty" in c["expected"]:
-                            st.markdown("**🖥️ Program Output (stdout):**")
-                            st.code("(No output printed to terminal)", language="text")
-                            st.error("❌ FAIL — Program produced empty output.")
-                            
-                        elif "Error" in c["expected"] or "Error" in c["actual"]:
-                            st.markdown("**🖥️ Execution Error:**")
-                            st.code(c["actual"] if c["actual"] else c["expected"], language="text")
-                            st.error("❌ FAIL — Program crashed or timed out.")
-                            
-                        else:
-                            st.warning("⚠️ Unstable Output! The program printed different results on consecutive runs with the same input.")
-                            col_a, col_b = st.columns(2)
-                            col_a.markdown("**Run 1:**")
-                            col_a.code(c["expected"], language="text")
-                            col_b.markdown("**Run 2:**")
-                            col_b.code(c["actual"], language="text")
-                            st.error("❌ FAIL — Non-deterministic behavior.")
+            _render_case_table(cases, graded["summary"], graded["id"])
 
     with tab3:
         st.subheader("Performance & Complexity")
@@ -280,23 +505,22 @@ if submitted:
         st.subheader("Gemini 2.5 Flash — Final Academic Evaluation")
         st.write(final_report.get("gemini_final_report", "Gemini not configured."))
 
-    # ── PDF download ──────────────────────────────────────────────────────────
-    st.info("📄 Generating Final Academic PDF Report...")
-    pdf_path = generate_pdf(final_report, student_name=student_name.strip())
-
-    with open(pdf_path, "rb") as f:
-        st.download_button(
-            "⬇️ Download Final PDF Report",
-            f,
-            file_name="C_Autograder_Final_Report.pdf"
-        )
+    # ── Profile (only when profiling was on for this run) ─────────────────────
+    profile = final_report.get("profile")
+    if profile:
+        with st.expander(f"🔬 Profile — {profile['wall_seconds']:.2f}s wall, "
+                         f"{profile['child_cpu_seconds']:.2f}s child CPU, "
+                         f"{profile['peak_kib']:,.0f} KiB peak Python memory"):
+            st.caption(f"Files saved in `{profile['dir']}` — open the .pstats with snakeviz, "
+                       f"the .collapsed with flamegraph.pl or speedscope.")
+            st.dataframe(pd.DataFrame(profile["top_functions"]), hide_index=True, width="stretch")
 
-    # ── Cleanup ───────────────────────────────────────────────────────────────
-    try:
-        os.unlink(source_path)
-        if os.path.exists(binary_path):
-            os.unlink(binary_path)
-    except Exception:
-        pass
-
-    st.success("✅ Evaluation Pipeline Completed Successfully")
+    # ── PDF download ──────────────────────────────────────────────────────────
+    # Built only when the button is clicked (on Streamlit's download thread)
+    # and cached per report hash, so reruns and repeat downloads are free
+    st.download_button(
+        "⬇️ Download Final PDF Report",
+        lambda report=final_report, student=graded["student"]: pdf_bytes(report, student),
+        file_name="C_Autograder_Final_Report.pdf",
+        mime="application/pdf"
+    )
@@ -0,0 +1,296 @@
+"""
+archive_ingest.py
+Streaming ingestion of LMS exports (ZIP / tar with one folder per student).
+
+Functions:
+  iter_submissions(path)               → generator of {"student", "folder", "files", ...}
+  grade_archive(path, title, ...)      → generator of JSONL-ready result rows, as they finish
+
+Usage:
+  python archive_ingest.py export.zip "Sum of digits" [--out results.jsonl] [--reports DIR]
+
+Nothing is extracted to disk. ZIP members are read one student folder at a
+time through zipfile; tarballs (.tar, .tar.gz, ...) are read in stream mode,
+so even stdin ("-") works. At most ARCHIVE_MAX_PENDING submissions are held
+in memory — read but not yet consumed as results — so memory stays flat for
+any archive size, and the first rows appear as soon as the first students
+are graded.
+
+A folder with several .c / .h files is graded as one multi-file program
+(build.py: one cached object per translation unit). Only when more than
+one file defines main() — separate attempts, not one program — is the
+folder graded on the first of them, the others listed in "extra_files".
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import tarfile
+import zipfile
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ARCHIVE_MAX_SOURCE_BYTES, ARCHIVE_MAX_PENDING, BATCH_GRADE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+SOURCE_EXTENSIONS = (".c", ".h")
+# Moodle-style folder names: "Jane Doe_123456_assignsubmission_file_"
+_LMS_FOLDER = re.compile(r"^(?P<name>.+?)_\d+_assign(?:ment)?submission_\w*$")
+_MAIN_DEF   = re.compile(r"\bint\s+main\s*\(")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPERS — member paths
+# ─────────────────────────────────────────────────────────────────────────────
+def _is_noise(path: str) -> bool:
+    parts = path.split("/")
+    return any(p.startswith(".") or p == "__MACOSX" for p in parts if p)
+
+
+def _student_of(folder: str) -> str:
+    m = _LMS_FOLDER.match(folder)
+    return (m.group("name") if m else folder).replace("_", " ").strip()
+
+
+def _split(path: str, root: str = "") -> tuple[str, str]:
+    """
+    (student folder, path inside it). An LMS-named directory wins at any
+    depth; otherwise the first component below `root` is the folder.
+    Top-level files get their own folder.
+    """
+    path  = path.lstrip("./")
+    parts = path.split("/")
+    for i, part in enumerate(parts[:-1]):
+        if _LMS_FOLDER.match(part):
+            return part, "/".join(parts[i + 1:])
+    if root and path.startswith(root + "/"):
+        path = path[len(root) + 1:]
+    folder, sep, rest = path.partition("/")
+    if not sep:
+        return os.path.splitext(folder)[0], folder
+    return folder, rest
+
+
+def _common_root(names: list[str]) -> str:
+    """A single wrapping directory around every student folder, if any."""
+    tops = {n.lstrip("./").split("/", 1)[0] for n in names if "/" in n.lstrip("./")}
+    if len(tops) == 1 and all("/" in n.lstrip("./") for n in names):
+        root = tops.pop()
+        # Only unwrap if the root itself is not a student folder
+        if not any(n.lstrip("./").count("/") == 1 for n in names):
+            return root
+    return ""
+
+
+def _submission(folder: str, files: dict, skipped: list) -> dict:
+    return {
+        "student": _student_of(folder),
+        "folder":  folder,
+        "files":   files,
+        "skipped": skipped,
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# iter_submissions
+# ─────────────────────────────────────────────────────────────────────────────
+def _iter_zip(path: str):
+    with zipfile.ZipFile(path) as zf:
+        infos = [i for i in zf.infolist() if not i.is_dir() and not _is_noise(i.filename)]
+        root  = _common_root([i.filename for i in infos])
+        # Central directory order is arbitrary; group by folder (metadata only)
+        keyed = sorted(((_split(i.filename, root), i) for i in infos), key=lambda k: k[0])
+
+        current, files, skipped = None, {}, []
+        for (folder, inner), info in keyed:
+            if folder != current:
+                if current is not None:
+                    yield _submission(current, files, skipped)
+                current, files, skipped = folder, {}, []
+            if not inner.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            if info.file_size > ARCHIVE_MAX_SOURCE_BYTES:
+                skipped.append(f"{inner} ({info.file_size} bytes, over the size limit)")
+                continue
+            with zf.open(info) as f:
+                files[inner] = f.read().decode("utf-8", errors="replace")
+        if current is not None:
+            yield _submission(current, files, skipped)
+
+
+def _iter_tar(fileobj):
+    # Stream mode: members arrive in archive order and cannot be revisited
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+        current, files, skipped, seen = None, {}, [], set()
+        for member in tf:
+            if not member.isfile() or _is_noise(member.name):
+                continue
+            folder, inner = _split(member.name)
+            if folder != current:
+                if current is not None:
+                    yield _submission(current, files, skipped)
+                    seen.add(current)
+                if folder in seen:
+                    logger.warning(f"iter_submissions: folder {folder!r} is not contiguous in the "
+                                   f"tarball; its later files are graded as a separate submission.")
+                current, files, skipped = folder, {}, []
+            if not inner.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            if member.size > ARCHIVE_MAX_SOURCE_BYTES:
+                skipped.append(f"{inner} ({member.size} bytes, over the size limit)")
+                continue
+            f = tf.extractfile(member)
+            files[inner] = f.read().decode("utf-8", errors="replace") if f else ""
+        if current is not None:
+            yield _submission(current, files, skipped)
+
+
+def iter_submissions(path: str):
+    """
+    Yields one dict per student folder: {"student", "folder", "files":
+    {relative path: text}, "skipped": [...]}. `path` may be a .zip, any
+    tarball tarfile can read, or "-" for a tarball on stdin.
+    """
+    if path == "-":
+        yield from _iter_tar(sys.stdin.buffer)
+    elif zipfile.is_zipfile(path):
+        yield from _iter_zip(path)
+    else:
+        with open(path, "rb") as f:
+            yield from _iter_tar(f)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# grade_archive
+# ─────────────────────────────────────────────────────────────────────────────
+def _pick_main(files: dict) -> tuple[str | None, list[str]]:
+    sources = sorted(n for n in files if n.lower().endswith(".c"))
+    if not sources:
+        return None, []
+    main = next((n for n in sources if _MAIN_DEF.search(files[n])), sources[0])
+    return main, [n for n in sources if n != main]
+
+
+def _grade_one(sub: dict, title: str, reports_dir: str | None) -> dict:
+    from orchestrator import grade_submission
+
+    row = {"student": sub["student"], "folder": sub["folder"], "skipped": sub["skipped"]}
+    files = sub["files"]
+    main, extra = _pick_main(files)
+    if main is None:
+        return {**row, "error": "No .c file in submission folder."}
+
+    separate = sum(bool(_MAIN_DEF.search(files[n])) for n in (main, *extra)) > 1
+    if len(files) > 1 and not separate:
+        source, extra = files, []
+    else:
+        source = files[main]
+
+    start  = time.perf_counter()
+    report = grade_submission(title, source, sub["student"])
+    row.update({
+        "source":      main,
+        "extra_files": extra,
+        "build":       report.get("build"),
+        "compiled":    report.get("compiled", False),
+        "total_score": report.get("total_score", 0),
+        "elapsed":     round(time.perf_counter() - start, 2),
+    })
+    if reports_dir:
+        name = re.sub(r"[^\w.-]+", "_", sub["folder"]).strip("_") or "submission"
+        with open(os.path.join(reports_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+    return row
+
+
+def grade_archive(path: str, title: str, workers: int = BATCH_GRADE_WORKERS,
+                  max_pending: int = ARCHIVE_MAX_PENDING, reports_dir: str | None = None):
+    """
+    Grades every submission in the archive and yields one summary row per
+    student in completion order. A reader thread walks the archive and
+    blocks once `max_pending` submissions are in flight or waiting to be
+    consumed; closing the generator early stops the reader.
+    """
+    from ast_generator import warm_parser
+
+    if reports_dir:
+        os.makedirs(reports_dir, exist_ok=True)
+
+    slots   = threading.BoundedSemaphore(max(max_pending, workers))
+    results = queue.Queue()
+    stop    = threading.Event()
+    done    = object()
+    pool    = ThreadPoolExecutor(max_workers=workers, initializer=warm_parser)
+
+    def grade(sub: dict):
+        try:
+            row = _grade_one(sub, title, reports_dir)
+        except Exception as e:
+            logger.error(f"grade_archive: grading {sub['folder']!r} failed — {e}")
+            row = {"student": sub["student"], "folder": sub["folder"], "error": str(e)}
+        results.put(row)
+
+    def read():
+        try:
+            for sub in iter_submissions(path):
+                slots.acquire()
+                if stop.is_set():
+                    break
+                pool.submit(grade, sub)
+        except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+            logger.error(f"grade_archive: cannot read {path} — {e}")
+            results.put({"error": f"Archive read failed: {e}"})
+        finally:
+            pool.shutdown(wait=True)
+            results.put(done)
+
+    threading.Thread(target=read, name="archive-reader", daemon=True).start()
+    try:
+        while (row := results.get()) is not done:
+            # The slot is freed only once the row leaves the queue
+            if "folder" in row:
+                slots.release()
+            yield row
+    finally:
+        stop.set()
+        # Unblock the reader if it is waiting for a slot
+        try:
+            slots.release()
+        except ValueError:
+            pass
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Grade an LMS ZIP / tar export, streaming JSONL results.")
+    ap.add_argument("archive", help=".zip, .tar[.gz|.bz2|.xz], or - for a tarball on stdin")
+    ap.add_argument("title", help="Program title used for grading")
+    ap.add_argument("--out", help="JSONL output file (default: stdout)")
+    ap.add_argument("--reports", help="Directory for the full per-student JSON reports")
+    ap.add_argument("--workers", type=int, default=BATCH_GRADE_WORKERS)
+    ap.add_argument("--max-pending", type=int, default=ARCHIVE_MAX_PENDING)
+    args = ap.parse_args(argv)
+
+    out = open(args.out, "a", encoding="utf-8") if args.out else sys.stdout
+    count, start = 0, time.perf_counter()
+    try:
+        for row in grade_archive(args.archive, args.title, args.workers,
+                                 args.max_pending, args.reports):
+            out.write(json.dumps(row, default=str) + "\n")
+            out.flush()
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    logger.info(f"Graded {count} submission(s) in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    main()
@@ -1,32 +1,193 @@
 """
 ast_generator.py
 Deterministic Test Case Generation using Abstract Syntax Trees (AST).
+
+Parsing first runs the real preprocessor (gcc -E) against the stand-in
+headers in fake_libc_include/, so FILE*, uint32_t, INT_MAX and the
+student's own #define constants resolve the way gcc sees them. The
+preprocessed text is cached on disk per source hash. The regex cleaner
+(clean_c_code_for_ast) is only a fallback for when gcc is unavailable or
+the source includes headers we do not fake.
 """
 
+import os
 import re
+import time
 import logging
+import threading
+import subprocess
+from functools import lru_cache
+
 from pycparser import c_parser, c_ast
 
+from cache import DiskCache, content_hash
+from config import CACHE_DIR
+from scheduler import resource_slot
+
 logger = logging.getLogger(__name__)
 
+FAKE_LIBC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_libc_include")
+_PREPROCESS_TIMEOUT = 10
+
+_preprocess_cache = DiskCache("preprocessed")
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"preprocessed": 0, "cleaned": 0, "failed": 0}
+
+# String/char literals are matched first so "//" inside a literal survives
+_COMMENT_OR_LITERAL = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*.*?(?:\*/|\Z)',
+    re.S,
+)
+
+def strip_comments(source_code: str) -> str:
+    """Removes C comments, keeping newlines so line numbers are unchanged."""
+    def _blank(m):
+        text = m.group(0)
+        if text.startswith(("//", "/*")):
+            return " " + "\n" * text.count("\n")
+        return text
+    return _COMMENT_OR_LITERAL.sub(_blank, source_code)
+
 def clean_c_code_for_ast(source_code: str) -> str:
     """
     pycparser does not support standard library macros and headers natively.
     This function strips #include directives and common macros so the AST
     can focus purely on the student's structural logic.
     """
+    # pycparser rejects comments outright
+    code = strip_comments(source_code)
+
     # Remove standard includes
-    code = re.sub(r'#include\s*<.*?>', '', source_code)
+    code = re.sub(r'#include\s*<.*?>', '', code)
     code = re.sub(r'#include\s*".*?"', '', code)
     
     # Add dummy typedefs if students use common standard types 
     # (prevents pycparser from crashing on unknown types)
+    # NULL needs no definition: pycparser does not resolve identifiers,
+    # and it rejects #define directives outright.
     dummy_typedefs = """
     typedef int size_t;
     typedef int bool;
-    #define NULL 0
     """
-    return dummy_typedefs + "\n" + code
+    # Line marker so AST coordinates refer to the student's own line numbers
+    return dummy_typedefs + '\n# 1 "<source>"\n' + code
+
+@lru_cache(maxsize=1)
+def _fake_libc_digest() -> str:
+    """Hash of the fake headers, so editing them invalidates cached output."""
+    parts = []
+    for root, _, files in sorted(os.walk(FAKE_LIBC_DIR)):
+        for name in sorted(files):
+            with open(os.path.join(root, name), "rb") as f:
+                parts.append(name.encode() + f.read())
+    return content_hash(*parts)
+
+def preprocess_c_source(source_code: str) -> str | None:
+    """
+    Runs `gcc -E` on the source against fake_libc_include/ and returns the
+    preprocessed text, or None if gcc fails (unknown header, bad directive)
+    or is not installed. Results, including failures, are cached per
+    source hash.
+    """
+    key = content_hash(source_code, _fake_libc_digest())
+    cached = _preprocess_cache.get(key)
+    if cached is not None:
+        return cached["text"]
+
+    try:
+        with resource_slot("compile"):
+            proc = subprocess.run(
+                ["gcc", "-E", "-nostdinc", "-std=gnu11", "-I", FAKE_LIBC_DIR, "-x", "c", "-"],
+                input=source_code, capture_output=True, text=True, timeout=_PREPROCESS_TIMEOUT
+            )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"preprocess_c_source: gcc -E unavailable ({e}).")
+        return None
+
+    text = proc.stdout if proc.returncode == 0 else None
+    if text is None:
+        logger.info(f"preprocess_c_source: gcc -E failed — {proc.stderr.strip()[:300]}")
+    _preprocess_cache.set(key, {"text": text})
+    return text
+
+def get_parser() -> c_parser.CParser:
+    """
+    The calling thread's CParser, built once and reused. CParser keeps
+    per-parse state, so threads never share one. Under pycparser 2.x the
+    optimize flags make PLY load the lexer/parser tables bundled with the
+    package instead of regenerating them, and any table it does have to
+    write lands in CACHE_DIR. pycparser 3.x has a hand-written parser with
+    no tables and ignores these arguments.
+    """
+    parser = getattr(_local, "parser", None)
+    if parser is None:
+        table_dir = os.path.join(CACHE_DIR, "pycparser_tables")
+        try:
+            os.makedirs(table_dir, exist_ok=True)
+        except OSError:
+            table_dir = ""
+        parser = c_parser.CParser(lex_optimize=True, yacc_optimize=True,
+                                  taboutputdir=table_dir)
+        _local.parser = parser
+    return parser
+
+def warm_parser():
+    """
+    Builds this thread's parser and runs one tiny parse and preprocess so
+    the first student submission does not pay the setup cost. Call at
+    worker startup; it is safe to call more than once.
+    """
+    start = time.perf_counter()
+    get_parser().parse("int main(void) { return 0; }", filename='<warmup>')
+    _fake_libc_digest()
+    logger.info(f"warm_parser: AST parser ready in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+@lru_cache(maxsize=64)
+def _parse_memo(source_hash: str, source_code: str) -> tuple[c_ast.FileAST | None, str]:
+    preprocessed = preprocess_c_source(source_code)
+    if preprocessed is not None:
+        try:
+            ast = get_parser().parse(preprocessed, filename='<stdin>')
+            method = "preprocessed"
+        except Exception as e:
+            logger.info(f"AST parse of preprocessed source failed: {e}. Trying regex cleaning.")
+            preprocessed = None
+
+    if preprocessed is None:
+        try:
+            clean_code = clean_c_code_for_ast(source_code)
+            ast = get_parser().parse(clean_code, filename='<stdin>')
+            method = "cleaned"
+        except Exception as e:
+            logger.error(f"AST Parsing failed: {e}. Falling back to default generation.")
+            ast, method = None, "failed"
+
+    with _stats_lock:
+        _stats[method] += 1
+    return ast, method
+
+def parse_c_source(source_code: str) -> c_ast.FileAST | None:
+    """
+    Parses student source into a pycparser AST, or returns None if it
+    cannot be parsed. Memoised per source hash, so input generation,
+    c_metrics.py and hotloops.py share one parse per submission. Callers
+    must treat the returned tree as read-only.
+    """
+    return _parse_memo(content_hash(source_code), source_code)[0]
+
+def parse_method(source_code: str) -> str:
+    """How parse_c_source() fared: "preprocessed", "cleaned" or "failed"."""
+    return _parse_memo(content_hash(source_code), source_code)[1]
+
+def ast_parse_stats() -> dict:
+    """Parse outcomes for distinct sources seen by this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = sum(stats.values())
+    stats["total"] = total
+    stats["success_rate"] = round((total - stats["failed"]) / total, 3) if total else None
+    return stats
 
 class ScanfVisitor(c_ast.NodeVisitor):
     """
@@ -52,11 +213,11 @@ def generate_inputs_from_ast(source_code: str) -> list[str] | None:
     5 deterministic boundary test cases.
     Returns None if parsing fails or no inputs are required.
     """
+    ast = parse_c_source(source_code)
+    if ast is None:
+        return None
+
     try:
-        clean_code = clean_c_code_for_ast(source_code)
-        parser = c_parser.CParser()
-        ast = parser.parse(clean_code, filename='<stdin>')
-        
         visitor = ScanfVisitor()
         visitor.visit(ast)
         
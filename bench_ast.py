@@ -0,0 +1,133 @@
+"""
+bench_ast.py
+Micro-benchmark for the AST front end (ast_generator.py).
+
+Usage:
+  python bench_ast.py [submission.c] [--repeat 50]
+
+Times, for one typical submission (a bundled sample unless a file is given):
+  - parser setup      new CParser() per call  vs  the reused per-thread parser
+  - parse             parsing with a fresh parser vs the reused one
+  - preprocess        gcc -E on a cache miss  vs  a DiskCache hit
+  - parse_c_source    end to end, cold (memo cleared) vs memoised
+Runs against a throwaway cache directory so the real cache is untouched.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+SAMPLE_SUBMISSION = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <stdint.h>
+
+#define MAX_N 1000
+
+/* Reads n integers and prints their sum, minimum, maximum and average */
+typedef struct {
+    int64_t sum;
+    int min, max;
+} Stats;
+
+static void update(Stats *s, int x) {
+    s->sum += x;
+    if (x < s->min) s->min = x;
+    if (x > s->max) s->max = x;
+}
+
+static int read_values(int *out, int limit) {
+    int n = 0;
+    while (n < limit && scanf("%d", &out[n]) == 1) {
+        n++;
+    }
+    return n;
+}
+
+int main(void) {
+    int *values = malloc(MAX_N * sizeof(int));
+    if (values == NULL) {
+        fprintf(stderr, "out of memory\n");
+        return 1;
+    }
+    int n = read_values(values, MAX_N);
+    if (n == 0) {
+        printf("No input\n");
+        free(values);
+        return 0;
+    }
+    Stats s = {0, values[0], values[0]};
+    for (int i = 0; i < n; i++) {
+        update(&s, values[i]);
+    }
+    printf("sum=%lld min=%d max=%d avg=%.2f\n",
+           (long long)s.sum, s.min, s.max, (double)s.sum / n);
+    free(values);
+    return 0;
+}
+"""
+
+
+def _time(fn, repeat: int) -> tuple[float, float]:
+    """(median, mean) wall time of fn() in milliseconds."""
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), statistics.fmean(samples)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark AST parse latency.")
+    ap.add_argument("source", nargs="?", help="C file to parse (default: bundled sample)")
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args(argv)
+
+    cache_dir = tempfile.mkdtemp(prefix="bench_ast_")
+    os.environ["AUTOGRADER_CACHE_DIR"] = cache_dir
+    try:
+        # Imported here so the throwaway cache directory is picked up
+        from pycparser import c_parser
+        import pycparser
+        import ast_generator as ag
+
+        src = open(args.source).read() if args.source else SAMPLE_SUBMISSION
+        # Unique trailing comment per call forces a preprocess cache miss
+        variant = lambda i, tag="": f"{src}\n/* {tag}{i} */\n"
+        preprocessed = ag.preprocess_c_source(src)
+        if preprocessed is None:
+            sys.exit("gcc -E failed on this source; nothing to benchmark.")
+
+        rows = [
+            ("parser setup",
+             _time(lambda i: c_parser.CParser(), args.repeat),
+             _time(lambda i: ag.get_parser(), args.repeat)),
+            ("parse",
+             _time(lambda i: c_parser.CParser().parse(preprocessed, filename="<stdin>"), args.repeat),
+             _time(lambda i: ag.get_parser().parse(preprocessed, filename="<stdin>"), args.repeat)),
+            ("preprocess",
+             _time(lambda i: ag.preprocess_c_source(variant(i)), args.repeat),
+             _time(lambda i: ag.preprocess_c_source(src), args.repeat)),
+            ("parse_c_source",
+             _time(lambda i: (ag._parse_memo.cache_clear(), ag.parse_c_source(variant(i, "e2e"))), args.repeat),
+             _time(lambda i: ag.parse_c_source(src), args.repeat)),
+        ]
+
+        print(f"pycparser {pycparser.__version__}, {len(src.splitlines())} source lines, "
+              f"{args.repeat} runs each (median / mean, ms)\n")
+        print(f"{'stage':<16}{'before':>20}{'after':>20}{'speed-up':>10}")
+        for name, (b_med, b_mean), (a_med, a_mean) in rows:
+            speedup = f"{b_med / a_med:.0f}x" if a_med > 0 else "-"
+            print(f"{name:<16}{b_med:>10.3f} /{b_mean:>8.3f}{a_med:>10.3f} /{a_mean:>8.3f}{speedup:>10}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
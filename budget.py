@@ -0,0 +1,106 @@
+"""
+budget.py
+Per-submission time budget and overload detection.
+
+Classes:
+  Budget               → deadline for one submission; decides which optional stages still fit
+
+Functions:
+  track()              → context manager counting submissions in flight (for overload)
+  overloaded()         → True when too many submissions run at once or the host is saturated
+
+The orchestrator creates one Budget per submission (or receives one from a
+caller with its own deadline, e.g. server.py) and passes it to every stage.
+Stages that always run (compile, tests, timing) only read it to cap network
+timeouts; optional stages ask `budget.allows(stage)` first and, when it says
+no, fall back to a cheap substitute and record it with `budget.degrade()`.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from config import (
+    SUBMISSION_BUDGET_SECONDS, BUDGET_RESERVE_SECONDS, STAGE_ESTIMATES,
+    OVERLOAD_IN_FLIGHT, OVERLOAD_LOAD_FACTOR,
+)
+
+logger = logging.getLogger(__name__)
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Overload detection
+# ─────────────────────────────────────────────────────────────────────────────
+@contextmanager
+def track():
+    """Counts one submission as in flight for the duration of the block."""
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+    try:
+        yield
+    finally:
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+def overloaded() -> bool:
+    if _in_flight > OVERLOAD_IN_FLIGHT:
+        return True
+    try:
+        return os.getloadavg()[0] > OVERLOAD_LOAD_FACTOR * (os.cpu_count() or 1)
+    except OSError:
+        return False
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Budget
+# ─────────────────────────────────────────────────────────────────────────────
+class Budget:
+    def __init__(self, seconds: float = SUBMISSION_BUDGET_SECONDS, deadline: float | None = None):
+        """`deadline` is an absolute time.time(); it wins over `seconds` when given."""
+        self.started  = time.time()
+        self.deadline = deadline if deadline is not None else self.started + seconds
+        self.degraded = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.time())
+
+    def elapsed(self) -> float:
+        return time.time() - self.started
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for a network call: `cap`, shortened to what is left (min 1 s)."""
+        return max(1.0, min(cap, self.remaining() - BUDGET_RESERVE_SECONDS))
+
+    def allows(self, stage: str) -> bool:
+        """
+        True if the optional `stage` should run at full quality: its estimate
+        plus the reserve still fits, and the system is not overloaded.
+        """
+        if overloaded():
+            logger.info(f"Budget: system overloaded; downgrading {stage}.")
+            return False
+        return self.remaining() >= STAGE_ESTIMATES.get(stage, 0.0) + BUDGET_RESERVE_SECONDS
+
+    def degrade(self, stage: str, reason: str):
+        """Records that `stage` ran in degraded mode."""
+        logger.warning(f"Budget: {stage} degraded — {reason}")
+        self.degraded.append({
+            "stage":     stage,
+            "reason":    reason,
+            "at":        round(self.elapsed(), 2),
+            "overload":  overloaded(),
+        })
+
+    def summary(self) -> dict:
+        return {
+            "budget_seconds": round(self.deadline - self.started, 1),
+            "elapsed":        round(self.elapsed(), 2),
+            "degraded":       [d["stage"] for d in self.degraded],
+        }
@@ -0,0 +1,317 @@
+"""
+build.py
+Multi-file submissions: per-translation-unit compiles with an object cache.
+
+Classes:
+  Project(files)        → {relative path: text} written to a temp tree; build(), cleanup()
+
+Functions:
+  amalgamate(files)     → one analysable C text (local headers inlined, #line markers kept)
+  read_zip(data)        → {relative path: text} of the .c / .h members of a ZIP
+  read_tree(path)       → the same for a directory on disk
+
+A project is built the way make would build it, minus the Makefile:
+
+  a.c ── gcc -E ── hash ──┬─ hit:  object from DiskCache("objects")
+  b.c ── gcc -E ── hash ──┤  miss: gcc -c  (parallel, "compile" slots)
+  c.c ── gcc -E ── hash ──┘
+                          └── link key = every object key ── hit: cached binary / miss: gcc *.o
+
+Objects are keyed by the preprocessed text (gcc -E -P), the unit's name and
+the compiler version, so an edit to one .c file recompiles only that unit,
+an edit to a header recompiles exactly the units that include it, and a
+comment-only edit recompiles nothing. Units are compiled from inside the
+project tree with relative paths, so no temp directory name reaches an
+object and cached objects link byte-identically into a later build.
+
+The grading agents read a single source file; Project.source_path is the
+amalgamation, with #line markers so line numbers still name the original
+file. Each header is inlined once (as if it had #pragma once), which is
+what analysis needs; the graded and sanitizer binaries are always built
+from the real units.
+"""
+
+import os
+import re
+import io
+import shutil
+import logging
+import zipfile
+import tempfile
+import functools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import DiskCache, content_hash
+from config import (
+    OBJECT_CACHE_ENABLED, BUILD_MAX_FILES, ARCHIVE_MAX_SOURCE_BYTES, RESOURCE_LIMITS,
+)
+from diagnostics import collect_diagnostics
+from scheduler import resource_slot
+
+logger = logging.getLogger(__name__)
+
+SOURCE_EXTENSIONS = (".c", ".h")
+_LOCAL_INCLUDE    = re.compile(r'^\s*#\s*include\s*"(?P<name>[^"]+)"')
+
+_objects = DiskCache("objects")
+_pool    = ThreadPoolExecutor(max_workers=RESOURCE_LIMITS["compile"], thread_name_prefix="build")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPERS
+# ─────────────────────────────────────────────────────────────────────────────
+@functools.cache
+def _compiler_id() -> str:
+    """First line of `gcc --version`; part of every cache key."""
+    try:
+        proc = subprocess.run(["gcc", "--version"], capture_output=True, text=True)
+        return proc.stdout.splitlines()[0] if proc.stdout else "gcc"
+    except OSError:
+        return "gcc"
+
+
+def _clean_name(name: str) -> str:
+    """Normalised relative path; ValueError for anything escaping the project."""
+    name = os.path.normpath(name.replace("\\", "/")).replace(os.sep, "/")
+    if os.path.isabs(name) or name == "." or name.split("/")[0] == "..":
+        raise ValueError(f"invalid file name in submission: {name!r}")
+    return name
+
+
+def _is_noise(name: str) -> bool:
+    return any(p.startswith(".") or p == "__MACOSX" for p in name.split("/") if p)
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _resolve(include: str, including: str, files: dict, include_dirs: list[str]) -> str | None:
+    """The project file a quoted #include refers to, searched like gcc -I."""
+    for base in (os.path.dirname(including), *include_dirs):
+        candidate = os.path.normpath(os.path.join(base, include)).replace(os.sep, "/")
+        if candidate in files:
+            return candidate
+    return None
+
+
+def _include_dirs(files: dict) -> list[str]:
+    return sorted({os.path.dirname(n) or "." for n in files if n.endswith(".h")})
+
+
+def _cached_warnings(unit: str, stderr: str) -> str:
+    """
+    Warnings of the compile that produced a cached object. The key ignores
+    blank lines and comments, so their line numbers may predate an edit.
+    """
+    if not stderr:
+        return ""
+    return (f"{unit}: warnings replayed from a cached compile of the same code; "
+            f"line numbers may be out of date\n{stderr}")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# amalgamate
+# ─────────────────────────────────────────────────────────────────────────────
+def amalgamate(files: dict) -> str:
+    """
+    Every .c file in path order with each local header inlined at its first
+    #include. System headers stay as #include lines.
+    """
+    include_dirs = _include_dirs(files)
+    seen, out = set(), []
+
+    def inline(name: str):
+        out.append(f'#line 1 "{name}"')
+        for lineno, line in enumerate(files[name].splitlines(), 1):
+            m = _LOCAL_INCLUDE.match(line)
+            target = m and _resolve(m.group("name"), name, files, include_dirs)
+            if not target:
+                out.append(line)
+                continue
+            if target not in seen:
+                seen.add(target)
+                inline(target)
+            out.append(f'#line {lineno + 1} "{name}"')
+
+    for name in sorted(n for n in files if n.endswith(".c")):
+        inline(name)
+    return "\n".join(out) + "\n"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# read_zip / read_tree
+# ─────────────────────────────────────────────────────────────────────────────
+def _strip_root(files: dict) -> dict:
+    """Drops a single directory wrapping every file ("project/a.c" → "a.c")."""
+    tops = {n.split("/", 1)[0] for n in files}
+    if len(tops) == 1 and all("/" in n for n in files):
+        return {n.split("/", 1)[1]: text for n, text in files.items()}
+    return files
+
+
+def read_zip(data: bytes) -> dict:
+    """The .c / .h members of a ZIP, keyed by their path inside it."""
+    files = {}
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        for info in zf.infolist():
+            name = info.filename
+            if info.is_dir() or _is_noise(name) or not name.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            if info.file_size > ARCHIVE_MAX_SOURCE_BYTES:
+                logger.warning(f"read_zip: skipping {name} ({info.file_size} bytes, over the size limit)")
+                continue
+            files[_clean_name(name)] = _decode(zf.read(info))
+    return _strip_root(files)
+
+
+def read_tree(path: str) -> dict:
+    """The .c / .h files below a directory, keyed by their relative path."""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = [d for d in dirnames if not _is_noise(d)]
+        for filename in filenames:
+            full = os.path.join(dirpath, filename)
+            name = os.path.relpath(full, path).replace(os.sep, "/")
+            if _is_noise(name) or not name.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            if os.path.getsize(full) > ARCHIVE_MAX_SOURCE_BYTES:
+                logger.warning(f"read_tree: skipping {name} (over the size limit)")
+                continue
+            with open(full, "rb") as f:
+                files[name] = _decode(f.read())
+    return files
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Project
+# ─────────────────────────────────────────────────────────────────────────────
+class Project:
+    """
+    One multi-file submission on disk:
+      root         — the source tree (only the submitted .c / .h files)
+      sources      — .c files, relative to root
+      cflags       — -I flags for every directory holding a header, relative to root
+      source_path  — the amalgamation the grading agents read
+      binary       — where build() links the executable
+    Always call cleanup().
+    """
+    def __init__(self, files: dict):
+        files = {_clean_name(n): text for n, text in files.items()
+                 if n.lower().endswith(SOURCE_EXTENSIONS)}
+        if not any(n.endswith(".c") for n in files):
+            raise ValueError("Submission has no .c file.")
+        if len(files) > BUILD_MAX_FILES:
+            raise ValueError(f"Submission has {len(files)} source files (limit {BUILD_MAX_FILES}).")
+
+        self.files       = files
+        self.workdir     = tempfile.mkdtemp(prefix="project-")
+        self.root        = os.path.join(self.workdir, "src")
+        self.sources     = sorted(n for n in files if n.endswith(".c"))
+        self.cflags      = [f"-I{d}" for d in _include_dirs(files)]
+        self.source_path = os.path.join(self.workdir, "submission.c")
+        self.binary      = os.path.join(self.workdir, "a.out")
+        self._objdir     = os.path.join(self.workdir, "obj")
+
+        os.makedirs(self._objdir)
+        for name, text in files.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        with open(self.source_path, "w", encoding="utf-8") as f:
+            f.write(amalgamate(files))
+
+    def _object_path(self, unit: str) -> str:
+        return os.path.join(self._objdir, unit.replace("/", "__")[:-2] + ".o")
+
+    def _compile_unit(self, unit: str) -> dict:
+        """Preprocess → key → cached object or gcc -c. Runs on the build pool."""
+        obj = self._object_path(unit)
+        with resource_slot("compile"):
+            pre = subprocess.run(["gcc", "-E", "-P", *self.cflags, unit],
+                                 cwd=self.root, capture_output=True, text=True)
+            if pre.returncode != 0:
+                return {"unit": unit, "status": "failed", "key": None, "errors": pre.stderr}
+            # Blank lines carry no code (no -g, __LINE__ is already expanded)
+            text = "\n".join(line for line in pre.stdout.splitlines() if line.strip())
+            key  = content_hash("object", _compiler_id(), unit, text)
+
+            if OBJECT_CACHE_ENABLED:
+                data = _objects.get_bytes(key)
+                if data is not None:
+                    with open(obj, "wb") as f:
+                        f.write(data)
+                    meta = _objects.get(key) or {}
+                    return {"unit": unit, "status": "reused", "key": key,
+                            "errors": _cached_warnings(unit, meta.get("stderr", ""))}
+
+            proc = subprocess.run(["gcc", "-c", *self.cflags, unit, "-o", obj],
+                                  cwd=self.root, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"unit": unit, "status": "failed", "key": None, "errors": proc.stderr}
+        if OBJECT_CACHE_ENABLED:
+            with open(obj, "rb") as f:
+                _objects.set_bytes(key, f.read())
+            _objects.set(key, {"unit": unit, "stderr": proc.stderr})
+        return {"unit": unit, "status": "compiled", "key": key, "errors": proc.stderr}
+
+    def _link(self, keys: list[str]) -> dict:
+        key = content_hash("link", _compiler_id(), *keys)
+        if OBJECT_CACHE_ENABLED:
+            data = _objects.get_bytes(key)
+            if data is not None:
+                with open(self.binary, "wb") as f:
+                    f.write(data)
+                os.chmod(self.binary, 0o755)
+                return {"status": "reused", "errors": ""}
+
+        objects = [self._object_path(u) for u in self.sources]
+        with resource_slot("compile"):
+            proc = subprocess.run(["gcc", *objects, "-o", self.binary],
+                                  capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"status": "failed", "errors": proc.stderr.replace(self._objdir + "/", "")}
+        if OBJECT_CACHE_ENABLED:
+            with open(self.binary, "rb") as f:
+                _objects.set_bytes(key, f.read())
+        return {"status": "linked", "errors": proc.stderr}
+
+    def build(self) -> dict:
+        """
+        compile_c_code()-shaped result for the whole project, plus
+          units  — {unit: "reused" | "compiled" | "failed"}
+          link   — "reused" | "linked" | "failed" | "skipped"
+        Units compile in parallel; the link runs only once all succeeded.
+        """
+        results = list(_pool.map(self._compile_unit, self.sources))
+        units   = {r["unit"]: r["status"] for r in results}
+        errors  = "".join(r["errors"] for r in results)
+        failed  = [r["unit"] for r in results if r["status"] == "failed"]
+        logger.info(f"Project.build: {sum(s == 'reused' for s in units.values())} of "
+                    f"{len(units)} unit(s) reused")
+
+        if failed:
+            return {
+                "success":     False,
+                "errors":      errors,
+                "binary":      self.binary,
+                "diagnostics": collect_diagnostics(failed[0], self.cflags, cwd=self.root),
+                "units":       units,
+                "link":        "skipped",
+            }
+
+        link = self._link([r["key"] for r in results])
+        return {
+            "success":     link["status"] != "failed",
+            "errors":      errors + link["errors"],
+            "binary":      self.binary,
+            # Link errors (undefined / duplicate symbols) have no source location
+            "diagnostics": None,
+            "units":       units,
+            "link":        link["status"],
+        }
+
+    def cleanup(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
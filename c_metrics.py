@@ -0,0 +1,241 @@
+"""
+c_metrics.py
+Single-pass AST metrics engine for student C code.
+
+Functions:
+  analyze_source(src)   → metrics dict (memoised per source hash)
+  scan_comments(src)    → comment / code-line counts that ignore string literals
+
+One c_ast.NodeVisitor pass over the pycparser AST (see ast_generator.py)
+yields, per function:
+  - cyclomatic complexity  (1 + if / loop / case / ?: / && / ||)
+  - maximum nesting depth  (if / for / while / do / switch)
+  - statement count, parameter count
+  - Halstead volume        (N · log2 n over operators and operands)
+plus file-wide loop and branch counts. design_agent and performance_agent
+read these instead of running several regex scans over raw text, which
+misfire on string literals and commented-out code.
+"""
+
+import math
+import logging
+from functools import lru_cache
+
+from pycparser import c_ast
+
+from ast_generator import parse_c_source
+from cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+_DECISIONS = (c_ast.If, c_ast.For, c_ast.While, c_ast.DoWhile, c_ast.Case, c_ast.TernaryOp)
+_NESTING   = (c_ast.If, c_ast.For, c_ast.While, c_ast.DoWhile, c_ast.Switch)
+_LOOPS     = (c_ast.For, c_ast.While, c_ast.DoWhile)
+_BRANCHES  = (c_ast.If, c_ast.Switch, c_ast.Case)
+_KEYWORD_OPERATORS = {
+    c_ast.If: "if", c_ast.For: "for", c_ast.While: "while", c_ast.DoWhile: "do",
+    c_ast.Switch: "switch", c_ast.Case: "case", c_ast.Default: "default",
+    c_ast.Return: "return", c_ast.Break: "break", c_ast.Continue: "continue",
+    c_ast.Goto: "goto", c_ast.TernaryOp: "?:",
+}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# scan_comments — lexical pass that understands string / char literals
+# ─────────────────────────────────────────────────────────────────────────────
+def _looks_like_code(text: str) -> bool:
+    t = text.strip()
+    return bool(t) and (t.endswith((";", "{", "}")) or t.startswith(("#include", "printf(", "return ")))
+
+
+def scan_comments(src: str) -> dict:
+    """
+    Returns {"comments", "commented_out_code", "code_lines"}. Comment markers
+    inside "..." or '...' are ignored; comments whose body looks like C
+    statements are counted as commented-out code, not documentation.
+    """
+    comments, commented_code = 0, 0
+    code_lines = set()
+    i, n, line = 0, len(src), 1
+
+    while i < n:
+        c = src[i]
+        if c == "\n":
+            line += 1
+            i += 1
+        elif src.startswith("//", i):
+            end = src.find("\n", i)
+            end = n if end == -1 else end
+            body = src[i + 2:end]
+            if _looks_like_code(body):
+                commented_code += 1
+            else:
+                comments += 1
+            i = end
+        elif src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            body = src[i + 2:end - 2]
+            if all(_looks_like_code(l) or not l.strip() for l in body.splitlines()) and body.strip():
+                commented_code += 1
+            else:
+                comments += 1
+            line += src.count("\n", i, end)
+            i = end
+        elif c in "\"'":
+            code_lines.add(line)
+            j = i + 1
+            while j < n and src[j] != c and src[j] != "\n":
+                j += 2 if src[j] == "\\" else 1
+            i = j + 1
+        else:
+            if not c.isspace():
+                code_lines.add(line)
+            i += 1
+
+    return {
+        "comments":           comments,
+        "commented_out_code": commented_code,
+        "code_lines":         len(code_lines),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MetricsVisitor — the single AST pass
+# ─────────────────────────────────────────────────────────────────────────────
+class MetricsVisitor(c_ast.NodeVisitor):
+    def __init__(self):
+        self.functions = []
+        self.loops     = 0
+        self.branches  = 0
+        self._fn       = None
+        self._depth    = 0
+
+    # ── per-function bookkeeping ─────────────────────────────────────────────
+    def visit_FuncDef(self, node):
+        params = 0
+        args   = getattr(node.decl.type, "args", None)
+        if args is not None:
+            params = sum(
+                1 for p in args.params
+                if not (isinstance(p, c_ast.Typename) and getattr(p.type, "type", None) is not None
+                        and getattr(p.type.type, "names", None) == ["void"])
+                and not isinstance(p, c_ast.EllipsisParam)
+            )
+        self._fn = {
+            "name":        node.decl.name,
+            "line":        node.coord.line if node.coord else None,
+            "params":      params,
+            "statements":  0,
+            "complexity":  1,
+            "max_nesting": 0,
+            "_operators":  {},
+            "_operands":   {},
+        }
+        self._depth = 0
+        self.visit(node.body)
+        fn = self._fn
+        self._fn = None
+
+        ops, opnds = fn.pop("_operators"), fn.pop("_operands")
+        vocabulary = len(ops) + len(opnds)
+        length     = sum(ops.values()) + sum(opnds.values())
+        fn["halstead_volume"] = round(length * math.log2(vocabulary), 1) if vocabulary > 1 else 0.0
+        self.functions.append(fn)
+
+    def _op(self, kind: str, token: str):
+        if self._fn is not None:
+            bag = self._fn[kind]
+            bag[token] = bag.get(token, 0) + 1
+
+    # ── generic dispatch ─────────────────────────────────────────────────────
+    def generic_visit(self, node):
+        fn = self._fn
+        if fn is not None:
+            if isinstance(node, _DECISIONS):
+                fn["complexity"] += 1
+            if isinstance(node, c_ast.BinaryOp) and node.op in ("&&", "||"):
+                fn["complexity"] += 1
+            if isinstance(node, c_ast.Compound) and node.block_items:
+                fn["statements"] += sum(
+                    1 for item in node.block_items if not isinstance(item, c_ast.Compound)
+                )
+
+            keyword = _KEYWORD_OPERATORS.get(type(node))
+            if keyword:
+                self._op("_operators", keyword)
+            if isinstance(node, (c_ast.BinaryOp, c_ast.UnaryOp, c_ast.Assignment)):
+                self._op("_operators", node.op)
+            elif isinstance(node, c_ast.FuncCall):
+                self._op("_operators", "()")
+            elif isinstance(node, c_ast.ArrayRef):
+                self._op("_operators", "[]")
+            elif isinstance(node, c_ast.StructRef):
+                self._op("_operators", node.type)
+            elif isinstance(node, c_ast.ID):
+                self._op("_operands", node.name)
+            elif isinstance(node, c_ast.Constant):
+                self._op("_operands", node.value)
+
+        if isinstance(node, _LOOPS):
+            self.loops += 1
+        if isinstance(node, _BRANCHES):
+            self.branches += 1
+
+        nests = isinstance(node, _NESTING)
+        if nests:
+            self._depth += 1
+            if fn is not None:
+                fn["max_nesting"] = max(fn["max_nesting"], self._depth)
+        # An "else if" chain is one level, not one level per else
+        for name, child in node.children():
+            if nests and name == "iffalse" and isinstance(child, c_ast.If):
+                self._depth -= 1
+                self.visit(child)
+                self._depth += 1
+            else:
+                self.visit(child)
+        if nests:
+            self._depth -= 1
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# analyze_source
+# ─────────────────────────────────────────────────────────────────────────────
+@lru_cache(maxsize=256)
+def _analyze_cached(source_hash: str, src: str) -> dict:
+    metrics = scan_comments(src)
+    ast     = parse_c_source(src)
+    metrics["parsed"] = ast is not None
+    if ast is None:
+        return metrics
+
+    visitor = MetricsVisitor()
+    visitor.visit(ast)
+    fns = visitor.functions
+
+    metrics.update({
+        "functions":        fns,
+        "function_count":   len(fns),
+        "loops":            visitor.loops,
+        "branches":         visitor.branches,
+        "max_complexity":   max((f["complexity"] for f in fns), default=0),
+        "avg_complexity":   round(sum(f["complexity"] for f in fns) / len(fns), 2) if fns else 0.0,
+        "max_nesting":      max((f["max_nesting"] for f in fns), default=0),
+        "max_statements":   max((f["statements"] for f in fns), default=0),
+        "max_params":       max((f["params"] for f in fns), default=0),
+        "halstead_volume":  round(sum(f["halstead_volume"] for f in fns), 1),
+    })
+    worst = max(fns, key=lambda f: f["complexity"], default=None)
+    metrics["worst_function"] = worst["name"] if worst else ""
+    return metrics
+
+
+def analyze_source(src: str) -> dict:
+    """
+    Metrics for a C source string. Memoised per source hash, so the design
+    and performance agents share one parse per submission. `parsed` is
+    False when pycparser rejected the code; only the lexical counts
+    (comments, code_lines) are present then.
+    """
+    return _analyze_cached(content_hash(src), src)
@@ -0,0 +1,84 @@
+"""
+cache.py
+Small on-disk cache shared by the grading pipeline.
+
+Classes:
+  DiskCache(namespace)   → JSON / bytes values stored under CACHE_DIR/<namespace>/
+
+Functions:
+  content_hash(*parts)   → stable sha256 over str / bytes parts
+
+Writes go through a temp file + os.replace, so concurrent Streamlit
+sessions and worker processes never observe a half-written entry.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+from config import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(*parts) -> str:
+    """sha256 over the given parts; str parts are UTF-8 encoded."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, (bytes, bytearray)):
+            part = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class DiskCache:
+    """
+    Key → value store on disk. Keys are hex digests (see content_hash);
+    entries are sharded by the first two characters to keep directories small.
+    """
+    def __init__(self, namespace: str, root: str = CACHE_DIR):
+        self.dir = os.path.join(root, namespace)
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.dir, key[:2], f"{key}{ext}")
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"DiskCache: write failed for {path} — {e}")
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    # ── JSON values ──────────────────────────────────────────────────────────
+    def get(self, key: str):
+        try:
+            with open(self._path(key, ".json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, value):
+        self._write(self._path(key, ".json"), json.dumps(value).encode("utf-8"))
+
+    # ── Raw bytes ────────────────────────────────────────────────────────────
+    def get_bytes(self, key: str) -> bytes | None:
+        try:
+            with open(self._path(key, ".bin"), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set_bytes(self, key: str, data: bytes):
+        self._write(self._path(key, ".bin"), data)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 WEIGHTS = {
     "design": 15.0,
@@ -10,6 +11,39 @@ WEIGHTS = {
 
 TEST_TIMEOUT_SECONDS = 2
 
+# ✅ OUTPUT CAPTURE
+# stdout beyond OUTPUT_LIMIT_BYTES kills the run; passing cases larger than
+# OUTPUT_EXCERPT_CHARS are stored as a head/tail excerpt only.
+OUTPUT_LIMIT_BYTES   = 1024 * 1024
+OUTPUT_EXCERPT_CHARS = 2000
+
+# ✅ SANDBOX LIMITS (applied to every student binary run)
+# "default" applies to all assignments; add an entry keyed by the program
+# title to override individual limits for one assignment.
+#   cpu_seconds   → RLIMIT_CPU (SIGXCPU, then SIGKILL one second later); while it
+#                   is not below the wall timeout, a timeout spent busy on the
+#                   CPU is reported as the "cpu" kill instead (runner.py)
+#   memory_mb     → RLIMIT_AS, and memory.max when cgroups are enabled
+#   max_processes → RLIMIT_NPROC (0 = the program may not fork) / pids.max
+#   file_size_mb  → RLIMIT_FSIZE
+#   open_files    → RLIMIT_NOFILE
+#   cpu_cores     → cpu.max quota (cgroup only)
+SANDBOX_LIMITS = {
+    "default": {
+        "cpu_seconds":   2,
+        "memory_mb":     256,
+        "max_processes": 0,
+        "file_size_mb":  8,
+        "open_files":    32,
+        "cpu_cores":     1.0,
+    },
+}
+
+# Optional cgroup v2 placement. CGROUP_ROOT must be a delegated, writable
+# cgroup with the cpu, memory and pids controllers enabled for children.
+CGROUP_ENABLED = os.getenv("AUTOGRADER_CGROUP", "") == "1"
+CGROUP_ROOT    = os.getenv("AUTOGRADER_CGROUP_ROOT", "/sys/fs/cgroup/autograder")
+
 # ✅ LLM API KEYS (SET AS ENV VARIABLES)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -17,3 +51,131 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GROQ_MODEL = "llama-3.1-8b-instant"
 GEMINI_MODEL = "gemini-2.5-flash"
 
+# Optional endpoint overrides, e.g. http://127.0.0.1:8799 for llm_stub.py
+GROQ_BASE_URL   = os.getenv("GROQ_BASE_URL", "")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+
+# ✅ LLM PROVIDERS (see llm_providers.py)
+# Backend per task: "groq", "gemini", "openai" (any OpenAI-compatible
+# endpoint), "fake" (deterministic, offline) or "replay" (from a cassette).
+# AUTOGRADER_LLM_PROVIDER sets every task; AUTOGRADER_LLM_<TASK> overrides one.
+_LLM_ALL = os.getenv("AUTOGRADER_LLM_PROVIDER", "")
+LLM_PROVIDERS = {
+    "inputs":  os.getenv("AUTOGRADER_LLM_INPUTS",  _LLM_ALL or "groq"),    # test input generation
+    "report":  os.getenv("AUTOGRADER_LLM_REPORT",  _LLM_ALL or "gemini"),  # final academic report
+    "explain": os.getenv("AUTOGRADER_LLM_EXPLAIN", _LLM_ALL or "gemini"),  # compiler error hints
+    "ocr":     os.getenv("AUTOGRADER_LLM_OCR",     _LLM_ALL or "gemini"),  # handwritten code
+}
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "http://127.0.0.1:11434/v1")
+OPENAI_API_KEY  = os.getenv("OPENAI_API_KEY", "")
+OPENAI_MODEL    = os.getenv("OPENAI_MODEL", "llama3.1")
+
+LLM_CASSETTE_DIR    = os.getenv("AUTOGRADER_LLM_CASSETTE", "")          # record / replay directory
+LLM_RECORD          = os.getenv("AUTOGRADER_LLM_RECORD", "") == "1"     # record real answers into it
+LLM_REPLAY_FALLBACK = os.getenv("AUTOGRADER_LLM_REPLAY_FALLBACK", "")   # backend asked on a replay miss
+
+
+# ✅ ON-DISK CACHE (OCR pages, compiler explanations, ...)
+CACHE_DIR = os.getenv(
+    "AUTOGRADER_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "autograder_cache")
+)
+
+# ✅ INCREMENTAL REGRADING (stage_cache.py — per-stage results keyed by their inputs)
+STAGE_CACHE_ENABLED = os.getenv("AUTOGRADER_STAGE_CACHE", "1") == "1"
+
+# ✅ MULTI-FILE BUILDS (build.py — one object per translation unit, cached by preprocessed text)
+OBJECT_CACHE_ENABLED = os.getenv("AUTOGRADER_OBJECT_CACHE", "1") == "1"
+BUILD_MAX_FILES      = int(os.getenv("AUTOGRADER_BUILD_MAX_FILES", "64"))   # .c + .h per submission
+
+# ✅ OCR PIPELINE
+OCR_RENDER_DPI      = 150         # upper bound; pages are downscaled to the pixel budget
+OCR_MAX_PIXELS      = 1_600_000   # per page, after downscaling
+OCR_JPEG_QUALITY    = 70
+OCR_RENDER_WORKERS  = int(os.getenv("OCR_RENDER_WORKERS", "4"))
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))   # Gemini requests in flight
+
+# ✅ BATCH SCAN INGESTION (scan_batch.py)
+BATCH_OCR_DOCUMENTS = int(os.getenv("BATCH_OCR_DOCUMENTS", "3"))   # documents transcribed at once
+BATCH_GRADE_WORKERS = int(os.getenv("BATCH_GRADE_WORKERS", "2"))   # submissions graded at once
+
+# ✅ RUBRIC & CLASS RESULTS
+# RUBRIC_PATH optionally points at a JSON rubric overriding rubric.RUBRIC.
+RUBRIC_PATH = os.getenv("AUTOGRADER_RUBRIC", "")
+RESULTS_DIR = os.getenv("AUTOGRADER_RESULTS_DIR", os.path.join(CACHE_DIR, "results"))
+# Class-wide index of per-case output hashes (output_index.py)
+OUTPUT_INDEX_PATH = os.getenv("AUTOGRADER_OUTPUT_INDEX", os.path.join(RESULTS_DIR, "output_index.sqlite"))
+OUTPUT_SAMPLE_CHARS = 2000   # stored preview of one representative output per cluster
+
+# ✅ PROFILING (profiling.py — opt-in, zero cost when off)
+PROFILE_ENABLED         = os.getenv("AUTOGRADER_PROFILE", "") == "1"
+PROFILE_DIR             = os.getenv("AUTOGRADER_PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))
+PROFILE_SAMPLE_INTERVAL = 0.005   # seconds between stack samples (collapsed stacks)
+PROFILE_TOP             = 25      # functions / allocation sites listed in summaries
+
+# ✅ PDF REPORTS (utils.pdf_bytes)
+PDF_CACHE_ENTRIES = 32   # rendered PDFs kept in memory, keyed by report hash
+
+# ✅ ARCHIVE INGESTION (archive_ingest.py — LMS ZIP / tar exports)
+ARCHIVE_MAX_SOURCE_BYTES = 256 * 1024                                 # larger members are skipped
+ARCHIVE_MAX_PENDING      = int(os.getenv("ARCHIVE_MAX_PENDING", "4"))  # submissions held in memory
+
+# ✅ HTTP GRADING SERVICE (server.py)
+SERVER_HOST            = os.getenv("AUTOGRADER_HOST", "127.0.0.1")
+SERVER_PORT            = int(os.getenv("AUTOGRADER_PORT", "8765"))
+SERVER_TOKEN           = os.getenv("AUTOGRADER_TOKEN", "")               # optional bearer token
+SERVER_WORKERS         = int(os.getenv("AUTOGRADER_WORKERS", "4"))       # submissions graded at once
+SERVER_MAX_QUEUE       = int(os.getenv("AUTOGRADER_MAX_QUEUE", "16"))    # running + waiting; beyond → 429
+SERVER_JOB_TIMEOUT     = int(os.getenv("AUTOGRADER_JOB_TIMEOUT", "120")) # seconds, default per job
+SERVER_REQUEST_TIMEOUT = 30               # socket timeout for one HTTP request
+SERVER_MAX_BODY_BYTES  = 512 * 1024
+SERVER_JOB_TTL         = 3600             # finished jobs are forgotten after this many seconds
+
+# ✅ TIME BUDGET & DEGRADED MODE (budget.py)
+# Every submission gets SUBMISSION_BUDGET_SECONDS of wall time. An optional
+# stage runs only if its estimate (plus the reserve kept for the stages that
+# always run) still fits, and the system is not overloaded; otherwise it is
+# downgraded and the report's "degraded" list says so.
+SUBMISSION_BUDGET_SECONDS = float(os.getenv("AUTOGRADER_BUDGET", "60"))
+BUDGET_RESERVE_SECONDS    = 5.0
+STAGE_ESTIMATES = {
+    "llm_inputs":    10.0,   # Groq input generation  → generic inputs
+    "gemini_report": 20.0,   # Gemini final report     → templated summary
+    "sanitizer":     3.0,    # ASan/UBSan shadow build → skipped
+}
+OVERLOAD_IN_FLIGHT   = int(os.getenv("AUTOGRADER_OVERLOAD_IN_FLIGHT", str(os.cpu_count() or 4)))
+OVERLOAD_LOAD_FACTOR = 1.5   # 1-min load average above cpu_count × this = overloaded
+
+# ✅ SCHEDULER (scheduler.py — process-wide admission & resource classes)
+# At most SCHEDULER_MAX_ACTIVE submissions are graded at once; the rest wait
+# in a per-student round-robin queue. Independently, each resource class
+# caps how many gcc / student-binary / LLM operations run concurrently, so
+# timings are not distorted by oversubscribed cores.
+SCHEDULER_MAX_ACTIVE = int(os.getenv("AUTOGRADER_MAX_ACTIVE", str(os.cpu_count() or 4)))
+RESOURCE_LIMITS = {
+    "compile": int(os.getenv("AUTOGRADER_COMPILE_SLOTS", str(os.cpu_count() or 4))),
+    "exec":    int(os.getenv("AUTOGRADER_EXEC_SLOTS", str(os.cpu_count() or 4))),
+    "llm":     int(os.getenv("AUTOGRADER_LLM_SLOTS", "4")),
+    # Sanitizer shadow builds and runs (sanitizers.py); half the cores by
+    # default so the graded compile / test runs keep theirs
+    "sanitize": int(os.getenv("AUTOGRADER_SANITIZE_SLOTS", str(max(1, (os.cpu_count() or 2) // 2)))),
+}
+SCHEDULER_INITIAL_ESTIMATE = 15.0   # seconds per submission until real timings exist
+
+# ✅ DISTRIBUTED QUEUE (dist_queue.py — shared-filesystem work queue)
+# All grading hosts mount the same DIST_QUEUE_DIR (e.g. NFS). Hosts must
+# keep their clocks in sync (NTP); leases are compared against wall time.
+DIST_QUEUE_DIR         = os.getenv("AUTOGRADER_QUEUE_DIR", os.path.join(CACHE_DIR, "queue"))
+DIST_LEASE_SECONDS     = 60     # a claim expires unless renewed within this time
+DIST_HEARTBEAT_SECONDS = 10     # how often a worker renews its lease
+DIST_MAX_ATTEMPTS      = 3      # claims per job before it is moved to failed/
+DIST_POLL_SECONDS      = 1.0    # idle worker polling interval
+
+# ✅ SANITIZER SHADOW BUILD (sanitizers.py — ASan/UBSan alongside the graded build)
+SANITIZER_ENABLED       = os.getenv("AUTOGRADER_SANITIZE", "1") == "1"
+SANITIZER_FLAGS         = ["-g", "-O1", "-fno-omit-frame-pointer",
+                           "-fsanitize=address,undefined", "-fsanitize-recover=all"]
+SANITIZER_SLOWDOWN      = 3.0   # timeout / CPU-limit multiplier for instrumented runs
+SANITIZER_RSS_FACTOR    = 3     # ASan hard_rss_limit_mb = memory_mb × this (replaces RLIMIT_AS)
+SANITIZER_NICE          = 10    # shadow runs yield the CPU to the graded runs
+SANITIZER_GRACE_SECONDS = 2.0   # extra wait for unfinished shadow runs before scoring
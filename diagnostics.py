@@ -0,0 +1,158 @@
+"""
+diagnostics.py
+Normalised gcc diagnostics and error signatures.
+
+Functions:
+  collect_diagnostics(src, …)  → gcc -fdiagnostics-format=json diagnostics (None if unsupported)
+  parse_text_log(log)          → diagnostics parsed from a plain gcc / ld log
+  normalize_message(msg)       → message with identifiers, numbers and paths stripped
+  error_signature(log, diags)  → (signature, normalised lines)
+
+Two students who forget the same semicolon get different raw logs (file
+names, line numbers, variable names) but the same signature, so the
+explanation generated for the first one can be served to the second from
+cache without another LLM call.
+"""
+
+import re
+import json
+import logging
+import subprocess
+
+from cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+_C_KEYWORDS = {
+    "auto", "break", "case", "char", "const", "continue", "default", "do",
+    "double", "else", "enum", "extern", "float", "for", "goto", "if", "inline",
+    "int", "long", "register", "restrict", "return", "short", "signed",
+    "sizeof", "static", "struct", "switch", "typedef", "union", "unsigned",
+    "void", "volatile", "while", "_Bool", "bool",
+}
+
+# Library names are kept: "implicit declaration of printf" (missing header)
+# needs a different explanation than the same error on a student function.
+_LIBC_NAMES = {
+    "printf", "scanf", "fprintf", "sprintf", "snprintf", "puts", "gets",
+    "fgets", "getchar", "putchar", "fopen", "fclose", "malloc", "calloc",
+    "realloc", "free", "exit", "strlen", "strcpy", "strncpy", "strcmp",
+    "strcat", "memcpy", "memset", "sqrt", "pow", "abs", "fabs", "rand",
+    "srand", "time", "main", "NULL", "FILE", "size_t", "EOF",
+}
+
+_TEXT_DIAG_RE = re.compile(
+    r"^(?P<file>[^:\n]+):(?P<line>\d+):(?:(?P<col>\d+):)?\s*"
+    r"(?P<kind>fatal error|error|warning|note):\s*(?P<message>.*)$"
+)
+_LINKER_RE = re.compile(r"(undefined reference to|multiple definition of)\s*[`'‘\"](?P<name>[^'’\"]+)['’\"]")
+_QUOTED_RE = re.compile(r"[‘'`\"]([^’'\"]*)[’'\"]")
+_IDENT_RE  = re.compile(r"\b[A-Za-z_]\w*\b")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# collect_diagnostics
+# ─────────────────────────────────────────────────────────────────────────────
+def collect_diagnostics(src: str, cflags=(), cwd: str | None = None) -> list[dict] | None:
+    """
+    Re-runs the front end with JSON diagnostics. `cflags` (e.g. -I flags)
+    and `cwd` must match the failed compile, or a unit including a project
+    header fails on the #include instead. Returns None when gcc does not
+    support the flag, so callers fall back to parse_text_log().
+    """
+    try:
+        proc = subprocess.run(
+            ["gcc", "-fsyntax-only", "-fdiagnostics-format=json", *cflags, src],
+            capture_output=True, text=True, timeout=10, cwd=cwd
+        )
+        raw = json.loads(proc.stderr or "[]")
+    except (OSError, subprocess.TimeoutExpired, ValueError) as e:
+        logger.info(f"collect_diagnostics: JSON diagnostics unavailable ({e}).")
+        return None
+
+    diags = []
+    for d in raw:
+        loc = (d.get("locations") or [{}])[0].get("caret", {})
+        diags.append({
+            "kind":    d.get("kind", "error"),
+            "message": d.get("message", ""),
+            "option":  d.get("option", ""),
+            "line":    loc.get("line"),
+            "column":  loc.get("column"),
+        })
+    return diags
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# parse_text_log
+# ─────────────────────────────────────────────────────────────────────────────
+def parse_text_log(log: str) -> list[dict]:
+    diags = []
+    for line in log.splitlines():
+        m = _TEXT_DIAG_RE.match(line.strip())
+        if m:
+            message = m.group("message")
+            option  = ""
+            opt = re.search(r"\s\[(-W[\w=-]+)\]$", message)
+            if opt:
+                option  = opt.group(1)
+                message = message[:opt.start()]
+            diags.append({
+                "kind":    m.group("kind"),
+                "message": message,
+                "option":  option,
+                "line":    int(m.group("line")),
+                "column":  int(m.group("col")) if m.group("col") else None,
+            })
+            continue
+        m = _LINKER_RE.search(line)
+        if m:
+            diags.append({
+                "kind": "error", "message": line[m.start():].strip(),
+                "option": "", "line": None, "column": None,
+            })
+    return diags
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# normalize_message / error_signature
+# ─────────────────────────────────────────────────────────────────────────────
+def _normalize_quoted(text: str) -> str:
+    def ident(m):
+        word = m.group(0)
+        return word if word in _C_KEYWORDS or word in _LIBC_NAMES else "ID"
+    return _IDENT_RE.sub(ident, text)
+
+
+def normalize_message(message: str) -> str:
+    """
+    "'total' undeclared (first use in this function)" → "'ID' undeclared (...)".
+    Quoted punctuation (expected ';' / ')') and C keywords / types survive.
+    """
+    msg = _QUOTED_RE.sub(lambda m: f"'{_normalize_quoted(m.group(1))}'", message)
+    msg = re.sub(r"(/[\w.\-]+)+", "PATH", msg)
+    msg = re.sub(r"\b\d+\b", "N", msg)
+    return re.sub(r"\s+", " ", msg).strip()
+
+
+def error_signature(error_log: str, diagnostics: list[dict] | None = None) -> tuple[str, list[str]]:
+    """
+    Returns (signature, normalised_lines). Errors and warnings are
+    de-duplicated and sorted, so repeats and ordering do not matter; notes
+    are ignored. Falls back to the whole log, normalised, when nothing
+    could be parsed.
+    """
+    text_diags = parse_text_log(error_log)
+    if diagnostics:
+        # -fsyntax-only never reaches the linker; keep ld errors from the log
+        diags = diagnostics + [d for d in text_diags if d["line"] is None]
+    else:
+        diags = text_diags
+    lines = sorted({
+        f"{d['kind']}: {normalize_message(d['message'])}"
+        + (f" [{d['option']}]" if d.get("option") else "")
+        for d in diags if d["kind"] != "note"
+    })
+    if not lines:
+        lines = [normalize_message(l) for l in error_log.splitlines() if l.strip()]
+    return content_hash("gcc-signature-v1", *lines), lines
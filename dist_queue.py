@@ -0,0 +1,345 @@
+"""
+dist_queue.py
+Multi-node grading through a directory queue on a shared filesystem.
+
+Classes:
+  WorkQueue(root)          → submit / claim / heartbeat / complete / fail / reap / status
+
+Functions:
+  run_worker(queue, ...)   → claim-grade-complete loop for one worker process
+
+Usage:
+  python dist_queue.py submit  sum.c --title "Sum of digits" --student "Jane Doe"
+  python dist_queue.py submit  project/ --title "Sum of digits"   (multi-file: every .c / .h below it)
+  python dist_queue.py worker  [--id host-a-1] [--once]
+  python dist_queue.py status
+  python dist_queue.py result  <job_id>
+  (all take --queue DIR, default DIST_QUEUE_DIR)
+
+Layout under the queue root (one directory per state, one JSON file per job):
+  incoming/   waiting jobs; names sort in submission order
+  claimed/    jobs a worker is grading — moved here by an atomic rename, so
+              exactly one worker wins each job
+  leases/     <job_id>.lease: owner, host and expiry, renewed every
+              DIST_HEARTBEAT_SECONDS while the worker is alive
+  done/       results;  failed/  jobs that errored or expired too often
+  tmp/        staging area: every file is written here and renamed into place
+
+No broker is needed: rename() is atomic within one filesystem (including
+NFS), so a claim, a requeue or a result is either fully visible or absent.
+Any worker periodically reaps claimed jobs whose lease has expired (the
+worker died or lost the share) and puts them back in incoming/. A worker
+that finds its lease was taken over discards its result.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import argparse
+import threading
+
+from config import (
+    DIST_QUEUE_DIR, DIST_LEASE_SECONDS, DIST_HEARTBEAT_SECONDS,
+    DIST_MAX_ATTEMPTS, DIST_POLL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+_STATES = ("incoming", "claimed", "leases", "done", "failed", "tmp")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# WorkQueue
+# ─────────────────────────────────────────────────────────────────────────────
+class WorkQueue:
+    def __init__(self, root: str = DIST_QUEUE_DIR, lease_seconds: float = DIST_LEASE_SECONDS,
+                 max_attempts: int = DIST_MAX_ATTEMPTS):
+        self.root          = root
+        self.lease_seconds = lease_seconds
+        self.max_attempts  = max_attempts
+        for state in _STATES:
+            os.makedirs(self._dir(state), exist_ok=True)
+
+    # ── file helpers ─────────────────────────────────────────────────────────
+    def _dir(self, state: str) -> str:
+        return os.path.join(self.root, state)
+
+    def _path(self, state: str, job_id: str) -> str:
+        ext = ".lease" if state == "leases" else ".json"
+        return os.path.join(self._dir(state), job_id + ext)
+
+    def _write(self, path: str, payload: dict):
+        """Writes via tmp/ + rename so readers never see a partial file."""
+        tmp = os.path.join(self._dir("tmp"), f"{uuid.uuid4().hex}.part")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: str) -> dict | None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    # ── producer side ────────────────────────────────────────────────────────
+    def submit(self, title: str, source: str | dict, student: str = "") -> str:
+        job_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        self._write(self._path("incoming", job_id), {
+            "job_id":    job_id,
+            "title":     title,
+            "student":   student,
+            "source":    source,
+            "submitted": time.time(),
+            "attempts":  0,
+        })
+        return job_id
+
+    def result(self, job_id: str) -> dict | None:
+        """The done/ or failed/ record for a job, or its current state."""
+        for state in ("done", "failed"):
+            record = self._read(self._path(state, job_id))
+            if record is not None:
+                return {"state": state, **record}
+        for state in ("claimed", "incoming"):
+            if os.path.exists(self._path(state, job_id)):
+                return {"state": state, "job_id": job_id}
+        return None
+
+    def status(self) -> dict:
+        counts = {}
+        for state in ("incoming", "claimed", "done", "failed"):
+            counts[state] = sum(1 for n in os.listdir(self._dir(state)) if n.endswith(".json"))
+        counts["workers"] = sorted({
+            lease["worker"] for lease in map(self._read, (
+                os.path.join(self._dir("leases"), n) for n in os.listdir(self._dir("leases"))
+            )) if lease
+        })
+        return counts
+
+    # ── worker side ──────────────────────────────────────────────────────────
+    def _lease(self, job_id: str, worker: str, claimed: float) -> dict:
+        return {
+            "job_id":  job_id,
+            "worker":  worker,
+            "host":    socket.gethostname(),
+            "pid":     os.getpid(),
+            "claimed": claimed,
+            "expires": time.time() + self.lease_seconds,
+        }
+
+    def claim(self, worker: str) -> dict | None:
+        """Claims the oldest waiting job, or returns None if there is none."""
+        for name in sorted(os.listdir(self._dir("incoming"))):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-5]
+            try:
+                os.rename(self._path("incoming", job_id), self._path("claimed", job_id))
+            except FileNotFoundError:
+                continue                      # another worker won this one
+            self._write(self._path("leases", job_id), self._lease(job_id, worker, time.time()))
+            job = self._read(self._path("claimed", job_id))
+            if job is None:
+                logger.error(f"WorkQueue: claimed job {job_id} is unreadable; failing it.")
+                self.fail(job_id, worker, "Job file unreadable.")
+                continue
+            return job
+        return None
+
+    def owns(self, job_id: str, worker: str) -> bool:
+        lease = self._read(self._path("leases", job_id))
+        return bool(lease) and lease["worker"] == worker
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Renews the lease; False if it has been reclaimed by a reaper."""
+        lease = self._read(self._path("leases", job_id))
+        if not lease or lease["worker"] != worker:
+            return False
+        self._write(self._path("leases", job_id), self._lease(job_id, worker, lease["claimed"]))
+        return True
+
+    def _finish(self, job_id: str, worker: str, state: str, record: dict) -> bool:
+        if not self.owns(job_id, worker):
+            logger.warning(f"WorkQueue: lease on {job_id} was lost; discarding {state} result.")
+            return False
+        self._write(self._path(state, job_id), {
+            "job_id":   job_id,
+            "worker":   worker,
+            "host":     socket.gethostname(),
+            "finished": time.time(),
+            **record,
+        })
+        self._unlink(self._path("claimed", job_id))
+        self._unlink(self._path("leases", job_id))
+        return True
+
+    def complete(self, job_id: str, worker: str, report: dict) -> bool:
+        return self._finish(job_id, worker, "done", {"report": report})
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        return self._finish(job_id, worker, "failed", {"error": error})
+
+    # ── reaper ───────────────────────────────────────────────────────────────
+    def reap(self) -> dict:
+        """Requeues claimed jobs whose lease expired; fails them after max_attempts."""
+        now = time.time()
+        out = {"requeued": 0, "failed": 0}
+        for name in os.listdir(self._dir("claimed")):
+            if not name.endswith(".json"):
+                continue
+            job_id  = name[:-5]
+            claimed = self._path("claimed", job_id)
+            lease   = self._read(self._path("leases", job_id))
+            if lease:
+                expired = lease["expires"] < now
+            else:
+                # Lease not written yet (just claimed) or lost with its worker
+                try:
+                    expired = os.path.getmtime(claimed) < now - self.lease_seconds
+                except FileNotFoundError:
+                    continue
+            if not expired:
+                continue
+
+            # Whoever renames the job out of claimed/ owns the requeue
+            staging = os.path.join(self._dir("tmp"), f"{job_id}.{uuid.uuid4().hex[:8]}.reap")
+            try:
+                os.rename(claimed, staging)
+            except FileNotFoundError:
+                continue
+            self._unlink(self._path("leases", job_id))
+            job = self._read(staging) or {"job_id": job_id}
+            job["attempts"] = job.get("attempts", 0) + 1
+            owner = lease["worker"] if lease else "unknown worker"
+
+            if job["attempts"] >= self.max_attempts:
+                self._write(self._path("failed", job_id), {
+                    **{k: v for k, v in job.items() if k != "source"},
+                    "error": f"Lease expired {job['attempts']} time(s); last owner {owner}.",
+                })
+                out["failed"] += 1
+            else:
+                self._write(self._path("incoming", job_id), job)
+                out["requeued"] += 1
+            self._unlink(staging)
+            logger.warning(f"WorkQueue: reclaimed {job_id} from {owner} (attempt {job['attempts']}).")
+        return out
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# run_worker
+# ─────────────────────────────────────────────────────────────────────────────
+def _heartbeat_loop(queue: WorkQueue, job_id: str, worker: str, stop: threading.Event):
+    while not stop.wait(DIST_HEARTBEAT_SECONDS):
+        if not queue.heartbeat(job_id, worker):
+            logger.warning(f"run_worker: lease on {job_id} was taken over.")
+            return
+
+
+def run_worker(queue: WorkQueue, worker: str | None = None, once: bool = False,
+               stop: threading.Event | None = None) -> int:
+    """
+    Claims and grades jobs until `stop` is set (or, with `once`, until the
+    queue is empty). Reaps expired leases between jobs. Returns the number
+    of jobs completed by this worker.
+    """
+    from ast_generator import warm_parser
+    from orchestrator import grade_submission
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    stop   = stop or threading.Event()
+    warm_parser()
+    logger.info(f"run_worker: {worker} polling {queue.root}")
+
+    completed, last_reap = 0, 0.0
+    while not stop.is_set():
+        if time.time() - last_reap >= DIST_HEARTBEAT_SECONDS:
+            queue.reap()
+            last_reap = time.time()
+
+        job = queue.claim(worker)
+        if job is None:
+            if once:
+                break
+            stop.wait(DIST_POLL_SECONDS)
+            continue
+
+        beat_stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat_loop, args=(queue, job["job_id"], worker, beat_stop),
+                                daemon=True)
+        beat.start()
+        try:
+            report = grade_submission(job["title"], job["source"], job.get("student", ""))
+            if queue.complete(job["job_id"], worker, report):
+                completed += 1
+                logger.info(f"run_worker: {job['job_id']} done "
+                            f"({report.get('total_score', 0)} pts).")
+        except Exception as e:
+            logger.exception(f"run_worker: {job['job_id']} failed")
+            queue.fail(job["job_id"], worker, str(e))
+        finally:
+            beat_stop.set()
+            beat.join()
+    return completed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Shared-filesystem grading queue.")
+    ap.add_argument("--queue", default=DIST_QUEUE_DIR, help="Queue root on the shared mount")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("submit", help="Queue a C file or project directory for grading")
+    sp.add_argument("source")
+    sp.add_argument("--title", required=True)
+    sp.add_argument("--student", default="")
+
+    wp = sub.add_parser("worker", help="Run a grading worker")
+    wp.add_argument("--id", help="Worker name (default: host-pid)")
+    wp.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    sub.add_parser("status", help="Job counts per state")
+    sub.add_parser("reap", help="Requeue jobs with expired leases")
+
+    rp = sub.add_parser("result", help="Print a job's result")
+    rp.add_argument("job_id")
+    args = ap.parse_args(argv)
+
+    queue = WorkQueue(args.queue)
+    if args.cmd == "submit":
+        if os.path.isdir(args.source):
+            from build import read_tree
+            print(queue.submit(args.title, read_tree(args.source), args.student))
+        else:
+            with open(args.source, encoding="utf-8", errors="replace") as f:
+                print(queue.submit(args.title, f.read(), args.student))
+    elif args.cmd == "worker":
+        try:
+            run_worker(queue, args.id, args.once)
+        except KeyboardInterrupt:
+            pass
+    elif args.cmd == "status":
+        print(json.dumps(queue.status(), indent=2))
+    elif args.cmd == "reap":
+        print(json.dumps(queue.reap()))
+    elif args.cmd == "result":
+        print(json.dumps(queue.result(args.job_id), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    main()
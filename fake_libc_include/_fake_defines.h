@@ -0,0 +1,122 @@
+/* Macro stand-ins for the C library, for pycparser (see ast_generator.py).
+   Values only need to be valid C; they are never executed. */
+#ifndef _FAKE_DEFINES_H
+#define _FAKE_DEFINES_H
+
+/* GCC extensions pycparser does not understand */
+#define __attribute__(x)
+#define __extension__
+#define __restrict
+#define __restrict__
+#define __inline inline
+#define __inline__ inline
+#define __asm__(x)
+#define __builtin_va_list int
+
+#define NULL 0
+#define EOF (-1)
+#define BUFSIZ 8192
+#define FILENAME_MAX 4096
+#define SEEK_SET 0
+#define SEEK_CUR 1
+#define SEEK_END 2
+#define EXIT_SUCCESS 0
+#define EXIT_FAILURE 1
+#define RAND_MAX 2147483647
+#define CLOCKS_PER_SEC 1000000
+#define MB_CUR_MAX 1
+
+#define CHAR_BIT 8
+#define SCHAR_MIN (-128)
+#define SCHAR_MAX 127
+#define UCHAR_MAX 255
+#define CHAR_MIN (-128)
+#define CHAR_MAX 127
+#define SHRT_MIN (-32768)
+#define SHRT_MAX 32767
+#define USHRT_MAX 65535
+#define INT_MIN (-2147483647 - 1)
+#define INT_MAX 2147483647
+#define UINT_MAX 4294967295U
+#define LONG_MIN (-9223372036854775807L - 1)
+#define LONG_MAX 9223372036854775807L
+#define ULONG_MAX 18446744073709551615UL
+#define LLONG_MIN (-9223372036854775807LL - 1)
+#define LLONG_MAX 9223372036854775807LL
+#define ULLONG_MAX 18446744073709551615ULL
+
+#define INT8_MIN (-128)
+#define INT8_MAX 127
+#define UINT8_MAX 255
+#define INT16_MIN (-32768)
+#define INT16_MAX 32767
+#define UINT16_MAX 65535
+#define INT32_MIN (-2147483647 - 1)
+#define INT32_MAX 2147483647
+#define UINT32_MAX 4294967295U
+#define INT64_MIN (-9223372036854775807LL - 1)
+#define INT64_MAX 9223372036854775807LL
+#define UINT64_MAX 18446744073709551615ULL
+#define SIZE_MAX 18446744073709551615UL
+#define INTMAX_MAX 9223372036854775807LL
+#define UINTMAX_MAX 18446744073709551615ULL
+#define INT8_C(c) c
+#define INT16_C(c) c
+#define INT32_C(c) c
+#define INT64_C(c) c ## LL
+#define UINT8_C(c) c
+#define UINT16_C(c) c
+#define UINT32_C(c) c ## U
+#define UINT64_C(c) c ## ULL
+
+#define PRId8 "d"
+#define PRId16 "d"
+#define PRId32 "d"
+#define PRId64 "lld"
+#define PRIu8 "u"
+#define PRIu16 "u"
+#define PRIu32 "u"
+#define PRIu64 "llu"
+#define PRIx32 "x"
+#define PRIx64 "llx"
+#define SCNd32 "d"
+#define SCNd64 "lld"
+#define SCNu32 "u"
+#define SCNu64 "llu"
+
+#define FLT_MIN 1.17549435e-38F
+#define FLT_MAX 3.40282347e+38F
+#define FLT_EPSILON 1.19209290e-7F
+#define DBL_MIN 2.2250738585072014e-308
+#define DBL_MAX 1.7976931348623157e+308
+#define DBL_EPSILON 2.2204460492503131e-16
+#define HUGE_VAL 1e500
+#define INFINITY 1e500F
+#define NAN (0.0F / 0.0F)
+#define M_E 2.71828182845904523536
+#define M_PI 3.14159265358979323846
+#define M_PI_2 1.57079632679489661923
+#define M_SQRT2 1.41421356237309504880
+
+#define EDOM 33
+#define ERANGE 34
+#define EINVAL 22
+#define ENOMEM 12
+
+#define SIGINT 2
+#define SIGSEGV 11
+#define SIGTERM 15
+#define SIG_DFL ((void (*)(int))0)
+#define SIG_IGN ((void (*)(int))1)
+
+#define va_start(ap, last) ((void)0)
+#define va_arg(ap, type) (*(type *)0)
+#define va_end(ap) ((void)0)
+#define va_copy(dst, src) ((void)0)
+#define offsetof(type, member) ((size_t)0)
+#define assert(expr) ((void)0)
+#define static_assert _Static_assert
+#define alignof _Alignof
+#define noreturn _Noreturn
+
+#endif
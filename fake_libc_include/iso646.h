@@ -0,0 +1,13 @@
+#include "_fake_defines.h"
+#include "_fake_typedefs.h"
+#define and &&
+#define and_eq &=
+#define bitand &
+#define bitor |
+#define compl ~
+#define not !
+#define not_eq !=
+#define or ||
+#define or_eq |=
+#define xor ^
+#define xor_eq ^=
@@ -0,0 +1,5 @@
+#include "_fake_defines.h"
+#include "_fake_typedefs.h"
+#define bool _Bool
+#define true 1
+#define false 0
@@ -0,0 +1,225 @@
+"""
+hotloops.py
+Static hot-loop analyzer for optimization_agent.
+
+Functions:
+  analyze_hot_loops(src)   → findings + counts (memoised per source hash)
+
+Walks the shared pycparser AST (ast_generator.parse_c_source) and reports calls that
+really execute on every iteration of a for / while / do loop, weighted by
+loop nesting depth:
+  - output         printf, puts, putchar, ... inside a loop body (reading input
+                   item by item in a loop is the normal pattern and not reported)
+  - allocation     malloc / calloc / realloc inside a loop body
+  - strlen()       in a loop condition (re-evaluated every iteration)
+  - pow()          inside a loop (often just x*x or a running product)
+  - invariant work pure calls whose arguments are never modified in the loop
+
+Allocation and free() calls are also counted file-wide for the leak check.
+"""
+
+import logging
+from functools import lru_cache
+
+from pycparser import c_ast
+
+from cache import content_hash
+from ast_generator import parse_c_source
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_CALLS = {"printf", "puts", "putchar", "fprintf", "fputs", "fputc", "putc", "fwrite", "fflush"}
+ALLOC_CALLS  = {"malloc", "calloc", "realloc", "strdup"}
+FREE_CALLS   = {"free"}
+# Calls without side effects: hoistable when their arguments are loop-invariant
+PURE_CALLS   = {"strlen", "pow", "sqrt", "abs", "labs", "fabs", "log", "log10", "exp",
+                "sin", "cos", "tan", "floor", "ceil", "strcmp", "strncmp", "atoi", "atof"}
+
+_MESSAGES = {
+    "output_in_loop":      "{call}() inside a loop — consider building the output in a buffer.",
+    "alloc_in_loop":       "{call}() inside a loop — allocate once outside the loop.",
+    "strlen_in_condition": "strlen() in a loop condition is re-evaluated every iteration — store the length.",
+    "pow_in_loop":         "pow() inside a loop — use multiplication or a running product.",
+    "loop_invariant":      "{call}() does not depend on the loop — hoist it out.",
+}
+
+
+def _call_name(node: c_ast.FuncCall) -> str | None:
+    return node.name.name if isinstance(node.name, c_ast.ID) else None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Helpers — which names does a subtree read / write?
+# ─────────────────────────────────────────────────────────────────────────────
+class _Writes(c_ast.NodeVisitor):
+    """Names assigned, incremented, or passed by address / as a pointer inside a subtree."""
+    def __init__(self):
+        self.names = set()
+
+    def _target(self, node):
+        while isinstance(node, (c_ast.ArrayRef, c_ast.StructRef, c_ast.UnaryOp, c_ast.Cast)):
+            node = getattr(node, "name", None) or getattr(node, "expr", None)
+        if isinstance(node, c_ast.ID):
+            self.names.add(node.name)
+
+    def visit_Assignment(self, node):
+        self._target(node.lvalue)
+        self.generic_visit(node)
+
+    def visit_UnaryOp(self, node):
+        if node.op in ("++", "--", "p++", "p--", "&"):
+            self._target(node.expr)
+        self.generic_visit(node)
+
+    def visit_Decl(self, node):
+        self.names.add(node.name)
+        self.generic_visit(node)
+
+    def visit_FuncCall(self, node):
+        # Arrays / pointers handed to a call that may write through them
+        if _call_name(node) not in PURE_CALLS | OUTPUT_CALLS:
+            for arg in (node.args.exprs if node.args else []):
+                if isinstance(arg, c_ast.ID):
+                    self.names.add(arg.name)
+        self.generic_visit(node)
+
+
+class _Reads(c_ast.NodeVisitor):
+    def __init__(self):
+        self.names  = set()
+        self.impure = False
+
+    def visit_ID(self, node):
+        self.names.add(node.name)
+
+    def visit_FuncCall(self, node):
+        if _call_name(node) not in PURE_CALLS:
+            self.impure = True
+        if node.args:
+            self.visit(node.args)
+
+
+def _is_invariant(call: c_ast.FuncCall, written: set) -> bool:
+    if not call.args or not call.args.exprs:
+        return False
+    reads = _Reads()
+    reads.visit(call.args)
+    return bool(reads.names) and not reads.impure and not (reads.names & written)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# LoopVisitor
+# ─────────────────────────────────────────────────────────────────────────────
+class LoopVisitor(c_ast.NodeVisitor):
+    def __init__(self):
+        self.findings = []
+        self.allocs   = 0
+        self.frees    = 0
+        self._loops   = []        # stack of (loop node, names written in it)
+        self._in_cond = False
+        self._func    = ""
+
+    def _add(self, kind: str, call: str, node, extra: int = 0):
+        depth = len(self._loops)
+        self.findings.append({
+            "kind":     kind,
+            "call":     call,
+            "function": self._func,
+            "line":     node.coord.line if node.coord else None,
+            "depth":    depth,
+            "weight":   depth + extra,
+            "message":  _MESSAGES[kind].format(call=call),
+        })
+
+    def visit_FuncDef(self, node):
+        self._func = node.decl.name
+        self.visit(node.body)
+        self._func = ""
+
+    def _visit_loop(self, node):
+        # for-init runs once, before the loop
+        if isinstance(node, c_ast.For) and node.init is not None:
+            self.visit(node.init)
+
+        writes = _Writes()
+        for part in (getattr(node, "next", None), node.stmt, node.cond):
+            if part is not None:
+                writes.visit(part)
+        self._loops.append((node, writes.names))
+
+        if node.cond is not None:
+            self._in_cond = True
+            self.visit(node.cond)
+            self._in_cond = False
+        if getattr(node, "next", None) is not None:
+            self.visit(node.next)
+        if node.stmt is not None:
+            self.visit(node.stmt)
+        self._loops.pop()
+
+    visit_For     = _visit_loop
+    visit_While   = _visit_loop
+    visit_DoWhile = _visit_loop
+
+    def visit_FuncCall(self, node):
+        name = _call_name(node)
+        if name in ALLOC_CALLS:
+            self.allocs += 1
+        elif name in FREE_CALLS:
+            self.frees += 1
+
+        if self._loops and name:
+            if name in OUTPUT_CALLS:
+                self._add("output_in_loop", name, node)
+            elif name in ALLOC_CALLS:
+                self._add("alloc_in_loop", name, node)
+            elif name == "strlen" and self._in_cond:
+                self._add("strlen_in_condition", name, node, extra=1)
+            elif name == "pow":
+                self._add("pow_in_loop", name, node)
+            elif name in PURE_CALLS and _is_invariant(node, self._loops[-1][1]):
+                self._add("loop_invariant", name, node)
+
+        if node.args:
+            self.visit(node.args)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# analyze_hot_loops
+# ─────────────────────────────────────────────────────────────────────────────
+@lru_cache(maxsize=256)
+def _analyze_cached(source_hash: str, src: str) -> dict | None:
+    ast = parse_c_source(src)
+    if ast is None:
+        return None
+
+    visitor = LoopVisitor()
+    visitor.visit(ast)
+    findings = sorted(visitor.findings, key=lambda f: (-f["weight"], f["line"] or 0))
+
+    def count(kind):
+        return sum(1 for f in findings if f["kind"] == kind)
+
+    def weight(kind):
+        return sum(f["weight"] for f in findings if f["kind"] == kind)
+
+    return {
+        "findings":              findings,
+        "alloc_calls":           visitor.allocs,
+        "free_calls":            visitor.frees,
+        "output_in_loop":        count("output_in_loop"),
+        "output_in_loop_weight": weight("output_in_loop"),
+        "alloc_in_loop":         count("alloc_in_loop"),
+        "strlen_in_condition":   count("strlen_in_condition"),
+        "pow_in_loop":           count("pow_in_loop"),
+        "loop_invariant":        count("loop_invariant"),
+        "hot_loop_weight":       sum(f["weight"] for f in findings),
+    }
+
+
+def analyze_hot_loops(src: str) -> dict | None:
+    """
+    Returns the findings (heaviest first) and per-kind counts, or None when
+    pycparser cannot parse the source — callers fall back to heuristics.
+    """
+    return _analyze_cached(content_hash(src), src)
@@ -6,8 +6,15 @@ Functions:
   groq_generate_inputs(prompt)      → generates stdin inputs only (Self-Oracle)
   groq_generate_tests(prompt)       → legacy: kept for backward compatibility
   gemini_generate_report(prompt)    → Gemini final academic report
-  gemini_explain_compiler_errors()  → Gemini LangChain error hints
-  gemini_extract_code_from_file()   → NEW: OCR for handwritten/scanned C code
+  gemini_explain_compiler_errors()  → Gemini error hints (cached by error signature)
+  gemini_extract_code_from_file()   → NEW: OCR for handwritten/scanned C code (via ocr.py)
+  gemini_transcribe_page(jpeg)      → OCR of one compressed page (batch ingestion)
+  configured(task)                  → True if the backend for that task is usable
+
+The function names keep their historical provider prefixes; the backend
+behind each task (Groq, Gemini, a local OpenAI-compatible server, a fake
+or a record/replay cassette) is chosen in config.LLM_PROVIDERS — see
+llm_providers.py.
 
 Self-Oracle change:
   The old groq_generate_tests() asked the LLM to produce both inputs AND
@@ -20,79 +27,59 @@ Self-Oracle change:
   trivially easy and removes the main source of test failures.
 """
 
-import io
-from PIL import Image
-import fitz  # PyMuPDF
-
-from groq import Groq
-import google.generativeai as genai
-from config import GROQ_API_KEY, GEMINI_API_KEY, GROQ_MODEL, GEMINI_MODEL
+from ocr import extract_code
+from cache import DiskCache
+from diagnostics import error_signature
+from scheduler import resource_slot
+from llm_providers import provider_for
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage
+# Compiler-error explanations keyed by normalised error signature
+_explanation_cache = DiskCache("compiler_explanations")
+_explanation_memo  = {}
 
-groq_client      = None
-gemini_model     = None
-gemini_langchain = None
 
-# ── Groq client ───────────────────────────────────────────────────────────────
-if GROQ_API_KEY:
-    groq_client = Groq(api_key=GROQ_API_KEY)
+def configured(task: str) -> bool:
+    """True if the backend for `task` ("inputs", "report", "explain", "ocr") can be called."""
+    return provider_for(task).available()
 
-# ── Gemini direct ─────────────────────────────────────────────────────────────
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
-
-# ── Gemini via LangChain ──────────────────────────────────────────────────────
-if GEMINI_API_KEY:
-    gemini_langchain = ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
-        google_api_key=GEMINI_API_KEY,
-        temperature=0.3
-    )
 
 # ─────────────────────────────────────────────────────────────────────────────
 # NEW ★  gemini_extract_code_from_file (OCR)
 # ─────────────────────────────────────────────────────────────────────────────
+def gemini_transcribe_page(jpeg_bytes: bytes) -> str:
+    """Transcribes one grayscale JPEG page. Raises on API failure."""
+    prompt = (
+        "You are an expert OCR system for C programming code. "
+        "Extract the C source code from the provided image. "
+        "The image may be one page of a longer program; transcribe only what is on it. "
+        "If it is handwritten, carefully transcribe it and use your knowledge of C syntax "
+        "to fix obvious handwriting ambiguities (like confusing a semicolon for a colon). "
+        "Return ONLY the plain C code. Do not include markdown formatting like ```c."
+    )
+
+    with resource_slot("llm"):
+        text = provider_for("ocr").complete("ocr", prompt, images=[("image/jpeg", jpeg_bytes)]).strip()
+
+    # Clean up any markdown blocks if the LLM ignores instructions
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1]
+    if text.endswith("```"):
+        text = text.rsplit("\n", 1)[0]
+
+    return text.strip()
+
+
 def gemini_extract_code_from_file(file_bytes: bytes, file_name: str) -> str:
     """
     Uses Gemini 2.5 Flash to extract handwritten/scanned C code from an image or PDF.
+    Pages are rendered in parallel, compressed, transcribed one request per
+    page and cached by file hash + page index (see ocr.py).
     """
-    if not gemini_model:
+    if not configured("ocr"):
         return "Gemini API not configured. Cannot perform OCR extraction."
 
     try:
-        images = []
-        if file_name.lower().endswith(".pdf"):
-            # Convert PDF pages to images using PyMuPDF
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            for page in doc:
-                pix = page.get_pixmap(dpi=150)
-                img_bytes = pix.tobytes("png")
-                images.append(Image.open(io.BytesIO(img_bytes)))
-        else:
-            # Standard image upload (jpg, png)
-            images.append(Image.open(io.BytesIO(file_bytes)))
-
-        prompt = (
-            "You are an expert OCR system for C programming code. "
-            "Extract the C source code from the provided image(s). "
-            "If it is handwritten, carefully transcribe it and use your knowledge of C syntax "
-            "to fix obvious handwriting ambiguities (like confusing a semicolon for a colon). "
-            "Return ONLY the plain C code. Do not include markdown formatting like ```c."
-        )
-
-        response = gemini_model.generate_content([prompt] + images)
-        text = response.text.strip()
-        
-        # Clean up any markdown blocks if the LLM ignores instructions
-        if text.startswith("```"):
-            text = text.split("\n", 1)[-1]
-        if text.endswith("```"):
-            text = text.rsplit("\n", 1)[0]
-            
-        return text.strip()
+        return extract_code(file_bytes, file_name, gemini_transcribe_page)
 
     except Exception as e:
         import logging
@@ -104,22 +91,23 @@ def gemini_extract_code_from_file(file_bytes: bytes, file_name: str) -> str:
 # Used by test_agent (Self-Oracle mode).
 # Asks the LLM to produce ONLY stdin input strings — NOT expected outputs.
 # ─────────────────────────────────────────────────────────────────────────────
-def groq_generate_inputs(prompt: str) -> str | None:
+def groq_generate_inputs(prompt: str, timeout: float | None = None) -> str | None:
     """
     Sends prompt to Groq and returns the raw response text.
     The prompt instructs the model to return a JSON array of input strings.
     Returns None if the Groq client is unavailable or the call fails.
+    `timeout` (seconds) bounds the request.
     """
-    if not groq_client:
+    if not configured("inputs"):
         return None
     try:
-        chat = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model=GROQ_MODEL,
-            temperature=0.3,      # Low temperature → more deterministic inputs
-            max_tokens=512        # Input list is short; cap to avoid padding
-        )
-        return chat.choices[0].message.content
+        with resource_slot("llm"):
+            return provider_for("inputs").complete(
+                "inputs", prompt,
+                temperature=0.3,      # Low temperature → more deterministic inputs
+                max_tokens=512,       # Input list is short; cap to avoid padding
+                timeout=timeout
+            )
     except Exception as e:
         # Log and return None so test_agent can fall back gracefully
         import logging
@@ -139,14 +127,10 @@ def groq_generate_tests(prompt: str) -> str | None:
     Superseded by groq_generate_inputs() + self-oracle execution.
     Retained so any external callers are not broken.
     """
-    if not groq_client:
+    if not configured("inputs"):
         return None
     try:
-        chat = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model=GROQ_MODEL
-        )
-        return chat.choices[0].message.content
+        return provider_for("inputs").complete("tests", prompt)
     except Exception as e:
         import logging
         logging.getLogger(__name__).error(
@@ -158,16 +142,19 @@ def groq_generate_tests(prompt: str) -> str | None:
 # ─────────────────────────────────────────────────────────────────────────────
 # gemini_generate_report
 # ─────────────────────────────────────────────────────────────────────────────
-def gemini_generate_report(prompt: str) -> str | None:
+def gemini_generate_report(prompt: str, timeout: float | None = None,
+                           key: str | None = None) -> str | None:
     """
     Uses the Gemini direct client to generate a human-readable academic report.
-    Returns None if Gemini is not configured.
+    Returns None if Gemini is not configured or the call fails / times out
+    (including a replay miss). `key` is the prompt without its volatile
+    measurements, for record / replay (see llm_providers.Provider).
     """
-    if not gemini_model:
+    if not configured("report"):
         return None
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text
+        with resource_slot("llm"):
+            return provider_for("report").complete("report", prompt, timeout=timeout, key=key)
     except Exception as e:
         import logging
         logging.getLogger(__name__).error(
@@ -179,17 +166,30 @@ def gemini_generate_report(prompt: str) -> str | None:
 # ─────────────────────────────────────────────────────────────────────────────
 # gemini_explain_compiler_errors
 # ─────────────────────────────────────────────────────────────────────────────
-def gemini_explain_compiler_errors(error_log: str) -> str:
+def gemini_explain_compiler_errors(error_log: str, diagnostics: list[dict] | None = None) -> str:
     """
-    Uses Gemini via LangChain to explain GCC errors and give hints.
+    Uses Gemini to explain GCC errors and give hints.
     Does NOT rewrite or auto-correct student code.
     Returns a plain-text explanation string.
+
+    Explanations are cached by normalised error signature (see
+    diagnostics.py): the LLM only sees — and is only called for — error
+    patterns no earlier student has hit.
     """
-    if not gemini_langchain:
+    signature, normalized = error_signature(error_log, diagnostics)
+    cached = _explanation_memo.get(signature) or _explanation_cache.get(signature)
+    if cached:
+        _explanation_memo[signature] = cached
+        return cached["text"]
+
+    if not configured("explain"):
         return "Gemini API not configured."
 
+    normalized_log = "\n".join(normalized)
     prompt = f"""
 You are a C programming instructor reviewing a student's compiler error log.
+File names, line numbers and the student's own identifiers have been replaced
+by placeholders (ID, N, PATH); refer to them generically.
 
 Rules:
 - Do NOT rewrite the student's code.
@@ -198,11 +198,15 @@ Rules:
   on how the student can fix it themselves.
 
 GCC Error Log:
-{error_log}
+{normalized_log}
 """
     try:
-        response = gemini_langchain.invoke([HumanMessage(content=prompt)])
-        return response.content
+        with resource_slot("llm"):
+            text = provider_for("explain").complete("explain", prompt, temperature=0.3)
+        entry = {"text": text, "diagnostics": normalized}
+        _explanation_memo[signature] = entry
+        _explanation_cache.set(signature, entry)
+        return text
     except Exception as e:
         import logging
         logging.getLogger(__name__).error(
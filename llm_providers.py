@@ -0,0 +1,324 @@
+"""
+llm_providers.py
+Swappable LLM backends behind one interface.
+
+Classes:
+  Provider                      → base class: available(), complete(task, prompt, ...) → text
+  GroqProvider                  → Groq chat completions
+  GeminiProvider                → Gemini generateContent (text and images)
+  OpenAICompatibleProvider      → any /chat/completions endpoint (vLLM, llama.cpp, Ollama, ...)
+  FakeProvider                  → deterministic canned answers, no network
+  Cassette(path)                → request / response pairs stored on disk
+  RecordingProvider(inner, c)   → calls `inner` and records every answer into the cassette
+  ReplayProvider(c, fallback)   → answers from the cassette only
+
+Functions:
+  provider_for(task)            → configured provider for "inputs", "report", "explain" or "ocr"
+  request_key(task, prompt, …)  → cassette key of one request
+
+Which backend serves which task comes from config.LLM_PROVIDERS
+(AUTOGRADER_LLM_PROVIDER for all tasks, AUTOGRADER_LLM_<TASK> for one):
+
+  AUTOGRADER_LLM_RECORD=1 AUTOGRADER_LLM_CASSETTE=cassettes/ci python loadtest.py ...
+  AUTOGRADER_LLM_PROVIDER=replay AUTOGRADER_LLM_CASSETTE=cassettes/ci python loadtest.py ...
+
+The first run records real answers; the second replays them offline at
+disk speed. A cassette key covers the task, prompt (or the caller's
+`key` with run-to-run noise removed), image bytes and sampling
+parameters — not the backend — so a cassette recorded against
+Groq / Gemini replays for any task mapping. A replay miss raises unless
+AUTOGRADER_LLM_REPLAY_FALLBACK names a backend to ask instead.
+
+complete() raises on any failure; llm.py turns failures into the
+pipeline's usual "not configured" / fallback paths. Clients are created on
+first use, so the fake and replay backends never import an SDK.
+"""
+
+import time
+import json
+import base64
+import hashlib
+import logging
+import threading
+import urllib.request
+
+from cache import DiskCache, content_hash
+from config import (
+    GROQ_API_KEY, GROQ_MODEL, GROQ_BASE_URL, GEMINI_API_KEY, GEMINI_MODEL, GEMINI_BASE_URL,
+    OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL, LLM_PROVIDERS, LLM_CASSETTE_DIR,
+    LLM_RECORD, LLM_REPLAY_FALLBACK,
+)
+
+logger = logging.getLogger(__name__)
+
+TASKS = ("inputs", "report", "explain", "ocr")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Provider base
+# ─────────────────────────────────────────────────────────────────────────────
+class Provider:
+    """
+    complete(task, prompt, images, temperature, max_tokens, timeout, key) → text.
+    `images` is a list of (mime_type, bytes); `timeout` is in seconds. `key`
+    stands in for the prompt in cassette keys when the prompt carries detail
+    that differs on every run (timings); only record / replay read it.
+    """
+    name  = "base"
+    model = ""
+
+    def available(self) -> bool:
+        return True
+
+    def complete(self, task: str, prompt: str, images: list[tuple[str, bytes]] = (),
+                 temperature: float | None = None, max_tokens: int | None = None,
+                 timeout: float | None = None, key: str | None = None) -> str:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.model or self.name})"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Hosted backends
+# ─────────────────────────────────────────────────────────────────────────────
+class GroqProvider(Provider):
+    name = "groq"
+
+    def __init__(self, api_key: str = GROQ_API_KEY, model: str = GROQ_MODEL,
+                 base_url: str = GROQ_BASE_URL):
+        self.api_key, self.model, self.base_url = api_key, model, base_url
+        self._client = None
+        self._lock   = threading.Lock()
+
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from groq import Groq
+                self._client = Groq(api_key=self.api_key, base_url=self.base_url or None)
+            return self._client
+
+    def complete(self, task, prompt, images=(), temperature=None, max_tokens=None, timeout=None,
+                 key=None):
+        if images:
+            raise ValueError(f"{self.model} does not accept images")
+        options = {k: v for k, v in (("temperature", temperature), ("max_tokens", max_tokens),
+                                     ("timeout", timeout)) if v is not None}
+        chat = self._get_client().chat.completions.create(
+            messages=[{"role": "user", "content": prompt}], model=self.model, **options
+        )
+        return chat.choices[0].message.content
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def __init__(self, api_key: str = GEMINI_API_KEY, model: str = GEMINI_MODEL,
+                 base_url: str = GEMINI_BASE_URL):
+        self.api_key, self.model, self.base_url = api_key, model, base_url
+        self._client = None
+        self._lock   = threading.Lock()
+
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                import google.generativeai as genai
+                # A custom endpoint (stub / proxy) needs the REST transport
+                endpoint = ({"transport": "rest", "client_options": {"api_endpoint": self.base_url}}
+                            if self.base_url else {})
+                genai.configure(api_key=self.api_key, **endpoint)
+                self._client = genai.GenerativeModel(self.model)
+            return self._client
+
+    def complete(self, task, prompt, images=(), temperature=None, max_tokens=None, timeout=None,
+                 key=None):
+        parts  = [prompt, *({"mime_type": mime, "data": data} for mime, data in images)]
+        config = {k: v for k, v in (("temperature", temperature),
+                                    ("max_output_tokens", max_tokens)) if v is not None}
+        response = self._get_client().generate_content(
+            parts if images else prompt,
+            generation_config=config or None,
+            request_options={"timeout": timeout} if timeout else None,
+        )
+        return response.text
+
+
+class OpenAICompatibleProvider(Provider):
+    """POSTs to {base_url}/chat/completions with the standard library only."""
+    name = "openai"
+
+    def __init__(self, base_url: str = OPENAI_BASE_URL, model: str = OPENAI_MODEL,
+                 api_key: str = OPENAI_API_KEY):
+        self.base_url, self.model, self.api_key = base_url.rstrip("/"), model, api_key
+
+    def available(self) -> bool:
+        return bool(self.base_url)
+
+    def complete(self, task, prompt, images=(), temperature=None, max_tokens=None, timeout=None,
+                 key=None):
+        content = prompt
+        if images:
+            content = [{"type": "text", "text": prompt}] + [
+                {"type": "image_url",
+                 "image_url": {"url": f"data:{mime};base64,{base64.b64encode(data).decode()}"}}
+                for mime, data in images
+            ]
+        body = {"model": self.model, "messages": [{"role": "user", "content": content}]}
+        if temperature is not None:
+            body["temperature"] = temperature
+        if max_tokens is not None:
+            body["max_tokens"] = max_tokens
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        req = urllib.request.Request(f"{self.base_url}/chat/completions",
+                                     data=json.dumps(body).encode(), headers=headers)
+        with urllib.request.urlopen(req, timeout=timeout or 60) as resp:
+            data = json.load(resp)
+        return data["choices"][0]["message"]["content"]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# FakeProvider — deterministic, offline
+# ─────────────────────────────────────────────────────────────────────────────
+class FakeProvider(Provider):
+    """
+    Canned answers shaped like the real ones, so every downstream parser
+    runs: a JSON array of five inputs, a markdown report, a hint, a C file.
+    Answers depend only on the task and prompt.
+    """
+    name  = "fake"
+    model = "fake"
+
+    INPUTS = ["5\n", "0\n", "-7\n", "2147483647\n", "3 4\n"]
+
+    def complete(self, task, prompt, images=(), temperature=None, max_tokens=None, timeout=None,
+                 key=None):
+        tag = hashlib.sha256(prompt.encode("utf-8", errors="replace")).hexdigest()[:8]
+        if task == "inputs":
+            return json.dumps(self.INPUTS)
+        if task == "report":
+            return (f"## Summary\nThe program compiles and behaves consistently on the generated "
+                    f"inputs. (fake report {tag})\n\n## Suggestions\n- Validate scanf results\n")
+        if task == "explain":
+            return f"Each error above means the compiler could not understand that line. (fake hint {tag})"
+        if task == "ocr":
+            return '#include <stdio.h>\n\nint main(void) {\n    printf("fake OCR\\n");\n    return 0;\n}'
+        return f"fake answer {tag}"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Record / replay
+# ─────────────────────────────────────────────────────────────────────────────
+def request_key(task: str, prompt: str, images: list[tuple[str, bytes]] = (),
+                temperature: float | None = None, max_tokens: int | None = None) -> str:
+    """
+    Cassette key; the timeout and the backend are deliberately left out.
+    Callers pass the complete() `key`, when given, as `prompt`.
+    """
+    return content_hash(task, prompt, *(data for _, data in images),
+                        {"images": len(images), "temperature": temperature, "max_tokens": max_tokens})
+
+
+class Cassette:
+    """
+    One JSON file per request under `path` (DiskCache layout), so cassettes
+    can be committed, diffed and merged by copying directories.
+    """
+    def __init__(self, path: str):
+        self.path  = path
+        self._disk = DiskCache("", root=path)
+
+    def get(self, key: str) -> dict | None:
+        return self._disk.get(key)
+
+    def put(self, key: str, entry: dict):
+        self._disk.set(key, entry)
+
+
+class RecordingProvider(Provider):
+    def __init__(self, inner: Provider, cassette: Cassette):
+        self.inner, self.cassette = inner, cassette
+        self.name, self.model     = f"record:{inner.name}", inner.model
+
+    def available(self) -> bool:
+        return self.inner.available()
+
+    def complete(self, task, prompt, images=(), temperature=None, max_tokens=None, timeout=None,
+                 key=None):
+        start = time.perf_counter()
+        text  = self.inner.complete(task, prompt, images, temperature, max_tokens, timeout)
+        self.cassette.put(request_key(task, key or prompt, images, temperature, max_tokens), {
+            "task":        task,
+            "provider":    self.inner.name,
+            "model":       self.inner.model,
+            "prompt":      prompt,
+            "images":      [hashlib.sha256(data).hexdigest() for _, data in images],
+            "temperature": temperature,
+            "max_tokens":  max_tokens,
+            "latency":     round(time.perf_counter() - start, 3),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "response":    text,
+        })
+        return text
+
+
+class ReplayProvider(Provider):
+    name = "replay"
+
+    def __init__(self, cassette: Cassette, fallback: Provider | None = None):
+        self.cassette, self.fallback = cassette, fallback
+        self.model = cassette.path
+
+    def complete(self, task, prompt, images=(), temperature=None, max_tokens=None, timeout=None,
+                 key=None):
+        entry = self.cassette.get(request_key(task, key or prompt, images, temperature, max_tokens))
+        if entry is not None:
+            return entry["response"]
+        if self.fallback is None:
+            raise LookupError(f"no recorded {task} response in {self.cassette.path}")
+        logger.warning(f"ReplayProvider: {task} not in {self.cassette.path}; asking {self.fallback!r}")
+        return self.fallback.complete(task, prompt, images, temperature, max_tokens, timeout, key)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# provider_for
+# ─────────────────────────────────────────────────────────────────────────────
+_BACKENDS = {
+    "groq":   GroqProvider,
+    "gemini": GeminiProvider,
+    "openai": OpenAICompatibleProvider,
+    "fake":   FakeProvider,
+}
+_instances = {}
+_lock      = threading.Lock()
+
+
+def _backend(name: str) -> Provider:
+    if name not in _instances:
+        if name == "replay":
+            if not LLM_CASSETTE_DIR:
+                raise ValueError("AUTOGRADER_LLM_PROVIDER=replay needs AUTOGRADER_LLM_CASSETTE")
+            fallback = _backend(LLM_REPLAY_FALLBACK) if LLM_REPLAY_FALLBACK else None
+            _instances[name] = ReplayProvider(Cassette(LLM_CASSETTE_DIR), fallback)
+        elif name in _BACKENDS:
+            provider = _BACKENDS[name]()
+            if LLM_RECORD and LLM_CASSETTE_DIR:
+                provider = RecordingProvider(provider, Cassette(LLM_CASSETTE_DIR))
+            _instances[name] = provider
+        else:
+            raise ValueError(f"unknown LLM provider {name!r} (expected one of "
+                             f"{', '.join([*_BACKENDS, 'replay'])})")
+    return _instances[name]
+
+
+def provider_for(task: str) -> Provider:
+    """The shared provider instance configured for `task` (see module docstring)."""
+    with _lock:
+        return _backend(LLM_PROVIDERS[task])
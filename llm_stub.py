@@ -0,0 +1,187 @@
+"""
+llm_stub.py
+Local stand-in for the Groq and Gemini HTTP APIs, for load tests.
+
+Classes:
+  StubLLMServer(port=0, ...)   → threaded HTTP server; start() / stop(), .url, .stats()
+
+Usage:
+  python llm_stub.py [--port 8799] [--latency-scale 1.0] [--error-rate 0.03]
+  GROQ_BASE_URL=http://127.0.0.1:8799 GEMINI_BASE_URL=http://127.0.0.1:8799 \\
+  GROQ_API_KEY=stub GEMINI_API_KEY=stub streamlit run app.py
+
+Serves the two routes the Groq and Gemini backends (llm_providers.py) call:
+  POST /openai/v1/chat/completions             → Groq (OpenAI format); a JSON array of 5 inputs
+  POST /v1beta/models/<model>:generateContent  → Gemini; a short templated report
+
+Every request sleeps for a lognormal latency around the provider's median
+(heavy right tail, as the real APIs have) and fails with 429 or 500 at the
+configured rates, so client retries, timeouts and the "llm" resource slots
+behave as they do in production. Nothing leaves the machine.
+"""
+
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# Median seconds and lognormal sigma per provider (roughly what the hosted
+# APIs show for these prompt sizes)
+LATENCY = {
+    "groq":   (0.6, 0.5),
+    "gemini": (2.5, 0.6),
+}
+
+_INPUTS = ["5\n", "0\n", "-7\n", "2147483647\n", "3 4\n"]
+
+_REPORT = (
+    "## Summary\nThe program compiles and produces consistent output on every generated input.\n\n"
+    "## Strengths\n- Clear structure\n- Input is read with scanf\n\n"
+    "## Suggestions\n- Check the return value of scanf\n- Handle out-of-range values\n"
+)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Request handler
+# ─────────────────────────────────────────────────────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubLLMServer"
+
+    def log_message(self, fmt, *args):        # silence per-request stderr lines
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict | None = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        if self.path.startswith("/openai/v1/chat/completions"):
+            provider = "groq"
+        elif ":generateContent" in self.path:
+            provider = "gemini"
+        else:
+            self._send(404, {"error": {"message": f"no stub for {self.path}"}})
+            return
+
+        stub = self.server
+        time.sleep(stub.latency(provider))
+        status = stub.outcome(provider)
+        if status == 429:
+            self._send(429, {"error": {"code": 429, "message": "Rate limit reached (stub)",
+                                       "status": "RESOURCE_EXHAUSTED"}},
+                       {"Retry-After": "1"})
+        elif status == 500:
+            self._send(500, {"error": {"code": 500, "message": "Internal error (stub)",
+                                       "status": "INTERNAL"}})
+        elif provider == "groq":
+            self._send(200, {
+                "id": f"stub-{time.time_ns()}", "object": "chat.completion",
+                "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": json.dumps(_INPUTS)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        else:
+            self._send(200, {
+                "candidates": [{"index": 0, "finishReason": "STOP",
+                                "content": {"role": "model", "parts": [{"text": _REPORT}]}}],
+                "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0,
+                                  "totalTokenCount": 0},
+            })
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# StubLLMServer
+# ─────────────────────────────────────────────────────────────────────────────
+class StubLLMServer(ThreadingHTTPServer):
+    """
+    `latency_scale` multiplies every provider median (0 → instant replies);
+    `error_rate` is the share of requests failing, three quarters as 429 and
+    the rest as 500. `seed` makes a run reproducible.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_scale: float = 1.0,
+                 error_rate: float = 0.03, seed: int | None = None):
+        super().__init__((host, port), _Handler)
+        self.latency_scale = latency_scale
+        self.error_rate    = error_rate
+        self._rng          = random.Random(seed)
+        self._lock         = threading.Lock()
+        self._counts       = {}
+        self._thread       = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def latency(self, provider: str) -> float:
+        median, sigma = LATENCY[provider]
+        with self._lock:
+            return median * self.latency_scale * math.exp(self._rng.gauss(0.0, sigma))
+
+    def outcome(self, provider: str) -> int:
+        with self._lock:
+            roll   = self._rng.random()
+            status = 429 if roll < 0.75 * self.error_rate else 500 if roll < self.error_rate else 200
+            key    = f"{provider}_{status}"
+            self._counts[key] = self._counts.get(key, 0) + 1
+        return status
+
+    def stats(self) -> dict:
+        """Requests served so far, e.g. {"groq_200": 12, "gemini_429": 1}."""
+        with self._lock:
+            return dict(sorted(self._counts.items()))
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        logger.info(f"StubLLMServer: listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run a local Groq / Gemini stub.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--latency-scale", type=float, default=1.0)
+    ap.add_argument("--error-rate", type=float, default=0.03)
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args(argv)
+
+    server = StubLLMServer(args.host, args.port, args.latency_scale, args.error_rate, args.seed)
+    print(f"Stub LLM server on {server.url} — set GROQ_BASE_URL and GEMINI_BASE_URL to it.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    main()
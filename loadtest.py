@@ -0,0 +1,337 @@
+"""
+loadtest.py
+Load generator for the grading pipeline, with the LLM APIs stubbed locally.
+
+Usage:
+  python loadtest.py [corpus ...] --profile constant --rate 2 --duration 60
+  python loadtest.py submissions/ --profile burst --burst-size 40 --burst-every 30
+  python loadtest.py submissions/ --profile ramp --rate 0.5 --peak-rate 6 --json ramp.json
+
+Replays a corpus of C programs (files or directories of .c files; the
+bench_ast.py sample when none is given) through grade_submission() on one
+thread per submission, the way concurrent app sessions or server.py jobs
+drive it. Arrival profiles:
+  constant   `--rate` submissions per second
+  burst      `--burst-size` submissions at once every `--burst-every` seconds
+  ramp       rate rising linearly from `--rate` to `--peak-rate` (a deadline rush)
+Arrivals are evenly spaced unless `--poisson` is given.
+
+Groq and Gemini point at an in-process llm_stub.StubLLMServer (or
+`--stub-url`), so runs are free, offline and include realistic API latency
+and 429 / 500 errors. Caches, results and the output index go to a
+throwaway directory, and each submission gets a unique trailing comment so
+per-source caches do not hide the real cost (`--warm` keeps sources as-is).
+
+Reported: throughput, p50 / p95 / p99 end-to-end latency (from scheduled
+arrival to finished report), scheduler queue depth, host CPU busy share and
+how often it was saturated, degraded stages, errors and stub request counts.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_SATURATED = 0.9   # CPU busy share counted as saturated
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Corpus and arrival schedule
+# ─────────────────────────────────────────────────────────────────────────────
+def load_corpus(paths: list[str]) -> list[tuple[str, str]]:
+    """[(name, source)] for every .c file under `paths`."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, n) for n in sorted(names) if n.endswith(".c")]
+        else:
+            files.append(path)
+    corpus = []
+    for path in sorted(files):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+def schedule(profile: str, duration: float, rate: float, peak_rate: float | None = None,
+             burst_size: int = 20, burst_every: float = 30.0, poisson: bool = False,
+             seed: int | None = None) -> list[float]:
+    """Arrival offsets in seconds from the start of the run, sorted."""
+    rng = random.Random(seed)
+    if profile == "burst":
+        starts = [i * burst_every for i in range(int(duration // burst_every) + 1)]
+        return [t for t in starts for _ in range(burst_size)]
+
+    peak = peak_rate if profile == "ramp" and peak_rate is not None else rate
+    rate_at = lambda t: rate + (peak - rate) * t / duration
+
+    if poisson:
+        # Thinning: candidates at the peak rate, kept with probability rate(t) / peak
+        top, t, times = max(rate, peak), 0.0, []
+        while True:
+            t += rng.expovariate(top)
+            if t >= duration:
+                return times
+            if rng.random() * top <= rate_at(t):
+                times.append(t)
+
+    # Evenly spaced: the k-th arrival is where the cumulative rate reaches k
+    slope, times, k = (peak - rate) / duration, [], 0
+    while True:
+        if slope:
+            t = (-rate + math.sqrt(rate * rate + 2 * slope * k)) / slope
+        else:
+            t = k / rate
+        if t >= duration:
+            return times
+        times.append(t)
+        k += 1
+
+
+def _pct(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile (q in 0–100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Host sampler — queue depth and CPU while the load runs
+# ─────────────────────────────────────────────────────────────────────────────
+def _cpu_times() -> tuple[float, float] | None:
+    """(busy, total) jiffies from /proc/stat, or None off Linux."""
+    try:
+        with open("/proc/stat") as f:
+            fields = [float(x) for x in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0.0)   # idle + iowait
+    return sum(fields) - idle, sum(fields)
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float, start: float):
+        super().__init__(name="loadtest-sampler", daemon=True)
+        self.interval = interval
+        self.start_at = start
+        self.samples  = []
+        self._done    = threading.Event()
+
+    def run(self):
+        from scheduler import SCHEDULER
+        import budget
+
+        prev = _cpu_times()
+        while not self._done.wait(self.interval):
+            now, cpu = _cpu_times(), None
+            if prev and now and now[1] > prev[1]:
+                cpu = (now[0] - prev[0]) / (now[1] - prev[1])
+            prev = now
+            stats = SCHEDULER.stats()
+            self.samples.append({
+                "t":         round(time.monotonic() - self.start_at, 2),
+                "waiting":   stats["waiting"],
+                "active":    stats["active"],
+                "in_flight": budget._in_flight,
+                "cpu":       round(cpu, 3) if cpu is not None else None,
+                "load1":     round(os.getloadavg()[0], 2),
+            })
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Run
+# ─────────────────────────────────────────────────────────────────────────────
+def run_load(corpus: list[tuple[str, str]], arrivals: list[float], title: str = "Load test",
+             students: int = 0, warm: bool = False, max_in_flight: int = 512,
+             sample_interval: float = 0.5) -> dict:
+    """
+    Submits corpus entries round-robin at the `arrivals` offsets and waits
+    for all of them. `students` > 0 reuses that many student names (to
+    exercise the scheduler's per-student fairness); 0 gives each submission
+    its own. Returns the report dict described in the module docstring.
+    """
+    from orchestrator import grade_submission
+
+    records = []
+    lock    = threading.Lock()
+    start   = time.monotonic()
+
+    def submit(i: int, offset: float):
+        name, source = corpus[i % len(corpus)]
+        if not warm:
+            source = f"{source}\n/* loadtest {i} */\n"
+        student = f"student-{i % students if students else i}"
+        record  = {"id": i, "source": name, "student": student, "arrival": round(offset, 3)}
+        try:
+            report = grade_submission(title, source, student)
+            record["compiled"] = report.get("compiled", False)
+            record["degraded"] = report.get("budget", {}).get("degraded", [])
+        except Exception as e:
+            logger.exception(f"loadtest: submission {i} failed")
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["latency"] = round(time.monotonic() - start - offset, 3)
+        with lock:
+            records.append(record)
+
+    sampler = _Sampler(sample_interval, start)
+    sampler.start()
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="loadtest") as pool:
+        for i, offset in enumerate(arrivals):
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(submit, i, offset)
+    elapsed = time.monotonic() - start
+    sampler.stop()
+    return summarize(records, sampler.samples, elapsed)
+
+
+def summarize(records: list[dict], samples: list[dict], elapsed: float) -> dict:
+    done      = [r for r in records if "error" not in r]
+    latencies = [r["latency"] for r in done]
+    waiting   = [s["waiting"] for s in samples]
+    cpu       = [s["cpu"] for s in samples if s["cpu"] is not None]
+    degraded  = {}
+    for r in done:
+        for stage in r["degraded"]:
+            degraded[stage] = degraded.get(stage, 0) + 1
+    return {
+        "submitted":       len(records),
+        "completed":       len(done),
+        "errors":          len(records) - len(done),
+        "compile_failed":  sum(1 for r in done if not r["compiled"]),
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_per_min": round(60 * len(done) / elapsed, 2) if elapsed else 0.0,
+        "latency": {
+            "p50":  _pct(latencies, 50),
+            "p95":  _pct(latencies, 95),
+            "p99":  _pct(latencies, 99),
+            "max":  max(latencies, default=None),
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+        },
+        "queue_depth": {
+            "mean": round(sum(waiting) / len(waiting), 2) if waiting else 0,
+            "p95":  _pct(waiting, 95) or 0,
+            "max":  max(waiting, default=0),
+        },
+        "cpu": {
+            "cores":           os.cpu_count(),
+            "mean_busy":       round(sum(cpu) / len(cpu), 3) if cpu else None,
+            "p95_busy":        _pct(cpu, 95),
+            "saturated_share": round(sum(1 for c in cpu if c >= _SATURATED) / len(cpu), 3) if cpu else None,
+            "max_load1":       max((s["load1"] for s in samples), default=None),
+        },
+        "degraded":    dict(sorted(degraded.items(), key=lambda kv: -kv[1])),
+        "samples":     samples,
+        "submissions": sorted(records, key=lambda r: r["id"]),
+    }
+
+
+def _print_report(result: dict, profile: str):
+    lat, q, cpu = result["latency"], result["queue_depth"], result["cpu"]
+    fmt = lambda v, unit="s": "-" if v is None else f"{v:.2f}{unit}"
+    print(f"\nprofile {profile}: {result['submitted']} submitted, {result['completed']} completed, "
+          f"{result['errors']} errors, {result['compile_failed']} compile failures "
+          f"in {result['elapsed_seconds']:.1f}s")
+    print(f"  throughput        {result['throughput_per_min']:.1f} submissions/min")
+    print(f"  latency           p50 {fmt(lat['p50'])}   p95 {fmt(lat['p95'])}   "
+          f"p99 {fmt(lat['p99'])}   max {fmt(lat['max'])}")
+    print(f"  queue depth       mean {q['mean']:.1f}   p95 {q['p95']}   max {q['max']}")
+    if cpu["mean_busy"] is not None:
+        print(f"  CPU ({cpu['cores']} cores)   mean {cpu['mean_busy']:.0%}   p95 {cpu['p95_busy']:.0%}   "
+              f"saturated {cpu['saturated_share']:.0%} of samples   max load1 {cpu['max_load1']}")
+    if result["degraded"]:
+        print("  degraded stages   " + ", ".join(f"{k} ×{v}" for k, v in result["degraded"].items()))
+    if result.get("stub"):
+        print("  stub requests     " + ", ".join(f"{k} {v}" for k, v in result["stub"].items()))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load-test the grading pipeline.")
+    ap.add_argument("corpus", nargs="*", help=".c files or directories (default: bundled sample)")
+    ap.add_argument("--profile", choices=("constant", "burst", "ramp"), default="constant")
+    ap.add_argument("--duration", type=float, default=60.0, help="seconds of arrivals")
+    ap.add_argument("--rate", type=float, default=1.0, help="submissions/s (ramp: starting rate)")
+    ap.add_argument("--peak-rate", type=float, help="ramp: rate at the end of the run")
+    ap.add_argument("--burst-size", type=int, default=20)
+    ap.add_argument("--burst-every", type=float, default=30.0)
+    ap.add_argument("--poisson", action="store_true", help="random (Poisson) arrivals")
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--students", type=int, default=0, help="distinct student names (0: one each)")
+    ap.add_argument("--title", default="Load test")
+    ap.add_argument("--warm", action="store_true", help="resubmit sources unchanged (cache hits)")
+    ap.add_argument("--max-in-flight", type=int, default=512)
+    ap.add_argument("--sample-interval", type=float, default=0.5)
+    ap.add_argument("--stub-url", help="external llm_stub.py server instead of an in-process one")
+    ap.add_argument("--latency-scale", type=float, default=1.0, help="stub latency multiplier")
+    ap.add_argument("--error-rate", type=float, default=0.03, help="stub 429 / 500 share")
+    ap.add_argument("--real-llm", action="store_true", help="use the real APIs from the environment")
+    ap.add_argument("--json", help="write the full result (with samples) to this file")
+    args = ap.parse_args(argv)
+    if args.profile == "ramp" and args.peak_rate is None:
+        ap.error("--profile ramp needs --peak-rate")
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        from bench_ast import SAMPLE_SUBMISSION
+        corpus = [("sample.c", SAMPLE_SUBMISSION)]
+    arrivals = schedule(args.profile, args.duration, args.rate, args.peak_rate,
+                        args.burst_size, args.burst_every, args.poisson, args.seed)
+    if not arrivals:
+        sys.exit("The arrival profile produced no submissions.")
+
+    # Environment first: config.py and llm.py read it at import time
+    cache_dir = tempfile.mkdtemp(prefix="loadtest_")
+    os.environ["AUTOGRADER_CACHE_DIR"] = cache_dir
+    stub = None
+    if not args.real_llm:
+        if args.stub_url:
+            url = args.stub_url
+        else:
+            from llm_stub import StubLLMServer
+            stub = StubLLMServer(latency_scale=args.latency_scale, error_rate=args.error_rate,
+                                 seed=args.seed).start()
+            url = stub.url
+        for key in ("GROQ", "GEMINI"):
+            os.environ[f"{key}_BASE_URL"] = url
+            os.environ[f"{key}_API_KEY"]  = "stub"
+
+    print(f"{len(arrivals)} submissions over {args.duration:.0f}s ({args.profile}), "
+          f"corpus of {len(corpus)} program(s), LLM: {'real APIs' if args.real_llm else url}")
+    try:
+        result = run_load(corpus, arrivals, args.title, args.students, args.warm,
+                          args.max_in_flight, args.sample_interval)
+        result["profile"] = vars(args)
+        if stub:
+            result["stub"] = stub.stats()
+        _print_report(result, args.profile)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"\nFull result written to {args.json}")
+    finally:
+        if stub:
+            stub.stop()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    main()
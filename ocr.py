@@ -0,0 +1,265 @@
+"""
+ocr.py
+Page-wise, parallel and cached OCR pipeline for scanned submissions.
+
+Functions:
+  page_count(file_bytes, file_name)                   → number of pages (1 for images)
+  prepare_pages(file_bytes, file_name, pages)         → [(page_index, jpeg_bytes)]
+  extract_pages(file_bytes, file_name, transcribe)    → per-page transcriptions
+  extract_code(file_bytes, file_name, transcribe)     → joined transcription
+  failed_pages(texts)                                 → indexes whose transcription failed
+
+Pipeline:
+  1. Pages already transcribed are served from DiskCache("ocr"), keyed by
+     the file hash, the page index and the render settings.
+  2. The remaining PDF pages are rendered in one process pool shared by
+     every call (PyMuPDF is not thread-safe). Its workers come from a
+     forkserver, not a fork of the threaded grader, start on first use and
+     keep the last few documents open; the PDF reaches them as a temp file
+     written once per file, not pickled per page. Like any forkserver
+     child they import __main__, so scripts calling this module need the
+     usual `if __name__ == "__main__":` guard.
+  3. Every page is downscaled to fit OCR_MAX_PIXELS, converted to grayscale
+     and JPEG-compressed, so no request carries full-size RGB bitmaps.
+  4. Each page is sent to the vision model as soon as it is rendered, one
+     page per request with at most OCR_MAX_CONCURRENCY requests in flight,
+     which keeps long exam scripts under the request-size limit.
+
+`transcribe` is any callable taking JPEG bytes and returning text; llm.py
+passes its Gemini wrapper so this module stays free of API clients.
+"""
+
+import io
+import os
+import logging
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from cache import DiskCache, content_hash
+from config import (
+    OCR_RENDER_DPI, OCR_MAX_PIXELS, OCR_JPEG_QUALITY,
+    OCR_RENDER_WORKERS, OCR_MAX_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+_cache = DiskCache("ocr")
+
+# Start of the placeholder text extract_pages() returns for a failed page
+FAILED_MARKER = "// OCR failed on page"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPERS — image preparation
+# ─────────────────────────────────────────────────────────────────────────────
+def _is_pdf(file_name: str) -> bool:
+    return file_name.lower().endswith(".pdf")
+
+
+def _compress(img) -> bytes:
+    """Grayscale, fit inside the pixel budget, JPEG-encode."""
+    img = img.convert("L")
+    w, h = img.size
+    if w * h > OCR_MAX_PIXELS:
+        scale = (OCR_MAX_PIXELS / (w * h)) ** 0.5
+        img = img.resize((max(1, int(w * scale)), max(1, int(h * scale))))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+def _render_page(doc, index: int) -> tuple[int, bytes]:
+    """Render one page of an open document straight to grayscale."""
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    page = doc[index]
+    # Never render more pixels than the budget allows in the first place
+    zoom = OCR_RENDER_DPI / 72
+    area = page.rect.width * page.rect.height * zoom * zoom
+    if area > OCR_MAX_PIXELS:
+        zoom *= (OCR_MAX_PIXELS / area) ** 0.5
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    return index, _compress(img)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPERS — shared render pool
+# ─────────────────────────────────────────────────────────────────────────────
+_WORKER_DOCS = 4      # documents each render worker keeps open
+
+_worker_docs = {}     # in a render worker: temp path → open document
+
+
+def _render_in_worker(path: str, index: int) -> tuple[int, bytes]:
+    """Runs in a pool worker; opens each document once and keeps it open."""
+    doc = _worker_docs.get(path)
+    if doc is None:
+        import fitz  # PyMuPDF
+        if len(_worker_docs) >= _WORKER_DOCS:
+            _worker_docs.pop(next(iter(_worker_docs))).close()
+        doc = _worker_docs[path] = fitz.open(path)
+    return _render_page(doc, index)
+
+
+_pool_lock   = threading.Lock()
+_render_pool = None
+_pdf_files   = {}     # file hash → [temp path, calls using it]
+
+
+def _get_render_pool() -> ProcessPoolExecutor | None:
+    global _render_pool
+    if OCR_RENDER_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=OCR_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _render_pool
+
+
+@contextlib.contextmanager
+def _pdf_on_disk(file_bytes: bytes, file_hash: str):
+    """Temp copy of the PDF for the render workers, shared by concurrent calls."""
+    with _pool_lock:
+        entry = _pdf_files.get(file_hash)
+        if entry is None:
+            fd, path = tempfile.mkstemp(prefix="ocr-", suffix=".pdf")
+            with os.fdopen(fd, "wb") as f:
+                f.write(file_bytes)
+            entry = _pdf_files[file_hash] = [path, 0]
+        entry[1] += 1
+    try:
+        yield entry[0]
+    finally:
+        with _pool_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _pdf_files[file_hash]
+                os.remove(entry[0])
+
+
+def _rendered(file_bytes: bytes, file_name: str, pages: list[int], file_hash: str):
+    """Yields (page_index, jpeg_bytes) as each page finishes rendering."""
+    if not _is_pdf(file_name):
+        from PIL import Image
+        yield 0, _compress(Image.open(io.BytesIO(file_bytes)))
+        return
+
+    pool = _get_render_pool()
+    if pool is None:
+        import fitz  # PyMuPDF
+        with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+            for i in pages:
+                yield _render_page(doc, i)
+        return
+
+    with _pdf_on_disk(file_bytes, file_hash) as path:
+        futures = [pool.submit(_render_in_worker, path, i) for i in pages]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _page_key(file_hash: str, index: int) -> str:
+    return content_hash(file_hash, index, OCR_RENDER_DPI, OCR_MAX_PIXELS, OCR_JPEG_QUALITY)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# page_count / prepare_pages
+# ─────────────────────────────────────────────────────────────────────────────
+def page_count(file_bytes: bytes, file_name: str) -> int:
+    if not _is_pdf(file_name):
+        return 1
+    import fitz  # PyMuPDF
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def prepare_pages(file_bytes: bytes, file_name: str,
+                  pages: list[int] | None = None) -> list[tuple[int, bytes]]:
+    """Renders / compresses the requested pages, in page order."""
+    if pages is None:
+        pages = list(range(page_count(file_bytes, file_name)))
+    return sorted(_rendered(file_bytes, file_name, pages, content_hash(file_bytes)))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# extract_pages / extract_code
+# ─────────────────────────────────────────────────────────────────────────────
+def extract_pages(file_bytes: bytes, file_name: str, transcribe,
+                  pages: list[int] | None = None, on_page=None) -> dict[int, str]:
+    """
+    Returns {page_index: text}. Successful transcriptions are cached; failed
+    pages come back as a `// OCR failed on page N: ...` comment and are
+    retried on the next call. `on_page(index, text)` is called as each
+    page becomes available (cached pages first).
+    """
+    file_hash = content_hash(file_bytes)
+    if pages is None:
+        pages = list(range(page_count(file_bytes, file_name)))
+
+    texts   = {}
+    missing = []
+    for i in pages:
+        hit = _cache.get(_page_key(file_hash, i))
+        if hit is not None:
+            texts[i] = hit["text"]
+            if on_page:
+                on_page(i, texts[i])
+        else:
+            missing.append(i)
+
+    if missing:
+        logger.info(f"OCR: {len(pages) - len(missing)} cached page(s), transcribing {len(missing)}.")
+
+        def _one(index, jpeg):
+            try:
+                text = transcribe(jpeg)
+            except Exception as e:
+                logger.error(f"OCR failed on page {index + 1}: {e}")
+                return index, f"{FAILED_MARKER} {index + 1}: {e}", False
+            return index, text, True
+
+        def _finish(future):
+            index, text, ok = future.result()
+            texts[index] = text
+            if ok:
+                _cache.set(_page_key(file_hash, index), {"text": text})
+            if on_page:
+                on_page(index, text)
+
+        with ThreadPoolExecutor(max_workers=OCR_MAX_CONCURRENCY) as pool:
+            # Each page is transcribed as soon as it is rendered; finished
+            # pages are reported on this thread between renders
+            pending = set()
+            for index, jpeg in _rendered(file_bytes, file_name, missing, file_hash):
+                pending.add(pool.submit(_one, index, jpeg))
+                done = {f for f in pending if f.done()}
+                pending -= done
+                for future in done:
+                    _finish(future)
+            for future in as_completed(pending):
+                _finish(future)
+
+    return {i: texts[i] for i in pages}
+
+
+def failed_pages(texts: dict[int, str]) -> list[int]:
+    """Page indexes in an extract_pages() result that hold the failure placeholder."""
+    return [i for i, text in texts.items() if text.startswith(FAILED_MARKER)]
+
+
+def extract_code(file_bytes: bytes, file_name: str, transcribe,
+                 pages: list[int] | None = None) -> str:
+    texts = extract_pages(file_bytes, file_name, transcribe, pages)
+    return "\n".join(t for t in texts.values() if t.strip()).strip()
@@ -1,13 +1,84 @@
-from agents import design_agent, test_agent, performance_agent, optimization_agent
-from config import WEIGHTS
-from llm import gemini_generate_report
+import os
+import tempfile
 
-def run_orchestration(title, source_c, binary, static_report):
-    design = design_agent(source_c)
-    tests = test_agent(title, source_c, binary)
-    performance = performance_agent(source_c, binary)
-    optimization = optimization_agent(source_c)
+from agents import (
+    design_agent, test_inputs, test_agent, time_binary, performance_agent, optimization_agent,
+)
+from rubric import RUBRIC, COMPONENTS, score_component
+from results_store import record
+from llm import gemini_generate_report, configured
+from utils import compile_c_code, run_cppcheck
+from budget import Budget, track
+from scheduler import SCHEDULER
+from sanitizers import start_shadow_build
+from sandbox import limits_for
+from stage_cache import binary_hash, cached_stage, peek
+from profiling import profiled
+from config import STAGE_ESTIMATES
 
+def _report_key_data(raw_report):
+    """
+    raw_report without the wall-clock measurements (per-case runtimes and
+    memory peaks, the timing run), which differ on every run. Keys the
+    report stage and its cassette entry; the prompt itself keeps them.
+    """
+    tests, perf = raw_report["tests"], raw_report["performance"]
+    return {
+        **raw_report,
+        "tests": {**tests, "measurements": {
+            k: v for k, v in tests["measurements"].items() if k not in ("runtimes", "memory_peak_kb")}},
+        # The score already reflects any runtime deduction
+        "performance": {"score": perf["score"], "measurements": {
+            k: v for k, v in perf["measurements"].items() if k not in ("runtime", "memory_peak_kb")}},
+    }
+
+
+# Run errors that depend on load at the time of the run, not on the program
+_LOAD_DEPENDENT = ("Timeout", "Output limit")
+
+
+def _repeatable_tests(tests):
+    """
+    True when no case timed out, hit a limit or was truncated, and every
+    case has a runtime. Anything else may be an artefact of load and must
+    be measured again on the next submission of the same binary.
+    """
+    for case in tests["cases"]:
+        if case.get("limit_kill") or case["actual"].startswith(_LOAD_DEPENDENT):
+            return False
+    runtimes = tests["measurements"]["runtimes"]
+    return all(isinstance(r, (int, float)) and r > 0 for r in runtimes)
+
+
+def _repeatable_timing(timing):
+    return not timing["error"] and bool(timing["runtime"])
+
+
+def _templated_summary(raw_report):
+    """Plain summary used when the Gemini report is skipped (degraded mode)."""
+    lines = [f"Total score: {raw_report['total_score']} / {sum(RUBRIC[c]['max'] for c in COMPONENTS):g}", ""]
+    for comp in ("design", "tests", "performance", "optimization"):
+        section = raw_report[comp]
+        lines.append(f"{comp.capitalize()}: {section['score']} / {RUBRIC[comp]['max']:g}")
+        lines.append(section["report"])
+        lines.append("")
+    lines.append(f"Static analysis: {raw_report['static_score']} / {RUBRIC['static']['max']:g} "
+                 f"({raw_report['static_measurements']['issues']} cppcheck issue(s))")
+    lines.append("")
+    lines.append("This summary was generated automatically because the detailed "
+                 "written evaluation was skipped under load.")
+    return "\n".join(lines)
+
+def run_orchestration(title, source_c, binary, static_report, budget=None, shadow=None, profile=None):
+    # profile=None follows AUTOGRADER_PROFILE; True / False forces it (UI toggle)
+    budget = budget or Budget()
+    with track(), profiled("orchestration", enabled=profile) as session:
+        report = _run_orchestration(title, source_c, binary, static_report, budget, shadow)
+    if session is not None and session.result:
+        report["profile"] = session.result
+    return report
+
+def _score_static(static_report):
     # Improved Static Analysis Scoring
     # Count occurrences of actual issues, not just lines
     # Cppcheck standard format usually includes ": (error)" or ": (warning)"
@@ -19,7 +90,63 @@ def run_orchestration(title, source_c, binary, static_report):
          lines = [line for line in static_report.splitlines() if "Checking " not in line and line.strip() != ""]
          issue_count = len(lines)
 
-    static_score = max(0, 20 - issue_count * 2.0)
+    static_measurements = {"issues": issue_count}
+    static_score, _ = score_component("static", static_measurements)
+    return static_measurements, static_score
+
+def _run_orchestration(title, source_c, binary, static_report, budget, shadow):
+    # Every stage is keyed on the inputs it reads (see stage_cache.py); a
+    # resubmission only recomputes what its changes touched
+    try:
+        src = open(source_c).read()
+    except OSError:
+        src = ""
+    bin_hash = binary_hash(binary)
+    limits   = limits_for(title)
+    reused   = []
+
+    def stage(name, parts, compute, **kwargs):
+        value, hit = cached_stage(name, parts, compute, budget, **kwargs)
+        if hit:
+            reused.append(name)
+        return value
+
+    design = stage("design", (src, RUBRIC["design"]), lambda: design_agent(source_c))
+
+    # Same stripped binary → same behaviour → same inputs (AST or LLM)
+    inputs, input_source = stage("inputs", (bin_hash, title),
+                                 lambda: test_inputs(title, src, budget),
+                                 store_if=lambda v: v[1] != "generic")
+
+    # Sanitizer findings carry source line numbers, so they key on the source
+    sanitizer_parts = (src, inputs)
+    sanitizer = peek("sanitizer", sanitizer_parts) if shadow else None
+    if sanitizer is not None:
+        reused.append("sanitizer")
+        shadow.cleanup()
+        shadow = None
+
+    tests = stage("tests", (bin_hash, inputs, limits, RUBRIC["tests"]),
+                  lambda: test_agent(title, source_c, binary, budget, shadow, inputs, input_source),
+                  store_if=_repeatable_tests)
+    if shadow is not None and "tests" in reused:
+        shadow.run(inputs, limits)
+
+    timing = stage("timing", (bin_hash,), lambda: time_binary(binary),
+                   store_if=_repeatable_timing)
+    performance = stage("performance", (src, timing, RUBRIC["performance"]),
+                        lambda: performance_agent(source_c, binary, timing))
+    # Shadow runs overlapped the stages above; take what has finished
+    if shadow is not None:
+        sanitizer = stage("sanitizer", sanitizer_parts, lambda: shadow.collect(budget),
+                          store_if=lambda v: v["status"] == "ok")
+    optimization = stage("optimization", (src, sanitizer, RUBRIC["optimization"]),
+                         lambda: optimization_agent(source_c, sanitizer))
+
+    # cppcheck names the temp file; the score does not depend on it
+    static_measurements, static_score = stage(
+        "static", (static_report.replace(source_c, "<source>"), RUBRIC["static"]),
+        lambda: _score_static(static_report))
 
     total = (
         design["score"]
@@ -28,6 +155,7 @@ def run_orchestration(title, source_c, binary, static_report):
         + optimization["score"]
         + static_score
     )
+    max_total = sum(RUBRIC[c]["max"] for c in COMPONENTS)
 
     raw_report = {
         "design": design,
@@ -36,19 +164,121 @@ def run_orchestration(title, source_c, binary, static_report):
         "optimization": optimization,
         "static_report": static_report,
         "static_score": round(static_score,2),
-        "total_score": round(min(total,100),2)
+        "static_measurements": static_measurements,
+        "total_score": round(min(total,max_total),2),
+        "rubric_version": RUBRIC["version"]
     }
 
     # ✅ FINAL REPORT BY GEMINI 2.5 FLASH
-    prompt = f"""
+    instructions = """
 Generate a professional university-grade evaluation report using this data.
 No JSON. Human written tone. No complex languages. No over explanation. No unnecessary information. No jargon included. Simple yet elaborative.
 The marks should be mentioned properly. And the reason behind marks deduction should also be mentioned to the student & academician.
 
 DATA:
-{raw_report}
 """
-    final_text = gemini_generate_report(prompt)
-    raw_report["gemini_final_report"] = final_text if final_text else "Gemini API not configured."
+    prompt     = f"{instructions}{raw_report}\n"
+    report_key = f"{instructions}{_report_key_data(raw_report)}\n".replace(source_c, "<source>")
+
+    # Unchanged data → the earlier report is reused, even under load
+    report_parts = (report_key,)
+    final_text   = peek("report", report_parts)
+    if final_text:
+        reused.append("report")
+        raw_report["gemini_final_report"] = final_text
+    elif not configured("report"):
+        raw_report["gemini_final_report"] = "Gemini API not configured."
+    elif budget.allows("gemini_report"):
+        final_text = stage("report", report_parts,
+                           lambda: gemini_generate_report(prompt, timeout=budget.timeout(STAGE_ESTIMATES["gemini_report"]),
+                                                          key=report_key),
+                           store_if=bool)
+        if not final_text:
+            budget.degrade("gemini_report", "Report generation failed; templated summary used.")
+            final_text = _templated_summary(raw_report)
+        raw_report["gemini_final_report"] = final_text
+    else:
+        budget.degrade("gemini_report", "Gemini report skipped; templated summary used.")
+        raw_report["gemini_final_report"] = _templated_summary(raw_report)
+
+    raw_report["reused_stages"] = reused
+    raw_report["degraded"] = budget.degraded
+    raw_report["budget"]   = budget.summary()
 
     return raw_report
+
+
+def grade_submission(title, source_text, student_name="", budget=None):
+    """
+    Headless version of the app.py pipeline: save → gcc → cppcheck → agents.
+    Used by the batch / service entry points. Returns the raw report with
+    "student" and "compiled" added; on a compile failure the report only
+    carries the gcc log and a zero total. `budget` (budget.Budget) carries
+    the caller's deadline; a default budget is used when omitted.
+
+    `source_text` may also be a multi-file project, {relative path: text}:
+    each .c file is compiled to a cached object (build.py) and the agents
+    read the amalgamated source. The report then carries "build", the
+    per-unit reuse.
+    """
+    budget  = budget or Budget()
+    project = None
+    if isinstance(source_text, dict):
+        from build import Project
+        project     = Project(source_text)
+        source_path = project.source_path
+    else:
+        tmp = tempfile.NamedTemporaryFile(suffix=".c", delete=False)
+        tmp.write(source_text.encode("utf-8"))
+        tmp.close()
+        source_path = tmp.name
+    binary_path = None
+    shadow      = None
+
+    try:
+        # Fair, process-wide admission (see scheduler.py)
+        with SCHEDULER.admit(student_name):
+            # ASan/UBSan build compiles alongside the graded one (sanitizers.py)
+            if project:
+                shadow = start_shadow_build(project.sources, budget, project.root, project.cflags)
+                compile_result = project.build()
+            else:
+                shadow = start_shadow_build(source_path, budget)
+                compile_result = compile_c_code(source_path)
+            build_info = ({"units": compile_result["units"], "link": compile_result["link"]}
+                          if project else None)
+            if not compile_result["success"]:
+                failed = {
+                    "student": student_name,
+                    "compiled": False,
+                    "compile_errors": compile_result["errors"],
+                    "total_score": 0
+                }
+                if build_info:
+                    failed["build"] = build_info
+                return failed
+            binary_path = compile_result["binary"]
+
+            static_report = run_cppcheck(".", project.root) if project else run_cppcheck(source_path)
+            report = run_orchestration(title, source_path, binary_path, static_report, budget, shadow)
+            report["student"] = student_name
+            report["compiled"] = True
+            if build_info:
+                report["build"] = build_info
+            record(title, student_name, report)
+            return report
+    finally:
+        if shadow and project:
+            # The shadow compile may not have read the units yet
+            shadow.cleanup(project.workdir)
+        elif shadow:
+            shadow.cleanup()
+        if project and not shadow:
+            project.cleanup()
+        elif not project:
+            for path in (source_path, binary_path):
+                try:
+                    if path and os.path.exists(path):
+                        os.unlink(path)
+                except OSError:
+                    pass
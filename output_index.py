@@ -0,0 +1,259 @@
+"""
+output_index.py
+Class-wide index of test-case outputs, for clustering identical behaviours.
+
+Functions:
+  index_report(assignment, student, report)          → stores every case of one graded report
+  clusters(assignment, input_hash=None)              → behaviour clusters per input, largest first
+  students_in(assignment, input_hash, output_hash)   → who produced that output for that input
+  outliers(assignment)                               → runs whose output matches nobody else's
+  consensus(assignment, input_hash, min_share=0.5)   → majority output for an input, if any
+
+Usage:
+  python output_index.py clusters  "Sum of digits" [--input 3fa9c2]
+  python output_index.py students  "Sum of digits" 3fa9c2 81d0e4
+  python output_index.py outliers  "Sum of digits"
+  python output_index.py consensus "Sum of digits" 3fa9c2
+
+Every test case is keyed by (assignment, input hash, output hash). The
+output hash is runner.py's sha256 of the stripped stdout; a case that
+crashed or timed out is hashed from its error text, so "Timeout" is one
+behaviour too. One sample input / output is kept per cluster, so an
+instructor can review one representative per cluster instead of every
+report. Each student's latest submission replaces their earlier runs.
+Hash arguments accept any unique prefix.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+
+from config import OUTPUT_INDEX_PATH, OUTPUT_SAMPLE_CHARS
+from results_store import class_slug
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    assignment   TEXT NOT NULL,
+    input_hash   TEXT NOT NULL,
+    student      TEXT NOT NULL,
+    output_hash  TEXT NOT NULL,
+    outcome      TEXT NOT NULL,          -- "ok", "empty" or "error"
+    passed       INTEGER NOT NULL,
+    case_index   INTEGER NOT NULL,
+    submitted_at REAL NOT NULL,
+    PRIMARY KEY (assignment, input_hash, student)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_cluster ON runs (assignment, input_hash, output_hash);
+CREATE INDEX IF NOT EXISTS runs_student ON runs (assignment, student);
+
+CREATE TABLE IF NOT EXISTS samples (
+    assignment   TEXT NOT NULL,
+    input_hash   TEXT NOT NULL,
+    output_hash  TEXT NOT NULL,
+    input_text   TEXT NOT NULL,
+    output_text  TEXT NOT NULL,
+    PRIMARY KEY (assignment, input_hash, output_hash)
+) WITHOUT ROWID;
+"""
+
+_init_lock = threading.Lock()
+_ready     = set()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPERS
+# ─────────────────────────────────────────────────────────────────────────────
+@contextmanager
+def _connect(path: str = OUTPUT_INDEX_PATH):
+    """One short-lived connection per call; WAL lets readers run during writes."""
+    with _init_lock:
+        if path not in _ready:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            conn.close()
+            _ready.add(path)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+def _case_key(case: dict) -> tuple[str, str, str]:
+    """(input_hash, output_hash, outcome) for one test_agent case."""
+    raw_input = case.get("input_raw", case.get("input", ""))
+    if case.get("output_hash"):
+        return _sha(raw_input), case["output_hash"], "ok"
+    if case.get("expected", "").startswith("[Empty"):
+        return _sha(raw_input), _sha(""), "empty"
+    return _sha(raw_input), _sha(f"[error] {case.get('actual', '')}"), "error"
+
+
+def _prefix(value: str) -> str:
+    """GLOB pattern for a hex hash prefix (uses the index, unlike LIKE)."""
+    return "".join(c for c in value.lower() if c in "0123456789abcdef") + "*"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# index_report
+# ─────────────────────────────────────────────────────────────────────────────
+def index_report(assignment: str, student: str, report: dict, path: str = OUTPUT_INDEX_PATH) -> int:
+    """Indexes the test cases of one raw report; returns the number stored."""
+    cases = report.get("tests", {}).get("cases", [])
+    if not cases:
+        return 0
+    key, student, now = class_slug(assignment), student or "anonymous", time.time()
+
+    runs, samples = [], []
+    for i, case in enumerate(cases):
+        input_hash, output_hash, outcome = _case_key(case)
+        runs.append((key, input_hash, student, output_hash, outcome,
+                     int(bool(case.get("pass"))), i, now))
+        output = case.get("expected", "") if outcome == "ok" else case.get("actual", "")
+        samples.append((key, input_hash, output_hash,
+                        case.get("input_raw", case.get("input", "")),
+                        (output or "")[:OUTPUT_SAMPLE_CHARS]))
+    try:
+        with _connect(path) as conn:
+            # Only the latest submission of each student counts
+            conn.execute("DELETE FROM runs WHERE assignment = ? AND student = ?", (key, student))
+            conn.executemany("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", runs)
+            conn.executemany("INSERT OR IGNORE INTO samples VALUES (?, ?, ?, ?, ?)", samples)
+    except sqlite3.Error as e:
+        logger.error(f"index_report: cannot write {path} — {e}")
+        return 0
+    return len(runs)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Queries
+# ─────────────────────────────────────────────────────────────────────────────
+def clusters(assignment: str, input_hash: str | None = None,
+             path: str = OUTPUT_INDEX_PATH) -> list[dict]:
+    """
+    One row per (input, output) cluster: size, share of the students who ran
+    that input, outcome, pass count and a sample. Largest clusters first
+    within each input; inputs ordered by how many students ran them.
+    """
+    sql = """
+        SELECT r.input_hash, r.output_hash, r.outcome,
+               COUNT(*)                                   AS size,
+               SUM(r.passed)                              AS passed,
+               t.total                                    AS input_total,
+               s.input_text, s.output_text
+        FROM runs r
+        JOIN (SELECT input_hash, COUNT(*) AS total FROM runs
+              WHERE assignment = :a GROUP BY input_hash) t USING (input_hash)
+        LEFT JOIN samples s
+               ON s.assignment = r.assignment AND s.input_hash = r.input_hash
+              AND s.output_hash = r.output_hash
+        WHERE r.assignment = :a AND r.input_hash GLOB :i
+        GROUP BY r.input_hash, r.output_hash
+        ORDER BY input_total DESC, r.input_hash, size DESC
+    """
+    with _connect(path) as conn:
+        rows = conn.execute(sql, {"a": class_slug(assignment),
+                                  "i": _prefix(input_hash or "")}).fetchall()
+    return [{**dict(r), "share": round(r["size"] / r["input_total"], 3)} for r in rows]
+
+
+def students_in(assignment: str, input_hash: str, output_hash: str,
+                path: str = OUTPUT_INDEX_PATH) -> list[str]:
+    """Students whose latest submission produced `output_hash` on `input_hash`."""
+    with _connect(path) as conn:
+        rows = conn.execute(
+            "SELECT student FROM runs WHERE assignment = ? AND input_hash GLOB ? "
+            "AND output_hash GLOB ? ORDER BY student",
+            (class_slug(assignment), _prefix(input_hash), _prefix(output_hash)),
+        ).fetchall()
+    return [r["student"] for r in rows]
+
+
+def outliers(assignment: str, min_peers: int = 2, path: str = OUTPUT_INDEX_PATH) -> list[dict]:
+    """
+    Runs whose output nobody else produced, on inputs at least `min_peers`
+    students ran (an input only one student ran says nothing).
+    """
+    sql = """
+        SELECT r.student, r.input_hash, r.output_hash, r.outcome, r.passed, r.case_index
+        FROM runs r
+        JOIN (SELECT input_hash, output_hash, COUNT(*) AS size FROM runs
+              WHERE assignment = :a GROUP BY input_hash, output_hash) c
+          USING (input_hash, output_hash)
+        JOIN (SELECT input_hash, COUNT(*) AS total FROM runs
+              WHERE assignment = :a GROUP BY input_hash) t USING (input_hash)
+        WHERE r.assignment = :a AND c.size = 1 AND t.total >= :m
+        ORDER BY r.student, r.case_index
+    """
+    with _connect(path) as conn:
+        rows = conn.execute(sql, {"a": class_slug(assignment), "m": min_peers}).fetchall()
+    return [dict(r) for r in rows]
+
+
+def consensus(assignment: str, input_hash: str, min_share: float = 0.5,
+              path: str = OUTPUT_INDEX_PATH) -> dict | None:
+    """
+    The output most students produced for `input_hash`, if it covers more
+    than `min_share` of them and is a clean run; otherwise None.
+    """
+    for row in clusters(assignment, input_hash, path):
+        # clusters() is sorted largest-first per input; the first row wins
+        if row["outcome"] == "ok" and row["share"] > min_share:
+            return row
+        return None
+    return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Query the class-wide output index.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    cp = sub.add_parser("clusters", help="Behaviour clusters per input")
+    cp.add_argument("assignment")
+    cp.add_argument("--input", help="Input hash (prefix)")
+    sp = sub.add_parser("students", help="Students in one cluster")
+    sp.add_argument("assignment")
+    sp.add_argument("input_hash")
+    sp.add_argument("output_hash")
+    op = sub.add_parser("outliers", help="Outputs that match nobody else's")
+    op.add_argument("assignment")
+    np_ = sub.add_parser("consensus", help="Majority output for one input")
+    np_.add_argument("assignment")
+    np_.add_argument("input_hash")
+    np_.add_argument("--min-share", type=float, default=0.5)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "clusters":
+        for c in clusters(args.assignment, args.input):
+            print(f"input {c['input_hash'][:12]}  output {c['output_hash'][:12]}  "
+                  f"{c['size']:>4} student(s) ({c['share']:.0%})  {c['outcome']:<5}  "
+                  f"{c['passed']} passed  sample: {json.dumps((c['output_text'] or '')[:60])}")
+    elif args.cmd == "students":
+        print("\n".join(students_in(args.assignment, args.input_hash, args.output_hash)))
+    elif args.cmd == "outliers":
+        for o in outliers(args.assignment):
+            print(f"{o['student']}: case {o['case_index'] + 1}, input {o['input_hash'][:12]}, "
+                  f"output {o['output_hash'][:12]} ({o['outcome']})")
+    elif args.cmd == "consensus":
+        print(json.dumps(consensus(args.assignment, args.input_hash, args.min_share), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    main()
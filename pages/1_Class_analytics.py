@@ -0,0 +1,119 @@
+"""
+pages/1_Class_analytics.py
+Streamlit page: aggregate view over every stored submission of a class.
+
+All numbers come from analytics.class_analytics(), which works on the
+cached NumPy columns of results_store; this page only turns the arrays
+into tables and charts. Streamlit lists it in the sidebar next to app.py.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from analytics import class_analytics, to_csv, PERCENTILES
+from results_store import list_classes
+from rubric import COMPONENTS
+
+st.set_page_config(page_title="Class analytics", page_icon="📊", layout="wide")
+st.title("📊 Class analytics")
+
+
+def _bins(hist: dict, unit: str, digits: int) -> pd.DataFrame:
+    """Histogram dict → one row per bin, labelled by its lower edge."""
+    edges = hist["edges"]
+    labels = [f"{edges[i]:.{digits}f}{unit}" for i in range(len(hist["counts"]))]
+    return pd.DataFrame({"bin": labels, "count": hist["counts"]}).set_index("bin")
+
+
+classes = list_classes()
+if not classes:
+    st.info("No graded submissions are stored yet. Results appear here once submissions are graded.")
+    st.stop()
+
+assignment = st.selectbox("Assignment", classes)
+start = time.perf_counter()
+data  = class_analytics(assignment)
+elapsed = time.perf_counter() - start
+if not data["students"]:
+    st.info("This class has no stored submissions.")
+    st.stop()
+
+dist, tests = data["distribution"], data["tests"]
+st.caption(f"Latest submission of each student · rubric v{data['rubric_version']} · "
+           f"computed in {elapsed * 1000:.0f} ms")
+
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Students", len(data["students"]))
+c2.metric("Mean total", f"{dist['total']['mean']:.1f} / {dist['total']['out_of']}")
+c3.metric("Median total", f"{dist['total']['p50']:.1f}")
+c4.metric("All tests passed", f"{tests['all_passed']} / {len(data['students'])}")
+
+# ── Score distributions ──────────────────────────────────────────────────────
+st.subheader("Score distribution")
+left, right = st.columns([3, 2])
+with left:
+    columns = ["mean", "std", "min", *(f"p{p}" for p in PERCENTILES), "max", "out_of"]
+    st.dataframe(pd.DataFrame(dist).T[columns], width="stretch")
+with right:
+    hist = data["total_histogram"]
+    st.bar_chart(pd.DataFrame({"bin": [f"{e:g}" for e in hist["edges"][:-1]],
+                               "students": hist["counts"]}).set_index("bin"))
+
+# ── Tests ────────────────────────────────────────────────────────────────────
+st.subheader("Failure rate per test case")
+if tests["cases"]:
+    failures = pd.DataFrame({
+        "case":         [f"case {i + 1}" for i in range(tests["cases"])],
+        "failure rate": tests["failure_rate"],
+        "students":     tests["ran"],
+    }).set_index("case")
+    left, right = st.columns([3, 2])
+    left.bar_chart(failures["failure rate"])
+    right.dataframe(failures.style.format({"failure rate": "{:.0%}"}), width="stretch")
+    st.caption("Case i is the i-th input generated for each submission; inputs differ per program.")
+else:
+    st.caption("No test-case results stored.")
+
+# ── Correlations ─────────────────────────────────────────────────────────────
+st.subheader("Correlation between rubric components")
+corr = pd.DataFrame(data["correlations"]["matrix"], index=list(COMPONENTS), columns=list(COMPONENTS))
+st.dataframe(corr.round(2), width="stretch")
+st.caption("Pearson correlation of component scores; blank where a component is constant across the class.")
+
+# ── Runtime / memory ─────────────────────────────────────────────────────────
+st.subheader("Runtime and memory per test-case run")
+left, right = st.columns(2)
+with left:
+    runtime = data["runtime"]
+    if runtime["histogram"]["counts"]:
+        st.bar_chart(_bins(runtime["histogram"], " s", 4))
+        st.caption(f"p95 {runtime['p95']:.4f} s (log-spaced bins)")
+    else:
+        st.caption("No runtimes stored.")
+with right:
+    memory = data["memory"]
+    if memory["histogram"]["counts"]:
+        st.bar_chart(_bins(memory["histogram"], " KiB", 0))
+        st.caption(f"p95 {memory['p95']:.0f} KiB (log-spaced bins)")
+    else:
+        st.caption("No memory peaks stored.")
+
+# ── Per-student table + export ───────────────────────────────────────────────
+st.subheader("Students")
+table = pd.DataFrame({
+    "student":     data["students"],
+    **{c: data["scores"][c] for c in (*COMPONENTS, "total")},
+    "tests":       [f"{int(p)}/{int(r)}" for p, r in zip(tests["passed"], tests["run"])],
+    "mean runtime (s)": np.round(runtime["per_student"], 4),
+    "peak memory (KiB)": memory["per_student"],
+})
+st.dataframe(table, width="stretch", hide_index=True, height=400)
+st.download_button(
+    "⬇️ Download CSV",
+    data=lambda: to_csv(data),
+    file_name=f"{assignment}_analytics.csv",
+    mime="text/csv",
+)
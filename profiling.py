@@ -0,0 +1,267 @@
+"""
+profiling.py
+Opt-in profiling of the grading pipeline.
+
+Functions:
+  profiled(label, enabled=None)   → context manager; yields a ProfileSession or None
+  profile_calls(label)            → decorator doing the same around a function
+  record_child(...)               → per-child-process CPU sample (called by runner.py)
+  active()                        → True while any session is recording
+
+Enabled by AUTOGRADER_PROFILE=1 (everything) or per call (`enabled=True`,
+e.g. the UI toggle). When disabled, profiled() is one flag check and
+record_child() is never reached, so production grading pays nothing.
+
+Each session writes into PROFILE_DIR/<time>-<label>-<id>/:
+  <label>.pstats        cProfile data (snakeviz, `python -m pstats`)
+  <label>.collapsed     sampled stacks, one "a;b;c count" line per stack —
+                        feed to flamegraph.pl or speedscope
+  allocations.txt       top tracemalloc allocation sites and peak
+  children.json         CPU / wall / memory of every student-binary run
+  summary.json          wall time, CPU, top functions, file paths
+
+cProfile and the stack sampler cover the calling thread only; child samples
+are process-wide, so concurrent submissions can appear in each other's
+children.json. tracemalloc is process-wide too: overlapping sessions share
+one tracer (started by the first, stopped by the last) and the peak is
+reset only when no other session is live, so an overlapping session's peak
+covers everything traced since the earliest of them started.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import pstats
+import logging
+import cProfile
+import resource
+import threading
+import functools
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+from config import PROFILE_ENABLED, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_TOP
+
+logger = logging.getLogger(__name__)
+
+_sessions = set()            # active ProfileSessions, for record_child()
+_sessions_lock = threading.Lock()
+_local = threading.local()   # one session per thread (cProfile cannot nest)
+
+_tracemalloc_lock  = threading.Lock()
+_tracemalloc_users = 0       # live sessions relying on tracemalloc
+_tracemalloc_owned = False   # started by us (not -X tracemalloc), so ours to stop
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPERS — shared tracemalloc
+# ─────────────────────────────────────────────────────────────────────────────
+def _tracemalloc_acquire():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            _tracemalloc_owned = True
+        if _tracemalloc_users == 0:
+            tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def _tracemalloc_release():
+    """(snapshot, peak) for the releasing session; (None, 0) if tracing is off."""
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        snapshot, peak = None, 0
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),          # the sampler's own stacks
+            ))
+            _, peak = tracemalloc.get_traced_memory()
+        _tracemalloc_users = max(0, _tracemalloc_users - 1)
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+        return snapshot, peak
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ProfileSession
+# ─────────────────────────────────────────────────────────────────────────────
+class ProfileSession:
+    def __init__(self, label: str, out_dir: str = PROFILE_DIR):
+        stamp         = time.strftime("%Y%m%d-%H%M%S")
+        self.label    = label
+        self.dir      = os.path.join(out_dir, f"{stamp}-{label}-{uuid.uuid4().hex[:6]}")
+        self.children = []
+        self.result   = None
+        self._stacks  = Counter()
+        self._stop    = threading.Event()
+        self._thread  = threading.get_ident()
+        self._profiler = cProfile.Profile()
+
+    # ── stack sampler (collapsed stacks for flame graphs) ────────────────────
+    def _sample(self):
+        while not self._stop.wait(PROFILE_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self._thread)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name}@{os.path.basename(code.co_filename)}:{code.co_firstlineno}")
+                frame = frame.f_back
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        _tracemalloc_acquire()
+        try:
+            self._rusage   = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self._cpu      = time.process_time()
+            self._wall     = time.perf_counter()
+            self._sampler  = threading.Thread(target=self._sample, name=f"profile-{self.label}", daemon=True)
+            self._sampler.start()
+            self._profiler.enable()
+        except Exception:
+            self._stop.set()
+            _tracemalloc_release()
+            raise
+
+    def stop(self) -> dict:
+        self._profiler.disable()
+        wall = time.perf_counter() - self._wall
+        cpu  = time.process_time() - self._cpu
+        self._stop.set()
+        self._sampler.join()
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        snapshot, peak = _tracemalloc_release()
+
+        os.makedirs(self.dir, exist_ok=True)
+        paths = {
+            "pstats":      os.path.join(self.dir, f"{self.label}.pstats"),
+            "collapsed":   os.path.join(self.dir, f"{self.label}.collapsed"),
+            "allocations": os.path.join(self.dir, "allocations.txt"),
+            "children":    os.path.join(self.dir, "children.json"),
+            "summary":     os.path.join(self.dir, "summary.json"),
+        }
+        self._profiler.dump_stats(paths["pstats"])
+
+        with open(paths["collapsed"], "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        top_allocs = snapshot.statistics("lineno")[:PROFILE_TOP] if snapshot else []
+        with open(paths["allocations"], "w", encoding="utf-8") as f:
+            if snapshot is None:
+                f.write("tracemalloc was not tracing when the session ended.\n")
+            f.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n\n")
+            for stat in top_allocs:
+                f.write(f"{stat.size / 1024:10.1f} KiB  {stat.count:7d} blocks  {stat.traceback[0]}\n")
+
+        children = {
+            "runs": self.children,
+            "user_cpu":   round(after.ru_utime - self._rusage.ru_utime, 4),
+            "system_cpu": round(after.ru_stime - self._rusage.ru_stime, 4),
+        }
+        with open(paths["children"], "w", encoding="utf-8") as f:
+            json.dump(children, f, indent=2)
+
+        self.result = {
+            "label":          self.label,
+            "dir":            self.dir,
+            "files":          paths,
+            "wall_seconds":   round(wall, 4),
+            "cpu_seconds":    round(cpu, 4),
+            "child_cpu_seconds": round(children["user_cpu"] + children["system_cpu"], 4),
+            "child_runs":     len(self.children),
+            "peak_kib":       round(peak / 1024, 1),
+            "samples":        sum(self._stacks.values()),
+            "top_functions":  self._top_functions(),
+        }
+        with open(paths["summary"], "w", encoding="utf-8") as f:
+            json.dump(self.result, f, indent=2)
+        return self.result
+
+    def _top_functions(self) -> list[dict]:
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        rows  = []
+        for (file, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({"function": f"{func} ({os.path.basename(file)}:{line})",
+                         "calls": calls, "tottime": round(tottime, 4), "cumtime": round(cumtime, 4)})
+        rows.sort(key=lambda r: r["cumtime"], reverse=True)
+        return rows[:PROFILE_TOP]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Public API
+# ─────────────────────────────────────────────────────────────────────────────
+def active() -> bool:
+    return bool(_sessions)
+
+
+def record_child(binary: str, cpu_time: float, runtime: float, memory_peak_kb: int | None):
+    """One student-binary run; runner.py calls this only while active()."""
+    sample = {
+        "binary":         os.path.basename(binary),
+        "thread":         threading.current_thread().name,
+        "cpu_time":       round(cpu_time, 4),
+        "runtime":        round(runtime, 4),
+        "memory_peak_kb": memory_peak_kb,
+    }
+    with _sessions_lock:
+        for session in _sessions:
+            session.children.append(sample)
+
+
+@contextmanager
+def profiled(label: str, enabled: bool | None = None):
+    """
+    Profiles the block when `enabled` (default: AUTOGRADER_PROFILE). Yields
+    the ProfileSession — its `.result` is filled in once the block exits —
+    or None when profiling is off or this thread is already being profiled.
+    """
+    if not (PROFILE_ENABLED if enabled is None else enabled) or getattr(_local, "session", None):
+        yield None
+        return
+
+    # Profiling must never fail the block it wraps: any error in start() or
+    # stop() is logged and the block runs (or finishes) unprofiled
+    session = ProfileSession(label)
+    try:
+        session.start()
+    except Exception as e:
+        logger.error(f"profiled: cannot start profiling {label} — {e}")
+        yield None
+        return
+
+    _local.session = session
+    with _sessions_lock:
+        _sessions.add(session)
+    try:
+        yield session
+    finally:
+        with _sessions_lock:
+            _sessions.discard(session)
+        _local.session = None
+        try:
+            result = session.stop()
+            logger.info(f"profiled: {label} took {result['wall_seconds']:.2f}s "
+                        f"(child CPU {result['child_cpu_seconds']:.2f}s) — {session.dir}")
+        except Exception as e:
+            logger.error(f"profiled: cannot write profile for {label} — {e}")
+
+
+def profile_calls(label: str):
+    """Decorator form of profiled(); only AUTOGRADER_PROFILE turns it on."""
+    def wrap(fn):
+        if not PROFILE_ENABLED:
+            return fn
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with profiled(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
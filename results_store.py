@@ -0,0 +1,275 @@
+"""
+results_store.py
+Persistent per-class store of raw agent measurements.
+
+Functions:
+  record(assignment, student, report)   → appends one submission's measurements
+  load(assignment)                      → list of stored rows (latest per student)
+  load_columns(assignment)              → {"component.metric": np.ndarray} + students
+  load_vectors(assignment)              → per-test-case metrics as 2-D arrays + students
+  load_snapshot(assignment)             → students, columns and vectors from one read
+  list_classes()                        → class keys with stored results
+  rescore_class(assignment, rubric)     → vectorised scores for the whole class
+  class_slug(assignment)                → normalised class key shared with output_index.py
+
+Usage:
+  python results_store.py rescore "Sum of digits" [--rubric new_rubric.json]
+
+Rows hold measurements only — scores are never read back from disk, they
+are recomputed from the rubric (rubric.py). Changing a deduction rule
+therefore rescores a class in a single NumPy pass over the stored columns.
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import threading
+
+from config import RESULTS_DIR
+from rubric import COMPONENTS, RUBRIC, load_rubric, score_columns
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+def class_slug(assignment: str) -> str:
+    """Normalised class key: "Sum of Digits " and "sum of digits" are one class."""
+    return re.sub(r"[^\w.-]+", "_", assignment.strip().lower()).strip("_") or "untitled"
+
+
+def _class_dir(assignment: str) -> str:
+    return os.path.join(RESULTS_DIR, class_slug(assignment))
+
+
+def _measurements_of(report: dict) -> dict:
+    """Collects each agent's "measurements" block from a raw report."""
+    out = {}
+    for comp, key in (("design", "design"), ("tests", "tests"),
+                      ("performance", "performance"), ("optimization", "optimization")):
+        out[comp] = report.get(key, {}).get("measurements", {})
+    out["static"] = report.get("static_measurements", {})
+    return out
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# record / load
+# ─────────────────────────────────────────────────────────────────────────────
+def record(assignment: str, student: str, report: dict):
+    """Appends the measurements of one graded submission and indexes its outputs."""
+    row = {
+        "student":        student or "anonymous",
+        "submitted_at":   time.time(),
+        "rubric_version": report.get("rubric_version", RUBRIC["version"]),
+        "measurements":   _measurements_of(report),
+    }
+    path = os.path.join(_class_dir(assignment), "measurements.jsonl")
+    try:
+        with _lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row, default=str) + "\n")
+    except OSError as e:
+        logger.error(f"results_store.record: cannot write {path} — {e}")
+
+    from output_index import index_report
+    index_report(assignment, student, report)
+
+
+def load(assignment: str, latest_only: bool = True) -> list[dict]:
+    path = os.path.join(_class_dir(assignment), "measurements.jsonl")
+    rows = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+    if latest_only:
+        latest = {}
+        for row in rows:
+            latest[row["student"]] = row
+        rows = list(latest.values())
+    return rows
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# load_columns / load_vectors — cached columnar views
+# ─────────────────────────────────────────────────────────────────────────────
+def _cached_arrays(assignment: str, builds: dict) -> tuple[list[str], dict]:
+    """
+    (students, {name: arrays}) for every `builds` entry ({name: build(rows)}),
+    read from <class>/<name>.npz. When any file is stale — or the files
+    disagree on the student list — all of them are rebuilt from a single
+    load(), so the returned arrays always describe the same rows.
+    """
+    import numpy as np
+
+    base = _class_dir(assignment)
+    src  = os.path.join(base, "measurements.jsonl")
+    try:
+        st = os.stat(src)
+    except OSError:
+        return [], {name: {} for name in builds}
+    stamp = np.array([st.st_mtime_ns, st.st_size], dtype=np.int64)
+
+    cached = {}
+    for name in builds:
+        try:
+            with np.load(os.path.join(base, f"{name}.npz"), allow_pickle=False) as data:
+                if np.array_equal(data["__stamp__"], stamp):
+                    students = [str(s) for s in data["__students__"]]
+                    arrays   = {k: data[k] for k in data.files if not k.startswith("__")}
+                    cached[name] = (students, arrays)
+        except (OSError, KeyError, ValueError):
+            pass
+    if len(cached) == len(builds) and len({tuple(s) for s, _ in cached.values()}) == 1:
+        students = next(iter(cached.values()))[0]
+        return students, {name: arrays for name, (_, arrays) in cached.items()}
+
+    rows     = load(assignment)
+    students = [r["student"] for r in rows]
+    result   = {}
+    for name, build in builds.items():
+        arrays = result[name] = build(rows)
+        cache  = os.path.join(base, f"{name}.npz")
+        try:
+            tmp = cache + ".tmp.npz"
+            np.savez(tmp, __stamp__=stamp, __students__=np.array(students, dtype=str), **arrays)
+            os.replace(tmp, cache)
+        except OSError as e:
+            logger.warning(f"results_store: cannot write {name} cache — {e}")
+    return students, result
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _build_columns(rows: list[dict]) -> dict:
+    import numpy as np
+
+    keys = sorted({
+        f"{comp}.{metric}"
+        for r in rows
+        for comp in COMPONENTS
+        for metric, value in r["measurements"].get(comp, {}).items()
+        if _is_number(value)
+    })
+    columns = {k: np.full(len(rows), np.nan) for k in keys}
+    for i, r in enumerate(rows):
+        for key in keys:
+            comp, metric = key.split(".", 1)
+            value = r["measurements"].get(comp, {}).get(metric)
+            if _is_number(value):
+                columns[key][i] = value
+    return columns
+
+
+def _build_vectors(rows: list[dict]) -> dict:
+    import numpy as np
+
+    lists = {}
+    for i, r in enumerate(rows):
+        for comp in COMPONENTS:
+            for metric, value in r["measurements"].get(comp, {}).items():
+                if isinstance(value, list) and all(v is None or _is_number(v) for v in value):
+                    lists.setdefault(f"{comp}.{metric}", {})[i] = value
+    vectors = {}
+    for key, by_row in lists.items():
+        width = max(len(v) for v in by_row.values())
+        matrix = np.full((len(rows), width), np.nan)
+        for i, values in by_row.items():
+            matrix[i, :len(values)] = [np.nan if v is None else v for v in values]
+        vectors[key] = matrix
+    return vectors
+
+
+def load_columns(assignment: str) -> tuple[list[str], dict]:
+    """
+    Returns (students, columns) where columns maps "component.metric" to a
+    float array (NaN where a row lacks the metric). Only scalar metrics are
+    columnised. The arrays are cached in columns.npz and rebuilt only when
+    measurements.jsonl changes.
+    """
+    students, arrays = _cached_arrays(assignment, {"columns": _build_columns})
+    return students, arrays["columns"]
+
+
+def load_vectors(assignment: str) -> tuple[list[str], dict]:
+    """
+    Like load_columns() for per-test-case list metrics (tests.pass_vector,
+    tests.runtimes, tests.memory_peak_kb): each becomes a 2-D float array,
+    one row per student and one column per case index, NaN-padded to the
+    longest list. Cached in vectors.npz.
+    """
+    students, arrays = _cached_arrays(assignment, {"vectors": _build_vectors})
+    return students, arrays["vectors"]
+
+
+def load_snapshot(assignment: str) -> tuple[list[str], dict, dict]:
+    """
+    (students, columns, vectors) from one read of measurements.jsonl, so
+    row i of every array is the same submission even while record() appends.
+    """
+    students, arrays = _cached_arrays(assignment, {"columns": _build_columns,
+                                                   "vectors": _build_vectors})
+    return students, arrays["columns"], arrays["vectors"]
+
+
+def list_classes() -> list[str]:
+    """Class keys (see class_slug) that have stored results, sorted."""
+    try:
+        names = os.listdir(RESULTS_DIR)
+    except OSError:
+        return []
+    return sorted(n for n in names
+                  if os.path.isfile(os.path.join(RESULTS_DIR, n, "measurements.jsonl")))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# rescore_class
+# ─────────────────────────────────────────────────────────────────────────────
+def rescore_class(assignment: str, rubric: dict | None = None) -> dict:
+    """Returns {"students": [...], "design": array, ..., "total": array}."""
+    students, columns = load_columns(assignment)
+    if not students:
+        return {"students": []}
+    scores = score_columns(columns, rubric or RUBRIC)
+    scores["students"] = students
+    return scores
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Rescore a class from stored measurements.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rs = sub.add_parser("rescore")
+    rs.add_argument("assignment")
+    rs.add_argument("--rubric", help="JSON rubric file (defaults to RUBRIC_PATH / built-in)")
+    args = ap.parse_args(argv)
+
+    rubric = load_rubric(args.rubric)
+    start  = time.perf_counter()
+    scores = rescore_class(args.assignment, rubric)
+    elapsed = time.perf_counter() - start
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["student", *COMPONENTS, "total"])
+    for i, student in enumerate(scores["students"]):
+        writer.writerow([student, *(f"{scores[c][i]:g}" for c in (*COMPONENTS, "total"))])
+    logger.info(f"Rescored {len(scores['students'])} submission(s) "
+                f"with rubric v{rubric['version']} in {elapsed * 1000:.1f} ms.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    main()
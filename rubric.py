@@ -0,0 +1,211 @@
+"""
+rubric.py
+Versioned grading rubric and pure scoring functions.
+
+Functions:
+  load_rubric(path=None)                    → DEFAULT_RUBRIC, or a JSON rubric file
+  score_component(name, measurements, rb)   → (score, deductions) for one agent
+  score_report(measurements, rb)            → component scores + total for one submission
+  score_columns(columns, rb)                → vectorised scores for a whole class (NumPy)
+
+Agents only *measure* (line counts, runtimes, pass vectors, cppcheck issue
+counts); every point deduction is decided here from those measurements and
+the rubric. Because scoring is a pure function, a changed rubric can be
+applied to stored measurements (results_store.py) without recompiling,
+re-running binaries or calling an LLM.
+
+Rule format (components with "rules"):
+  {"metric": "lines", "op": ">", "value": 200, "penalty": 2,
+   "label": "Exceeds 200 lines (-{penalty})"}
+`label` is formatted with the measurements plus `penalty`.
+"""
+
+import json
+import logging
+import operator
+
+from config import WEIGHTS, RUBRIC_PATH
+
+logger = logging.getLogger(__name__)
+
+_OPS = {
+    ">":  operator.gt,
+    ">=": operator.ge,
+    "<":  operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+}
+
+DEFAULT_RUBRIC = {
+    "version": 6,
+    "design": {
+        "max": WEIGHTS["design"],
+        "rules": [
+            {"metric": "code_lines", "op": ">", "value": 200, "penalty": 2,
+             "label": "Exceeds 200 lines of code (-{penalty})"},
+            {"metric": "functions", "op": "<", "value": 2, "penalty": 3,
+             "label": "Fewer than 2 functions (-{penalty})"},
+            {"metric": "comments", "op": "<", "value": 3, "penalty": 2,
+             "label": "Insufficient comments (-{penalty})"},
+            {"metric": "max_complexity", "op": ">", "value": 10, "penalty": 2,
+             "label": "Function {worst_function} has cyclomatic complexity {max_complexity} > 10 (-{penalty})"},
+            {"metric": "max_nesting", "op": ">", "value": 4, "penalty": 2,
+             "label": "Control flow nested {max_nesting} levels deep (-{penalty})"},
+        ],
+    },
+    "tests": {
+        "max": WEIGHTS["tests"],
+    },
+    "performance": {
+        "max": WEIGHTS["performance"],
+        "rules": [
+            {"metric": "runtime", "op": ">", "value": 0.7, "penalty": 3,
+             "label": "Slow runtime {runtime:.3f}s > 0.7s (-{penalty})"},
+            {"metric": "runtime", "op": ">", "value": 1.2, "penalty": 3,
+             "label": "Very slow {runtime:.3f}s > 1.2s (additional -{penalty})"},
+            {"metric": "loops", "op": ">", "value": 5, "penalty": 2,
+             "label": "High loop count ({loops}) (-{penalty})"},
+            {"metric": "branches", "op": ">", "value": 12, "penalty": 2,
+             "label": "High branch count ({branches}) (-{penalty})"},
+        ],
+    },
+    "optimization": {
+        "max": WEIGHTS["optimization"],
+        "rules": [
+            {"metric": "malloc_without_free", "op": ">", "value": 0, "penalty": 4,
+             "label": "Potential memory leak: malloc() used without free()."},
+            {"metric": "printf_in_loop", "op": ">", "value": 0, "penalty": 3,
+             "label": "printf() inside a loop — consider buffered output."},
+            {"metric": "output_in_loop_weight", "op": ">", "value": 3, "penalty": 2,
+             "label": "Output inside nested loops (weight {output_in_loop_weight}) (-{penalty})"},
+            {"metric": "alloc_in_loop", "op": ">", "value": 0, "penalty": 3,
+             "label": "Allocation inside a loop ({alloc_in_loop}x) (-{penalty})"},
+            {"metric": "strlen_in_condition", "op": ">", "value": 0, "penalty": 2,
+             "label": "strlen() re-evaluated in a loop condition (-{penalty})"},
+            {"metric": "pow_in_loop", "op": ">", "value": 0, "penalty": 1,
+             "label": "pow() inside a loop (-{penalty})"},
+            {"metric": "loop_invariant", "op": ">", "value": 0, "penalty": 1,
+             "label": "Loop-invariant call(s) not hoisted ({loop_invariant}x) (-{penalty})"},
+            {"metric": "sanitizer_errors", "op": ">", "value": 0, "penalty": 4,
+             "label": "Sanitizers found {sanitizer_errors} memory / undefined-behaviour error(s): "
+                      "{sanitizer_kinds} (-{penalty})"},
+            {"metric": "leaked_bytes", "op": ">", "value": 0, "penalty": 1,
+             "label": "LeakSanitizer: {leaked_bytes} byte(s) leaked (unreachable at exit) (-{penalty})"},
+        ],
+    },
+    "static": {
+        "max": WEIGHTS["static"],
+        "per_issue": 2.0,
+    },
+}
+
+COMPONENTS = ("design", "tests", "performance", "optimization", "static")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# load_rubric
+# ─────────────────────────────────────────────────────────────────────────────
+def load_rubric(path: str | None = None) -> dict:
+    """
+    Returns the rubric from `path` (or RUBRIC_PATH), falling back to the
+    built-in DEFAULT_RUBRIC. A file only needs the components it changes.
+    """
+    path = path or RUBRIC_PATH
+    if not path:
+        return DEFAULT_RUBRIC
+    try:
+        with open(path, encoding="utf-8") as f:
+            custom = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"load_rubric: cannot read {path} — {e}; using built-in rubric.")
+        return DEFAULT_RUBRIC
+    rubric = {**DEFAULT_RUBRIC, **custom}
+    if "version" not in custom:
+        logger.warning(f"load_rubric: {path} has no version; results will not be distinguishable.")
+    return rubric
+
+
+# The rubric live grading uses (RUBRIC_PATH if set, else the built-in one)
+RUBRIC = load_rubric()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Scalar scoring — one submission
+# ─────────────────────────────────────────────────────────────────────────────
+def _fmt(x) -> str:
+    return f"{x:g}" if isinstance(x, (int, float)) else str(x)
+
+
+def score_component(name: str, m: dict, rubric: dict | None = None) -> tuple[float, list[str]]:
+    """Returns (score, deduction labels) for one component's measurements."""
+    rubric = rubric or RUBRIC
+    spec   = rubric[name]
+    top    = spec["max"]
+
+    if name == "tests":
+        cases = m.get("cases", 0)
+        return (round(m.get("passed", 0) / cases * top, 2) if cases else 0.0), []
+
+    if name == "static":
+        return max(0, top - m.get("issues", 0) * spec["per_issue"]), []
+
+    score, deductions = top, []
+    for rule in spec.get("rules", []):
+        value = m.get(rule["metric"])
+        if value is None:
+            continue
+        if _OPS[rule["op"]](value, rule["value"]):
+            score -= rule["penalty"]
+            deductions.append(rule["label"].format(**m, penalty=_fmt(rule["penalty"])))
+    return round(max(score, 0), 2), deductions
+
+
+def score_report(measurements: dict, rubric: dict | None = None) -> dict:
+    """{component: score, ..., "total": total} for one submission."""
+    rubric = rubric or RUBRIC
+    scores = {c: score_component(c, measurements.get(c, {}), rubric)[0] for c in COMPONENTS}
+    cap    = sum(rubric[c]["max"] for c in COMPONENTS)
+    scores["total"] = round(min(sum(scores.values()), cap), 2)
+    return scores
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Vectorised scoring — a whole class in one pass
+# ─────────────────────────────────────────────────────────────────────────────
+def score_columns(columns: dict, rubric: dict | None = None) -> dict:
+    """
+    `columns` maps "component.metric" → 1-D NumPy array (NaN = not measured),
+    as produced by results_store.load_columns(). Returns a dict of score
+    arrays per component plus "total"; identical to score_report() row-wise.
+    """
+    import numpy as np
+
+    rubric = rubric or RUBRIC
+    n = len(next(iter(columns.values()))) if columns else 0
+    missing = np.full(n, np.nan)
+    col = lambda comp, metric: columns.get(f"{comp}.{metric}", missing)
+
+    out = {}
+    for comp in COMPONENTS:
+        spec = rubric[comp]
+        top  = spec["max"]
+        if comp == "tests":
+            passed = np.nan_to_num(col(comp, "passed"))
+            cases  = np.nan_to_num(col(comp, "cases"))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[comp] = np.where(cases > 0, np.round(passed / cases * top, 2), 0.0)
+        elif comp == "static":
+            issues = np.nan_to_num(col(comp, "issues"))
+            out[comp] = np.maximum(0, top - issues * spec["per_issue"])
+        else:
+            penalty = np.zeros(n)
+            for rule in spec.get("rules", []):
+                values = col(comp, rule["metric"])
+                with np.errstate(invalid="ignore"):
+                    hit = _OPS[rule["op"]](values, rule["value"]) & ~np.isnan(values)
+                penalty += hit * rule["penalty"]
+            out[comp] = np.round(np.maximum(top - penalty, 0), 2)
+
+    cap = sum(rubric[c]["max"] for c in COMPONENTS)
+    out["total"] = np.round(np.minimum(sum(out[c] for c in COMPONENTS), cap), 2)
+    return out
@@ -0,0 +1,327 @@
+"""
+runner.py
+Bounded, streaming execution of student binaries.
+
+Functions:
+  run_binary(path, stdin, expected=None)  → runs the binary once and returns a result dict
+  excerpt(text)                           → truncated preview of a long output
+
+Why streaming:
+  subprocess.run(stdout=PIPE) buffers the whole stdout in memory. A program
+  that prints in an infinite loop can produce gigabytes inside the timeout.
+  run_binary() reads stdout in chunks, keeps at most OUTPUT_LIMIT_BYTES,
+  hashes the stream incrementally and — when the expected output is already
+  known (the self-oracle confirm run) — kills the process on the first byte
+  that can no longer match.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import selectors
+import subprocess
+import threading
+
+from config import TEST_TIMEOUT_SECONDS, OUTPUT_LIMIT_BYTES, OUTPUT_EXCERPT_CHARS
+from sandbox import limits_for, make_preexec, CgroupRun, classify_exit, signal_name
+from scheduler import resource_slot
+import profiling
+
+logger = logging.getLogger(__name__)
+
+_CHUNK    = 64 * 1024
+_WS       = b" \t\n\r\x0b\x0c"
+_CPU_BUSY = 0.9   # share of a timeout spent on the CPU that makes it a "cpu" kill
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPER — sha256 of the stripped stream, computed incrementally
+# ─────────────────────────────────────────────────────────────────────────────
+class _StrippedHasher:
+    """
+    Hashes a byte stream as if it had been .strip()-ed first, without
+    buffering it: leading whitespace is skipped and trailing whitespace is
+    held back until a non-whitespace byte proves it is not trailing.
+    """
+    def __init__(self):
+        self._h       = hashlib.sha256()
+        self._started = False
+        self._pending = b""
+
+    def update(self, chunk: bytes):
+        if not self._started:
+            chunk = chunk.lstrip(_WS)
+            if not chunk:
+                return
+            self._started = True
+        body = chunk.rstrip(_WS)
+        if body:
+            self._h.update(self._pending + body)
+            self._pending = chunk[len(body):]
+        else:
+            self._pending += chunk
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPER — early divergence check against a known expected output
+# ─────────────────────────────────────────────────────────────────────────────
+class _DivergenceCheck:
+    """
+    Compares the live stdout against the expected (oracle) bytes with the
+    same semantics as `actual.strip() == expected.strip()`. Reports
+    divergence as soon as no continuation of the stream could match.
+    """
+    def __init__(self, expected: bytes):
+        self._exp     = expected.strip(_WS)
+        self._pos     = 0
+        self._started = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """Returns True once the stream has definitely diverged."""
+        if not self._started:
+            chunk = chunk.lstrip(_WS)
+            if not chunk:
+                return False
+            self._started = True
+
+        exp, pos = self._exp, self._pos
+        window   = exp[pos:pos + len(chunk)]
+        if chunk[:len(window)] != window:
+            return True
+        if len(chunk) > len(window) and chunk[len(window):].strip(_WS):
+            # Non-whitespace output past the end of the expected text
+            return True
+        self._pos = min(pos + len(chunk), len(exp))
+        return False
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPER — feed stdin without blocking the reader
+# ─────────────────────────────────────────────────────────────────────────────
+def _feed_stdin(pipe, data: bytes):
+    try:
+        pipe.write(data)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def _kill(proc: subprocess.Popen):
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+def _reap(proc: subprocess.Popen, grace: float = 1.0):
+    """
+    Waits for the child with os.wait4 so its resource usage (CPU time,
+    peak RSS) is available for limit classification. Kills it after
+    `grace` seconds. Returns the rusage, or None if it could not be read.
+    """
+    deadline = time.monotonic() + grace
+    try:
+        while True:
+            pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.monotonic() >= deadline:
+                _kill(proc)
+                pid, status, rusage = os.wait4(proc.pid, 0)
+                break
+            time.sleep(0.005)
+    except ChildProcessError:
+        proc.wait()
+        return None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return rusage
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# run_binary
+# ─────────────────────────────────────────────────────────────────────────────
+def run_binary(binary_path: str, stdin_input: str,
+               expected: str | None = None,
+               timeout: float = TEST_TIMEOUT_SECONDS,
+               limits: dict | None = None,
+               env: dict | None = None,
+               slot: str = "exec") -> dict:
+    """
+    Runs the binary once inside the sandbox (see sandbox.py) with a bounded,
+    streaming capture of stdout/stderr. `limits` defaults to
+    sandbox.limits_for(None). `env` replaces the child's environment and
+    `slot` names the scheduler resource class the run occupies.
+
+    Returned keys:
+      stdout      — decoded stdout (at most OUTPUT_LIMIT_BYTES), stripped
+      stderr      — decoded stderr (at most OUTPUT_LIMIT_BYTES)
+      output_hash — sha256 of the full stripped stdout stream
+      bytes       — total stdout bytes produced (including discarded ones)
+      truncated   — True if stdout exceeded OUTPUT_LIMIT_BYTES
+      diverged    — True if the run was stopped early because it could no
+                    longer match `expected`
+      runtime     — wall-clock seconds
+      returncode  — process exit status (negative signal number if killed)
+      signal      — e.g. "SIGSEGV" when killed by a signal, else None
+      limit_kill  — "cpu", "memory", "file_size" or None; a timeout spent
+                    busy on the CPU counts as "cpu"
+      cpu_time    — user + system CPU seconds of the child
+      memory_peak_kb — cgroup memory.peak in KB; None when running without a cgroup
+      error       — None on a clean run, otherwise a short description
+    """
+    limits = limits or limits_for(None)
+    with resource_slot(slot), CgroupRun(limits) as cgroup:
+        return _run_sandboxed(binary_path, stdin_input, expected, timeout, limits, cgroup, env)
+
+
+def _run_sandboxed(binary_path: str, stdin_input: str, expected: str | None,
+                   timeout: float, limits: dict, cgroup: CgroupRun,
+                   env: dict | None = None) -> dict:
+    result = {
+        "stdout": "", "stderr": "", "output_hash": hashlib.sha256().hexdigest(),
+        "bytes": 0, "truncated": False, "diverged": False,
+        "runtime": 0.0, "returncode": None, "signal": None,
+        "limit_kill": None, "cpu_time": 0.0, "memory_peak_kb": None,
+        "error": None,
+    }
+
+    start = time.monotonic()
+    try:
+        proc = subprocess.Popen(
+            [binary_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            preexec_fn=make_preexec(limits, cgroup.path),
+            env=env,
+        )
+    except FileNotFoundError:
+        result["error"] = "Binary not found"
+        return result
+    except Exception as e:
+        result["error"] = f"Runtime Error: {e}"
+        return result
+
+    feeder = threading.Thread(
+        target=_feed_stdin, args=(proc.stdin, stdin_input.encode()), daemon=True
+    )
+    feeder.start()
+
+    hasher   = _StrippedHasher()
+    out      = bytearray()
+    err      = bytearray()
+    deadline = start + timeout
+
+    # Undecodable oracle output cannot be compared byte-for-byte after the
+    # errors="replace" round trip, so early exit is only used for clean text.
+    checker = None
+    if expected is not None and "\ufffd" not in expected:
+        checker = _DivergenceCheck(expected.encode())
+
+    sel = selectors.DefaultSelector()
+    sel.register(proc.stdout, selectors.EVENT_READ, "out")
+    sel.register(proc.stderr, selectors.EVENT_READ, "err")
+
+    done = timed_out = False
+    try:
+        while not done and sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _kill(proc)
+                result["error"] = f"Timeout (> {timeout}s)"
+                timed_out = True
+                break
+
+            for key, _ in sel.select(timeout=remaining):
+                chunk = os.read(key.fileobj.fileno(), _CHUNK)
+                if not chunk:
+                    sel.unregister(key.fileobj)
+                    continue
+
+                if key.data == "err":
+                    room = OUTPUT_LIMIT_BYTES - len(err)
+                    if room > 0:
+                        err += chunk[:room]
+                    continue
+
+                result["bytes"] += len(chunk)
+                hasher.update(chunk)
+                room = OUTPUT_LIMIT_BYTES - len(out)
+                if room > 0:
+                    out += chunk[:room]
+
+                if checker is not None and checker.feed(chunk):
+                    result["diverged"] = True
+                    _kill(proc)
+                    done = True
+                    break
+                if result["bytes"] > OUTPUT_LIMIT_BYTES:
+                    result["truncated"] = True
+                    result["error"] = f"Output limit exceeded (> {OUTPUT_LIMIT_BYTES} bytes)"
+                    _kill(proc)
+                    done = True
+                    break
+    finally:
+        sel.close()
+        rusage = _reap(proc)
+        for pipe in (proc.stdout, proc.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    result["runtime"]    = time.monotonic() - start
+    result["returncode"] = proc.returncode
+    result["signal"]     = signal_name(proc.returncode)
+
+    cg_stats = cgroup.stats()
+    if rusage:
+        result["cpu_time"] = rusage.ru_utime + rusage.ru_stime
+    # ru_maxrss carries the forked grader's RSS across exec(), and polling
+    # VmHWM misses programs that finish between samples; only the cgroup
+    # counter sees the whole run, so without one the peak is unknown
+    peak_kb = None
+    if cg_stats["memory_peak"] is not None:
+        peak_kb = cg_stats["memory_peak"] // 1024
+    result["memory_peak_kb"] = peak_kb
+    if profiling.active():
+        profiling.record_child(binary_path, result["cpu_time"], result["runtime"], peak_kb)
+
+    # With the default limits the wall-clock timeout (TEST_TIMEOUT_SECONDS,
+    # 1 s for the timing run) is no longer than RLIMIT_CPU and fires first;
+    # a run that kept the CPU busy for nearly all of it is a busy loop
+    if timed_out and result["cpu_time"] >= _CPU_BUSY * timeout:
+        result["limit_kill"] = "cpu"
+        result["error"]      = f"CPU limit exceeded (busy for the whole {timeout}s timeout)"
+    # Our own kills (timeout, divergence, output cap) are already explained
+    elif result["error"] is None and not result["diverged"]:
+        kind, message = classify_exit(proc.returncode, rusage, limits, cg_stats)
+        if kind:
+            result["limit_kill"] = kind
+            result["error"]      = message
+
+    result["stdout"]      = out.decode(errors="replace").strip()
+    result["stderr"]      = err.decode(errors="replace")
+    result["output_hash"] = hasher.hexdigest()
+    return result
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# excerpt
+# ─────────────────────────────────────────────────────────────────────────────
+def excerpt(text: str, limit: int = OUTPUT_EXCERPT_CHARS) -> str:
+    """Returns `text` unchanged if short, otherwise a head/tail preview."""
+    if len(text) <= limit:
+        return text
+    half = limit // 2
+    return (
+        f"{text[:half]}\n… [{len(text) - limit} characters truncated] …\n{text[-half:]}"
+    )
@@ -0,0 +1,214 @@
+"""
+sandbox.py
+Resource-limited launcher for student binaries.
+
+Functions:
+  limits_for(assignment)          → per-assignment limit dict from config.SANDBOX_LIMITS
+  make_preexec(limits, cgroup)    → preexec_fn applying rlimits (and cgroup placement)
+  classify_exit(...)              → maps an exit status to a CPU / memory / file-size kill
+
+Classes:
+  CgroupRun                       → optional per-run cgroup v2 with cpu/memory/pids limits
+
+Every run gets RLIMIT_CPU, RLIMIT_AS, RLIMIT_NPROC, RLIMIT_FSIZE and
+RLIMIT_NOFILE so a fork bomb or a 16 GB malloc only hurts the student's own
+process. The kernel does not apply RLIMIT_NPROC to root (or to any process
+with CAP_SYS_RESOURCE / CAP_SYS_ADMIN): a grader running as root is only
+protected from fork bombs by the cgroup's pids.max, and make_preexec() logs
+a warning when neither applies.
+
+When CGROUP_ENABLED is set, each run is additionally placed in its own
+cgroup v2 under CGROUP_ROOT; the kernel then enforces memory.max and
+cpu.max and reports memory.peak and OOM kills. Memory-limit kills are only
+classified from that OOM counter: under RLIMIT_AS alone malloc() returns
+NULL and the program usually crashes with SIGSEGV, which nothing outside
+the program can tell apart from any other crash.
+
+A limits dict may drop "memory_mb" / "max_processes" (None) and add "nice";
+sanitizer shadow runs (sanitizers.py) use that to run without RLIMIT_AS at
+a lower CPU priority.
+"""
+
+import os
+import uuid
+import signal
+import logging
+import resource
+import functools
+
+from config import SANDBOX_LIMITS, CGROUP_ENABLED, CGROUP_ROOT
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# limits_for
+# ─────────────────────────────────────────────────────────────────────────────
+def limits_for(assignment: str | None = None) -> dict:
+    """
+    Returns the limit dict for an assignment, falling back to "default".
+    Per-assignment entries only need to list the keys they override.
+    """
+    limits = dict(SANDBOX_LIMITS["default"])
+    if assignment and assignment in SANDBOX_LIMITS:
+        limits.update(SANDBOX_LIMITS[assignment])
+    return limits
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# make_preexec
+# ─────────────────────────────────────────────────────────────────────────────
+@functools.cache
+def _warn_nproc_unenforced():
+    logger.warning("make_preexec: running as root without a cgroup; RLIMIT_NPROC is not "
+                   "enforced for root, so student programs can fork without limit. "
+                   "Run the grader as an unprivileged user or set AUTOGRADER_CGROUP=1.")
+
+
+def make_preexec(limits: dict, cgroup_dir: str | None = None):
+    """
+    Builds the preexec_fn run in the forked child before exec().
+    Keeps the closure minimal: it runs between fork and exec.
+    RLIMIT_NPROC is still set for root but has no effect there; only the
+    cgroup's pids.max bounds the process count (see module docstring).
+    """
+    cpu    = int(limits["cpu_seconds"])
+    memory = int(limits["memory_mb"] * _MB) if limits.get("memory_mb") else None
+    nproc  = limits.get("max_processes")
+    fsize  = int(limits["file_size_mb"] * _MB)
+    nofile = int(limits["open_files"])
+    nice   = limits.get("nice")
+
+    if nproc is not None and cgroup_dir is None and os.geteuid() == 0:
+        _warn_nproc_unenforced()
+
+    def _apply():
+        if cgroup_dir:
+            with open(os.path.join(cgroup_dir, "cgroup.procs"), "w") as f:
+                f.write(str(os.getpid()))
+        # Soft limit → SIGXCPU, hard limit one second later → SIGKILL
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        if memory is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        if nproc is not None:
+            resource.setrlimit(resource.RLIMIT_NPROC, (nproc, nproc))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (nofile, nofile))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if nice:
+            os.nice(nice)
+
+    return _apply
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CgroupRun — optional cgroup v2 per run
+# ─────────────────────────────────────────────────────────────────────────────
+class CgroupRun:
+    """
+    Context manager creating a throwaway cgroup for one run.
+
+    `path` is None when cgroups are disabled or unavailable (no write access,
+    controllers not delegated); callers then rely on rlimits alone.
+    """
+    def __init__(self, limits: dict, enabled: bool = CGROUP_ENABLED):
+        self.limits  = limits
+        self.enabled = enabled
+        self.path    = None
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        path = os.path.join(CGROUP_ROOT, f"run-{uuid.uuid4().hex[:12]}")
+        try:
+            os.mkdir(path)
+            if self.limits.get("memory_mb"):
+                self._write(path, "memory.max", str(int(self.limits["memory_mb"] * _MB)))
+                self._write(path, "memory.swap.max", "0")
+            if self.limits.get("cpu_cores"):
+                period = 100_000
+                quota  = int(self.limits["cpu_cores"] * period)
+                self._write(path, "cpu.max", f"{quota} {period}")
+            if self.limits.get("max_processes") is not None:
+                self._write(path, "pids.max", str(max(1, self.limits["max_processes"])))
+            self.path = path
+        except OSError as e:
+            logger.warning(f"CgroupRun: cgroup setup failed ({e}); using rlimits only.")
+            self._remove(path)
+        return self
+
+    def __exit__(self, *exc):
+        if self.path:
+            self._remove(self.path)
+        return False
+
+    @staticmethod
+    def _write(path: str, name: str, value: str):
+        with open(os.path.join(path, name), "w") as f:
+            f.write(value)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        """Reads memory.peak (bytes) and the OOM-kill counter after the run."""
+        out = {"memory_peak": None, "oom_kills": 0}
+        if not self.path:
+            return out
+        try:
+            with open(os.path.join(self.path, "memory.peak")) as f:
+                out["memory_peak"] = int(f.read().strip())
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(os.path.join(self.path, "memory.events")) as f:
+                for line in f:
+                    key, _, value = line.partition(" ")
+                    if key == "oom_kill":
+                        out["oom_kills"] = int(value)
+        except (OSError, ValueError):
+            pass
+        return out
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# classify_exit
+# ─────────────────────────────────────────────────────────────────────────────
+def classify_exit(returncode: int | None, rusage, limits: dict,
+                  cgroup_stats: dict | None = None) -> tuple[str | None, str | None]:
+    """
+    Returns (limit_kind, message) where limit_kind is "cpu", "memory",
+    "file_size" or None. Only limit kills are classified here; ordinary
+    crashes are left to the caller. "memory" needs the cgroup's OOM counter
+    (see module docstring).
+    """
+    cgroup_stats = cgroup_stats or {}
+    if returncode is None or returncode >= 0:
+        return None, None
+
+    sig      = -returncode
+    cpu_used = (rusage.ru_utime + rusage.ru_stime) if rusage else 0.0
+
+    if cgroup_stats.get("oom_kills"):
+        return "memory", f"Memory limit exceeded (> {limits['memory_mb']} MB)"
+    if sig == signal.SIGXCPU or (sig == signal.SIGKILL and cpu_used >= limits["cpu_seconds"]):
+        return "cpu", f"CPU limit exceeded (> {limits['cpu_seconds']}s CPU)"
+    if sig == signal.SIGXFSZ:
+        return "file_size", f"File size limit exceeded (> {limits['file_size_mb']} MB)"
+    return None, None
+
+
+def signal_name(returncode: int | None) -> str | None:
+    """'SIGSEGV' for a process killed by signal 11, None for a normal exit."""
+    if returncode is None or returncode >= 0:
+        return None
+    try:
+        return signal.Signals(-returncode).name
+    except ValueError:
+        return f"signal {-returncode}"
@@ -0,0 +1,264 @@
+"""
+sanitizers.py
+ASan / UBSan shadow build that runs alongside the graded build.
+
+Classes:
+  ShadowBuild(source_path, cwd, cflags)  → instrumented compile + runs on background threads
+
+Functions:
+  start_shadow_build(src, budget=None, ...) → ShadowBuild, or None when disabled / overloaded
+  parse_reports(stderr)                     → structured findings from sanitizer output
+
+Out-of-bounds writes, signed overflow and leaks are usually deterministic,
+so the self-oracle happily confirms a wrong-but-reproducible output. The
+shadow build catches them without touching the graded path:
+
+  grade_submission ──┬─ gcc (graded) ── cppcheck ── test_agent runs ── … ── collect()
+                     └─ gcc -fsanitize (shadow) ──── same inputs, niced ──┘
+
+The shadow compile starts before the graded one, and test_agent hands the
+shadow its inputs as soon as they are known, so instrumented runs overlap
+the graded runs on spare cores ("sanitize" resource class). collect() waits
+at most SANITIZER_GRACE_SECONDS for stragglers; unfinished runs are simply
+not counted, and a "partial" collection is reported without being scored. Instrumented runs have no RLIMIT_AS (ASan reserves terabytes
+of shadow address space) — ASan's own hard_rss_limit_mb bounds them instead.
+"""
+
+import os
+import re
+import shutil
+import logging
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import (
+    SANITIZER_ENABLED, SANITIZER_FLAGS, SANITIZER_SLOWDOWN, SANITIZER_RSS_FACTOR,
+    SANITIZER_NICE, SANITIZER_GRACE_SECONDS, RESOURCE_LIMITS, TEST_TIMEOUT_SECONDS,
+    BUDGET_RESERVE_SECONDS,
+)
+from scheduler import resource_slot
+
+logger = logging.getLogger(__name__)
+
+# Compiles and runs live in separate pools: a run waits for its compile, so
+# sharing one pool could fill it with waiting runs.
+_compile_pool = ThreadPoolExecutor(max_workers=RESOURCE_LIMITS["sanitize"],
+                                   thread_name_prefix="sanitize-cc")
+_run_pool     = ThreadPoolExecutor(max_workers=2 * RESOURCE_LIMITS["sanitize"],
+                                   thread_name_prefix="sanitize-run")
+
+_UBSAN   = re.compile(r"^(?P<file>[^:\s]+):(?P<line>\d+):\d+: runtime error: (?P<message>.+)$", re.M)
+_ASAN    = re.compile(r"^SUMMARY: AddressSanitizer: (?P<kind>[A-Za-z][\w-]*)"
+                     r"(?: (?P<file>[^\s:()]+):(?P<line>\d+))?.*?(?: in (?P<func>\w+))?$", re.M)
+_LEAK    = re.compile(r"^SUMMARY: AddressSanitizer: (?P<bytes>\d+) byte\(s\) leaked in (?P<allocs>\d+) allocation", re.M)
+
+# UBSan message prefix → short kind
+_UB_KINDS = (
+    ("signed integer overflow",   "signed-integer-overflow"),
+    ("index",                     "array-bounds"),
+    ("shift",                     "shift"),
+    ("division by zero",          "division-by-zero"),
+    ("null pointer",              "null-pointer"),
+    ("load of null",              "null-pointer"),
+    ("store to null",             "null-pointer"),
+    ("misaligned",                "misaligned-access"),
+    ("load of value",             "invalid-value"),
+    ("negation of",               "signed-integer-overflow"),
+    ("execution reached the end", "missing-return"),
+    ("variable length array",     "vla-bound"),
+)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# parse_reports
+# ─────────────────────────────────────────────────────────────────────────────
+def _ub_kind(message: str) -> str:
+    for prefix, kind in _UB_KINDS:
+        if prefix in message:
+            return kind
+    return "undefined-behavior"
+
+
+def parse_reports(stderr: str) -> dict:
+    """
+    Returns {"errors": [{"tool", "kind", "line", "message"}, ...],
+    "leaked_bytes": int} from one instrumented run's stderr.
+    """
+    errors = []
+    for m in _UBSAN.finditer(stderr):
+        message = m.group("message").strip()
+        # "store to address … with insufficient space" is UBSan seeing the
+        # same overflow ASan reports; keep ASan's more precise record
+        if "insufficient space" in message:
+            continue
+        errors.append({"tool": "ubsan", "kind": _ub_kind(message),
+                       "line": int(m.group("line")), "message": message})
+    for m in _ASAN.finditer(stderr):
+        errors.append({"tool": "asan", "kind": m.group("kind"),
+                       "line": int(m.group("line")) if m.group("line") else None,
+                       "message": f"AddressSanitizer: {m.group('kind')}"
+                                  + (f" in {m.group('func')}()" if m.group("func") else "")})
+    leaked = sum(int(m.group("bytes")) for m in _LEAK.finditer(stderr))
+    return {"errors": errors, "leaked_bytes": leaked}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ShadowBuild
+# ─────────────────────────────────────────────────────────────────────────────
+def _sanitizer_env(limits: dict) -> dict:
+    env = dict(os.environ)
+    rss = int((limits.get("memory_mb") or 0) * SANITIZER_RSS_FACTOR)
+    env["ASAN_OPTIONS"] = ":".join(filter(None, (
+        "halt_on_error=0", "detect_leaks=1", "allocator_may_return_null=1",
+        "print_legend=0", "malloc_context_size=4",
+        f"hard_rss_limit_mb={rss}" if rss else "",
+    )))
+    env["UBSAN_OPTIONS"] = "print_stacktrace=0:halt_on_error=0"
+    return env
+
+
+class ShadowBuild:
+    """
+    One submission's instrumented build. The compile starts in the
+    constructor; run() queues cases; collect() gathers what finished.
+    Always call cleanup() (it is safe while work is still running).
+    `source_path` may be a list of units (build.Project.sources), compiled
+    from `cwd` so findings name files relative to the project.
+    """
+    def __init__(self, source_path: str | list[str], cwd: str | None = None, cflags=()):
+        self.source_path = source_path
+        self.sources     = [source_path] if isinstance(source_path, str) else list(source_path)
+        self.cwd         = cwd
+        self.cflags      = list(cflags)
+        self.workdir     = tempfile.mkdtemp(prefix="shadow-")
+        self.binary      = os.path.join(self.workdir, "a.out")
+        self._runs       = []
+        self._compile    = _compile_pool.submit(self._build)
+
+    def _build(self) -> str | None:
+        try:
+            with resource_slot("sanitize"):
+                proc = subprocess.run(
+                    ["gcc", *SANITIZER_FLAGS, *self.cflags, *self.sources, "-o", self.binary],
+                    cwd=self.cwd, capture_output=True, text=True,
+                )
+        except OSError as e:
+            logger.warning(f"ShadowBuild: cannot run gcc — {e}")
+            return None
+        if proc.returncode != 0:
+            # Graded build errors are reported elsewhere; this is usually a
+            # missing libasan / libubsan on the host
+            logger.warning(f"ShadowBuild: instrumented compile failed — {proc.stderr.strip()[:200]}")
+            return None
+        return self.binary
+
+    def _run_case(self, index: int, stdin_input: str, limits: dict, env: dict,
+                  timeout: float) -> dict | None:
+        from runner import run_binary
+
+        binary = self._compile.result()
+        if binary is None:
+            return None
+        result = run_binary(binary, stdin_input, timeout=timeout, limits=limits,
+                            env=env, slot="sanitize")
+        found = parse_reports(result["stderr"])
+        found["case"] = index
+        return found
+
+    def run(self, inputs: list[str], limits: dict, timeout: float = TEST_TIMEOUT_SECONDS):
+        """Queues one instrumented run per input (non-blocking)."""
+        env = _sanitizer_env(limits)
+        shadow_limits = {
+            **limits,
+            "memory_mb":     None,   # no RLIMIT_AS / memory.max — see module docstring
+            "max_processes": None,   # LeakSanitizer forks a tracer at exit
+            "cpu_seconds":   limits["cpu_seconds"] * SANITIZER_SLOWDOWN,
+            "nice":          SANITIZER_NICE,
+        }
+        for index, stdin_input in enumerate(inputs):
+            self._runs.append(_run_pool.submit(
+                self._run_case, index, stdin_input, shadow_limits, env, timeout * SANITIZER_SLOWDOWN
+            ))
+
+    def collect(self, budget=None) -> dict:
+        """
+        Waits up to SANITIZER_GRACE_SECONDS (less if the budget is nearly
+        spent) and merges the findings of every finished run:
+          status        — "ok", "partial" (some runs unfinished) or "unavailable"
+          cases_run     — instrumented runs that finished
+          findings      — unique (tool, kind, line) errors with the cases that hit them
+          errors        — number of unique findings
+          leaked_bytes  — largest leak reported by a single run; LeakSanitizer
+                          only counts blocks no pointer reaches at exit, so
+                          memory still held by a global or main()'s locals
+                          (e.g. an unfreed malloc(16) in main) reports 0
+        """
+        timeout = SANITIZER_GRACE_SECONDS
+        if budget is not None:
+            timeout = max(0.0, min(timeout, budget.remaining() - BUDGET_RESERVE_SECONDS))
+        done, pending = wait(self._runs, timeout=timeout)
+        for future in pending:
+            future.cancel()
+
+        unique, leaked, cases_run = {}, 0, 0
+        for future in done:
+            if future.cancelled():
+                continue
+            if future.exception():
+                logger.warning(f"ShadowBuild: instrumented run failed — {future.exception()}")
+                continue
+            found = future.result()
+            if found is None:
+                continue
+            cases_run += 1
+            leaked = max(leaked, found["leaked_bytes"])
+            for err in found["errors"]:
+                key = (err["tool"], err["kind"], err["line"])
+                entry = unique.setdefault(key, {**err, "cases": []})
+                entry["cases"].append(found["case"] + 1)
+
+        if self._compile.done() and self._compile.result() is None:
+            status = "unavailable"
+        else:
+            status = "ok" if cases_run == len(self._runs) else "partial"
+        findings = sorted(unique.values(), key=lambda f: (f["line"] is None, f["line"] or 0))
+        for f in findings:
+            f["cases"] = sorted(f["cases"])
+        return {
+            "status":       status,
+            "cases_run":    cases_run,
+            "cases":        len(self._runs),
+            "findings":     findings,
+            "errors":       len(findings),
+            "leaked_bytes": leaked,
+        }
+
+    def cleanup(self, *also_remove: str):
+        """
+        Removes the instrumented binary once its compile has finished, along
+        with any directories in `also_remove` the compile reads from.
+        """
+        for future in self._runs:
+            future.cancel()
+
+        def remove(_):
+            for path in (self.workdir, *also_remove):
+                shutil.rmtree(path, ignore_errors=True)
+        self._compile.add_done_callback(remove)
+
+
+def start_shadow_build(source_path: str | list[str], budget=None, cwd: str | None = None,
+                       cflags=()) -> ShadowBuild | None:
+    """
+    Starts the instrumented compile for `source_path` in the background
+    (see ShadowBuild for multi-file projects).
+    Returns None when sanitizers are disabled or the budget / host load
+    says there is no spare capacity (recorded as degraded).
+    """
+    if not SANITIZER_ENABLED:
+        return None
+    if budget is not None and not budget.allows("sanitizer"):
+        budget.degrade("sanitizer", "Sanitizer shadow build skipped under load.")
+        return None
+    return ShadowBuild(source_path, cwd, cflags)
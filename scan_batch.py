@@ -0,0 +1,309 @@
+"""
+scan_batch.py
+Bulk ingestion of a whole-room exam scan (one PDF, many students).
+
+Usage:
+  python scan_batch.py exam.pdf --title "Sum of digits" --out exam_results \\
+      --split fixed --pages-per-student 3
+  python scan_batch.py exam.pdf --title "..." --out ... --split separator
+  python scan_batch.py exam.pdf --title "..." --out ... --split separator --marker "=== NEXT ==="
+  python scan_batch.py exam.pdf --title "..." --out ... --split cover
+
+Split modes:
+  fixed      → every N pages is one student
+  separator  → separator sheets end a student's document; a separator is a
+               page whose text layer contains --marker, or (without
+               --marker) a blank sheet
+  cover      → a cover page starts each student's document: one of its
+               first few lines matches --cover-pattern (default: a line
+               starting "Name:" or "Student name:"); the name on it is
+               used as the student name
+
+Output directory (written incrementally, safe to re-run to resume):
+  manifest.jsonl     one line per detected document (pages, student, file)
+  doc_NNN.c          OCR transcription per document
+  doc_NNN.json       full grading report per document
+  results.jsonl      one summary line per graded document, in completion order;
+                     an "error" line (failed OCR or grading) is superseded by the
+                     line a later re-run writes for that document
+  progress.json      counters for monitoring an unattended run
+
+OCR goes through ocr.py, so pages are cached and a re-run only transcribes
+pages that previously failed. A document with any failed page is not
+graded (its code would be incomplete); the re-run grades it once every
+page has been transcribed.
+"""
+
+import os
+import re
+import json
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import BATCH_OCR_DOCUMENTS, BATCH_GRADE_WORKERS
+from ocr import extract_pages, failed_pages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COVER_PATTERN = r"^\s*(?:student\s+)?name\s*[:\-]\s*(?P<name>[^\n]*)$"
+_COVER_HEAD_LINES     = 5       # non-empty lines at the top of a page searched for a cover
+_BLANK_INK_RATIO      = 0.002   # fraction of dark pixels below which a page is blank
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPERS — page inspection
+# ─────────────────────────────────────────────────────────────────────────────
+def _text_layer(doc) -> list[str]:
+    return [page.get_text() for page in doc]
+
+
+def _page_head(text: str) -> str:
+    """The first _COVER_HEAD_LINES non-empty lines — where a cover's name field sits."""
+    return "\n".join([line for line in text.splitlines() if line.strip()][:_COVER_HEAD_LINES])
+
+
+def _is_blank(page) -> bool:
+    """Cheap low-resolution ink check — no OCR needed for blank separators."""
+    import fitz  # PyMuPDF
+    pix  = page.get_pixmap(matrix=fitz.Matrix(0.25, 0.25), colorspace=fitz.csGRAY)
+    data = pix.samples
+    dark = sum(1 for b in data if b < 128)
+    return dark / max(1, len(data)) < _BLANK_INK_RATIO
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# split_documents
+# ─────────────────────────────────────────────────────────────────────────────
+def split_documents(pdf_bytes: bytes, mode: str, pages_per_student: int | None = None,
+                    marker: str | None = None, cover_pattern: str = DEFAULT_COVER_PATTERN,
+                    page_text=None) -> list[dict]:
+    """
+    Returns [{"doc": n, "pages": [...], "student": str}] with 1-based `doc`.
+
+    `page_text(indexes)` must return {index: text} for pages without a text
+    layer; it is only consulted in cover mode (scan_batch passes the OCR
+    pipeline, whose page cache makes the later transcription free).
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        n_pages = doc.page_count
+        texts   = _text_layer(doc)
+        groups  = []   # (pages, student)
+
+        if mode == "fixed":
+            if not pages_per_student or pages_per_student < 1:
+                raise ValueError("--pages-per-student is required for fixed split.")
+            for start in range(0, n_pages, pages_per_student):
+                groups.append((list(range(start, min(start + pages_per_student, n_pages))), ""))
+
+        elif mode == "separator":
+            current = []
+            for i in range(n_pages):
+                if marker:
+                    is_sep = marker in texts[i]
+                else:
+                    is_sep = _is_blank(doc[i])
+                if is_sep:
+                    if current:
+                        groups.append((current, ""))
+                    current = []
+                else:
+                    current.append(i)
+            if current:
+                groups.append((current, ""))
+
+        elif mode == "cover":
+            missing = [i for i in range(n_pages) if not texts[i].strip()]
+            if missing and page_text:
+                for i, text in page_text(missing).items():
+                    texts[i] = text
+            # Only the top of a page, line-anchored: code such as
+            # printf("Enter name: ") or p->name must not start a document
+            cover_re = re.compile(cover_pattern, re.IGNORECASE | re.MULTILINE)
+            current, student = None, ""
+            for i in range(n_pages):
+                m = cover_re.search(_page_head(texts[i]))
+                if m:
+                    if current:
+                        groups.append((current, student))
+                    current = []
+                    student = (m.groupdict().get("name") or "").strip()
+                elif current is not None:
+                    current.append(i)
+                else:
+                    logger.warning(f"split_documents: page {i + 1} precedes the first cover page; skipped.")
+            if current:
+                groups.append((current, student))
+
+        else:
+            raise ValueError(f"Unknown split mode: {mode}")
+
+    return [
+        {"doc": n, "pages": pages, "student": student or f"Student {n:03d}"}
+        for n, (pages, student) in enumerate(groups, start=1)
+    ]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INTERNAL HELPER — incremental, thread-safe output
+# ─────────────────────────────────────────────────────────────────────────────
+class _BatchOutput:
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self._lock   = threading.Lock()
+        self.progress = {
+            "pages_total": 0, "docs_total": 0,
+            "docs_transcribed": 0, "docs_graded": 0, "docs_failed": 0,
+        }
+        os.makedirs(out_dir, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.out_dir, name)
+
+    def append(self, name: str, record: dict):
+        with self._lock, open(self.path(name), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+
+    def write(self, name: str, text: str):
+        tmp = self.path(name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, self.path(name))
+
+    def bump(self, key: str, n: int = 1):
+        with self._lock:
+            self.progress[key] += n
+            self.write("progress.json", json.dumps(self.progress, indent=2))
+
+    def graded_docs(self) -> set[int]:
+        """Documents with a successful results line; error lines do not count."""
+        done = set()
+        try:
+            with open(self.path("results.jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue
+                    if "doc" in row and "error" not in row:
+                        done.add(row["doc"])
+        except OSError:
+            pass
+        return done
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# run_batch
+# ─────────────────────────────────────────────────────────────────────────────
+def run_batch(pdf_path: str, title: str, out_dir: str, mode: str = "fixed",
+              pages_per_student: int | None = None, marker: str | None = None,
+              cover_pattern: str = DEFAULT_COVER_PATTERN, grade: bool = True) -> dict:
+    """
+    Splits the scan, transcribes every document (BATCH_OCR_DOCUMENTS at a
+    time) and queues each transcription for grading (BATCH_GRADE_WORKERS at a
+    time) as soon as it is ready. Returns the final progress counters.
+    """
+    from llm import configured, gemini_transcribe_page
+    from ast_generator import warm_parser
+    if not configured("ocr"):
+        raise RuntimeError("Gemini API not configured. Cannot perform OCR extraction.")
+
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    file_name = os.path.basename(pdf_path)
+    out = _BatchOutput(out_dir)
+
+    def page_text(indexes):
+        return extract_pages(pdf_bytes, file_name, gemini_transcribe_page, indexes)
+
+    docs = split_documents(pdf_bytes, mode, pages_per_student, marker, cover_pattern, page_text)
+    logger.info(f"run_batch: {len(docs)} document(s) detected in {file_name}.")
+
+    out.write("manifest.jsonl", "".join(
+        json.dumps({**d, "source": f"doc_{d['doc']:03d}.c"}) + "\n" for d in docs
+    ))
+    out.progress["pages_total"] = sum(len(d["pages"]) for d in docs)
+    out.progress["docs_total"]  = len(docs)
+    already = out.graded_docs()
+    out.progress["docs_graded"] = len(already)
+    out.bump("docs_transcribed", 0)
+
+    def grade_one(d: dict, code: str):
+        from orchestrator import grade_submission
+        try:
+            report = grade_submission(title, code, d["student"])
+        except Exception as e:
+            logger.error(f"run_batch: grading doc {d['doc']} failed — {e}")
+            out.append("results.jsonl", {"doc": d["doc"], "student": d["student"], "error": str(e)})
+            out.bump("docs_failed")
+            return
+        out.write(f"doc_{d['doc']:03d}.json", json.dumps(report, indent=2, default=str))
+        out.append("results.jsonl", {
+            "doc":         d["doc"],
+            "student":     d["student"],
+            "compiled":    report.get("compiled", False),
+            "total_score": report.get("total_score", 0),
+        })
+        out.bump("docs_graded")
+
+    grade_pool = ThreadPoolExecutor(max_workers=BATCH_GRADE_WORKERS, initializer=warm_parser)
+
+    def transcribe_one(d: dict):
+        texts  = extract_pages(pdf_bytes, file_name, gemini_transcribe_page, d["pages"])
+        code   = "\n".join(t for t in texts.values() if t.strip()).strip()
+        failed = failed_pages(texts)
+        out.write(f"doc_{d['doc']:03d}.c", code + "\n")
+        if failed:
+            pages = ", ".join(str(i + 1) for i in failed)
+            logger.warning(f"run_batch: doc {d['doc']} not graded — OCR failed on page(s) {pages}; "
+                           f"re-run to retry.")
+            if d["doc"] not in already:
+                out.append("results.jsonl", {"doc": d["doc"], "student": d["student"],
+                                             "error": f"OCR failed on page(s) {pages}"})
+            out.bump("docs_failed")
+            return
+        out.bump("docs_transcribed")
+        if grade and d["doc"] not in already:
+            grade_pool.submit(grade_one, d, code)
+
+    try:
+        with ThreadPoolExecutor(max_workers=BATCH_OCR_DOCUMENTS) as ocr_pool:
+            for future in [ocr_pool.submit(transcribe_one, d) for d in docs]:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"run_batch: transcription failed — {e}")
+                    out.bump("docs_failed")
+    finally:
+        grade_pool.shutdown(wait=True)
+
+    logger.info(f"run_batch: finished — {out.progress}")
+    return out.progress
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk OCR + grading of a multi-student exam scan.")
+    ap.add_argument("pdf")
+    ap.add_argument("--title", required=True, help="Program title / problem description")
+    ap.add_argument("--out", required=True, help="Output directory")
+    ap.add_argument("--split", choices=["fixed", "separator", "cover"], default="fixed")
+    ap.add_argument("--pages-per-student", type=int)
+    ap.add_argument("--marker", help="Separator text (separator mode); blank sheets if omitted")
+    ap.add_argument("--cover-pattern", default=DEFAULT_COVER_PATTERN,
+                    help="Regex matched (multi-line) against the first lines of each page to find "
+                         "cover pages; a 'name' group sets the student name")
+    ap.add_argument("--no-grade", action="store_true", help="Only transcribe")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    run_batch(args.pdf, args.title, args.out, args.split, args.pages_per_student,
+              args.marker, args.cover_pattern, grade=not args.no_grade)
+
+
+if __name__ == "__main__":
+    main()
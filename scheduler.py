@@ -0,0 +1,194 @@
+"""
+scheduler.py
+Process-wide admission control and resource-class limits.
+
+Functions:
+  resource_slot(kind)          → context manager holding one "compile" / "exec" / "llm" slot
+
+Classes:
+  FairScheduler                → per-student round-robin admission queue with positions / ETA
+
+Objects:
+  SCHEDULER                    → the process-wide FairScheduler (SCHEDULER_MAX_ACTIVE)
+
+Every Streamlit session, server job and batch worker in a process shares
+these limits. A submission first waits for admission (`SCHEDULER.admit`),
+then each gcc, student-binary or LLM call inside it takes a slot of its
+resource class. Slots are re-entrant per thread, so a compile that runs
+gcc twice (compile + diagnostics) holds one slot.
+"""
+
+import math
+import time
+import logging
+import threading
+import itertools
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from config import SCHEDULER_MAX_ACTIVE, RESOURCE_LIMITS, SCHEDULER_INITIAL_ESTIMATE
+
+logger = logging.getLogger(__name__)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Resource classes
+# ─────────────────────────────────────────────────────────────────────────────
+_semaphores = {kind: threading.BoundedSemaphore(n) for kind, n in RESOURCE_LIMITS.items()}
+_held = threading.local()
+
+
+@contextmanager
+def resource_slot(kind: str):
+    """Holds one slot of resource class `kind` for the duration of the block."""
+    held = getattr(_held, "kinds", None)
+    if held is None:
+        held = _held.kinds = set()
+    if kind in held:
+        yield
+        return
+
+    sem = _semaphores[kind]
+    if not sem.acquire(blocking=False):
+        start = time.perf_counter()
+        sem.acquire()
+        logger.debug(f"resource_slot: waited {time.perf_counter() - start:.2f}s for {kind}")
+    held.add(kind)
+    try:
+        yield
+    finally:
+        held.discard(kind)
+        sem.release()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# FairScheduler
+# ─────────────────────────────────────────────────────────────────────────────
+class Ticket:
+    __slots__ = ("id", "student", "enqueued", "granted")
+
+    def __init__(self, ticket_id: int, student: str):
+        self.id       = ticket_id
+        self.student  = student
+        self.enqueued = time.time()
+        self.granted  = False
+
+
+class FairScheduler:
+    """
+    Admits at most `max_active` submissions at once. Waiting submissions are
+    granted round-robin across students — one per student per round — so a
+    student who submits twenty times waits behind everyone else's first one.
+    """
+    def __init__(self, max_active: int = SCHEDULER_MAX_ACTIVE,
+                 initial_estimate: float = SCHEDULER_INITIAL_ESTIMATE):
+        self.max_active = max(1, max_active)
+        self._queues    = OrderedDict()     # student → deque[Ticket], in round-robin order
+        self._active    = 0
+        self._avg       = initial_estimate  # EWMA of submission durations
+        self._ids       = itertools.count(1)
+        self._cond      = threading.Condition()
+
+    # ── queue mechanics (caller holds self._cond) ────────────────────────────
+    def _grant(self):
+        while self._active < self.max_active and self._queues:
+            student, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            del self._queues[student]
+            if queue:
+                self._queues[student] = queue      # back of the round
+            ticket.granted = True
+            self._active  += 1
+        self._cond.notify_all()
+
+    def _order(self) -> list[Ticket]:
+        """Waiting tickets in the order they will be granted."""
+        queues = [list(q) for q in self._queues.values()]
+        rounds = itertools.zip_longest(*queues)
+        return [t for rnd in rounds for t in rnd if t is not None]
+
+    # ── public API ───────────────────────────────────────────────────────────
+    def position(self, ticket: Ticket) -> int:
+        """1-based place in the queue, 0 once admitted."""
+        with self._cond:
+            if ticket.granted:
+                return 0
+            return next((i + 1 for i, t in enumerate(self._order()) if t is ticket), 0)
+
+    def eta(self, position: int) -> float:
+        """Rough seconds until a ticket at `position` is admitted."""
+        if position <= 0:
+            return 0.0
+        return math.ceil(position / self.max_active) * self._avg
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active":     self._active,
+                "waiting":    sum(len(q) for q in self._queues.values()),
+                "students":   len(self._queues),
+                "max_active": self.max_active,
+                "avg_seconds": round(self._avg, 1),
+            }
+
+    def enter(self, student: str, on_wait=None, poll: float = 1.0) -> Ticket:
+        """
+        Blocks until admitted. `on_wait(position, eta_seconds)` is called
+        from the waiting thread about every `poll` seconds (e.g. to update a
+        Streamlit placeholder). Pair with leave(), or use admit().
+        """
+        with self._cond:
+            ticket = Ticket(next(self._ids), student or "anonymous")
+            self._queues.setdefault(ticket.student, deque()).append(ticket)
+            self._grant()
+            try:
+                while not ticket.granted:
+                    if on_wait:
+                        pos = next((i + 1 for i, t in enumerate(self._order()) if t is ticket), 0)
+                        self._cond.release()
+                        try:
+                            on_wait(pos, self.eta(pos))
+                        finally:
+                            self._cond.acquire()
+                        if ticket.granted:
+                            break
+                    self._cond.wait(poll)
+            except BaseException:
+                # Session went away (rerun, disconnect) while queued
+                self.leave(ticket)
+                raise
+        waited = time.time() - ticket.enqueued
+        if waited > 1:
+            logger.info(f"FairScheduler: {ticket.student} admitted after {waited:.1f}s in queue.")
+        ticket.enqueued = time.time()    # now the start of the graded run
+        return ticket
+
+    def leave(self, ticket: Ticket):
+        with self._cond:
+            if not ticket.granted:
+                # Abandoned while waiting
+                queue = self._queues.get(ticket.student)
+                if queue and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[ticket.student]
+                return
+            duration   = time.time() - ticket.enqueued
+            self._avg  = 0.8 * self._avg + 0.2 * duration
+            self._active -= 1
+            ticket.granted = False
+            self._grant()
+
+    @contextmanager
+    def admit(self, student: str, on_wait=None):
+        """`with SCHEDULER.admit(name): ...` — enter() / leave() around the block."""
+        ticket = None
+        try:
+            ticket = self.enter(student, on_wait)
+            yield ticket
+        finally:
+            if ticket is not None:
+                self.leave(ticket)
+
+
+SCHEDULER = FairScheduler()
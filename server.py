@@ -0,0 +1,310 @@
+"""
+server.py
+Standalone HTTP grading service (no Streamlit session needed).
+
+Endpoints:
+  POST /jobs                 {"title", "source", "student"?, "timeout"?} → 202 {"job_id", ...}
+                             "source" is C text, or {relative path: text} for a multi-file program
+                             429 + Retry-After when SERVER_MAX_QUEUE jobs are running / waiting
+  GET  /jobs/<id>[?wait=s]   job status; `wait` long-polls up to s seconds for completion
+  GET  /jobs/<id>/report     the JSON report (409 until the job is done)
+  GET  /jobs/<id>/pdf        the PDF report (409 until the job is done)
+  GET  /health               worker / queue counters
+
+Usage:
+  python server.py [--host 127.0.0.1] [--port 8765] [--workers 4]
+
+  curl -s localhost:8765/jobs -d '{"title": "Sum of digits", "source": "int main(){...}"}'
+  curl -s 'localhost:8765/jobs/<id>?wait=30'
+
+Jobs run on a bounded pool of SERVER_WORKERS threads through
+orchestrator.grade_submission(). Admission is non-blocking: when running
+plus waiting jobs reach SERVER_MAX_QUEUE the service answers 429 instead
+of queueing without bound. Each job has a timeout (SERVER_JOB_TIMEOUT or
+the request's "timeout"); a job past it is reported as "timeout". Job
+state is in memory and finished jobs expire after SERVER_JOB_TTL.
+"""
+
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    SERVER_HOST, SERVER_PORT, SERVER_TOKEN, SERVER_WORKERS, SERVER_MAX_QUEUE,
+    SERVER_JOB_TIMEOUT, SERVER_REQUEST_TIMEOUT, SERVER_MAX_BODY_BYTES, SERVER_JOB_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+_MAX_WAIT = 60     # upper bound for ?wait= long-polling
+_FINISHED = ("done", "failed", "timeout")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# JobManager — bounded pool + in-memory job table
+# ─────────────────────────────────────────────────────────────────────────────
+class JobManager:
+    def __init__(self, workers: int = SERVER_WORKERS, max_queue: int = SERVER_MAX_QUEUE):
+        from ast_generator import warm_parser
+
+        self.workers   = workers
+        self.max_queue = max(max_queue, workers)
+        self._slots    = threading.BoundedSemaphore(self.max_queue)
+        self._pool     = ThreadPoolExecutor(max_workers=workers, initializer=warm_parser,
+                                            thread_name_prefix="grader")
+        self._jobs     = {}
+        self._lock     = threading.Lock()
+        self._changed  = threading.Condition(self._lock)
+
+    # ── submission ───────────────────────────────────────────────────────────
+    def submit(self, title: str, source: str | dict, student: str = "",
+               timeout: float = SERVER_JOB_TIMEOUT) -> dict | None:
+        """Returns the new job, or None when the service is saturated."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        now = time.time()
+        job = {
+            "job_id":   uuid.uuid4().hex,
+            "status":   "queued",
+            "title":    title,
+            "student":  student,
+            "created":  now,
+            "deadline": now + timeout,
+            "started":  None,
+            "finished": None,
+            "error":    None,
+            "report":   None,
+        }
+        with self._lock:
+            self._expire(now)
+            self._jobs[job["job_id"]] = job
+        self._pool.submit(self._run, job, source)
+        return job
+
+    def _run(self, job: dict, source: str | dict):
+        from budget import Budget
+        from orchestrator import grade_submission
+
+        try:
+            with self._lock:
+                if time.time() > job["deadline"]:
+                    self._finish(job, "timeout", error="Timed out while waiting for a worker.")
+                    return
+                job["status"], job["started"] = "running", time.time()
+            # Stages see the job deadline, so optional work is skipped before it passes
+            report = grade_submission(job["title"], source, job["student"],
+                                      Budget(deadline=job["deadline"]))
+            with self._lock:
+                if time.time() > job["deadline"]:
+                    self._finish(job, "timeout", error="Grading exceeded the job timeout.")
+                else:
+                    job["report"] = report
+                    self._finish(job, "done")
+        except Exception as e:
+            logger.exception(f"server: job {job['job_id']} failed")
+            with self._lock:
+                self._finish(job, "failed", error=str(e))
+        finally:
+            self._slots.release()
+
+    def _finish(self, job: dict, status: str, error: str | None = None):
+        # Caller holds self._lock
+        job["status"], job["finished"], job["error"] = status, time.time(), error
+        self._changed.notify_all()
+
+    def _expire(self, now: float):
+        # Caller holds self._lock
+        stale = [jid for jid, j in self._jobs.items()
+                 if j["finished"] and now - j["finished"] > SERVER_JOB_TTL]
+        for jid in stale:
+            del self._jobs[jid]
+
+    # ── queries ──────────────────────────────────────────────────────────────
+    def get(self, job_id: str, wait: float = 0) -> dict | None:
+        end = time.time() + min(max(wait, 0), _MAX_WAIT)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            while job and job["status"] not in _FINISHED:
+                now = time.time()
+                if now > job["deadline"] and job["status"] == "running":
+                    # Worker thread still busy; report the timeout without waiting for it
+                    return {**job, "status": "timeout", "error": "Grading exceeded the job timeout."}
+                remaining = min(end, job["deadline"]) - now
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return dict(job) if job else None
+
+    def status(self, job: dict) -> dict:
+        out = {k: job[k] for k in ("job_id", "status", "title", "student", "created",
+                                   "started", "finished", "error")}
+        if job["report"] is not None:
+            out["compiled"]    = job["report"].get("compiled", False)
+            out["total_score"] = job["report"].get("total_score", 0)
+        return out
+
+    def pdf(self, job: dict) -> bytes:
+        from utils import pdf_bytes
+
+        return pdf_bytes(job["report"], student_name=job["student"])
+
+    def health(self) -> dict:
+        with self._lock:
+            counts = {}
+            for j in self._jobs.values():
+                counts[j["status"]] = counts.get(j["status"], 0) + 1
+        return {"workers": self.workers, "max_queue": self.max_queue, "jobs": counts}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# HTTP handler
+# ─────────────────────────────────────────────────────────────────────────────
+class GradingHandler(BaseHTTPRequestHandler):
+    server_version = "CAutograder/1.0"
+    timeout        = SERVER_REQUEST_TIMEOUT     # socket timeout per request
+    manager: JobManager = None                  # set by make_server()
+
+    def log_message(self, fmt, *args):
+        logger.info(f"{self.address_string()} {fmt % args}")
+
+    # ── response helpers ─────────────────────────────────────────────────────
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self._send(status, body, "application/json", headers)
+
+    def _error(self, status: int, message: str, headers: dict | None = None):
+        self._json(status, {"error": message}, headers)
+
+    def _authorized(self) -> bool:
+        if not SERVER_TOKEN:
+            return True
+        if self.headers.get("Authorization", "") == f"Bearer {SERVER_TOKEN}":
+            return True
+        self._error(HTTPStatus.UNAUTHORIZED, "Missing or invalid bearer token.")
+        return False
+
+    def _job_or_404(self, job_id: str, wait: float = 0) -> dict | None:
+        job = self.manager.get(job_id, wait)
+        if job is None:
+            self._error(HTTPStatus.NOT_FOUND, f"Unknown job {job_id}.")
+        return job
+
+    # ── routes ───────────────────────────────────────────────────────────────
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self._error(HTTPStatus.NOT_FOUND, "Not found.")
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > SERVER_MAX_BODY_BYTES:
+            return self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"Body exceeds {SERVER_MAX_BODY_BYTES} bytes.")
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            title   = str(payload["title"]).strip()
+            source  = payload["source"]
+            if isinstance(source, dict):
+                source = {str(name): str(text) for name, text in source.items()}
+            else:
+                source = str(source)
+            student = str(payload.get("student", "")).strip()
+            timeout = float(payload.get("timeout", SERVER_JOB_TIMEOUT))
+        except (ValueError, KeyError, TypeError) as e:
+            return self._error(HTTPStatus.BAD_REQUEST,
+                               f"Expected JSON with 'title' and 'source' ({e}).")
+        if not title or not (source if isinstance(source, dict) else source.strip()):
+            return self._error(HTTPStatus.BAD_REQUEST, "'title' and 'source' must be non-empty.")
+
+        job = self.manager.submit(title, source, student, min(max(timeout, 1), SERVER_JOB_TIMEOUT))
+        if job is None:
+            return self._error(HTTPStatus.TOO_MANY_REQUESTS,
+                               "Grading queue is full; retry later.", {"Retry-After": "5"})
+        self._json(HTTPStatus.ACCEPTED, {
+            "job_id":     job["job_id"],
+            "status":     job["status"],
+            "status_url": f"/jobs/{job['job_id']}",
+        }, {"Location": f"/jobs/{job['job_id']}"})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url   = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts == ["health"]:
+            return self._json(HTTPStatus.OK, self.manager.health())
+        if len(parts) not in (2, 3) or parts[0] != "jobs":
+            return self._error(HTTPStatus.NOT_FOUND, "Not found.")
+
+        try:
+            wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+        except ValueError:
+            wait = 0
+        job = self._job_or_404(parts[1], wait if len(parts) == 2 else 0)
+        if job is None:
+            return
+
+        if len(parts) == 2:
+            return self._json(HTTPStatus.OK, self.manager.status(job))
+        if job["status"] != "done":
+            return self._error(HTTPStatus.CONFLICT, f"Job is {job['status']}; no report available.")
+        if parts[2] == "report":
+            return self._json(HTTPStatus.OK, job["report"])
+        if parts[2] == "pdf":
+            if not job["report"].get("compiled", False):
+                return self._error(HTTPStatus.CONFLICT, "Submission did not compile; no PDF report.")
+            return self._send(HTTPStatus.OK, self.manager.pdf(job), "application/pdf", {
+                "Content-Disposition": f'attachment; filename="report_{job["job_id"]}.pdf"'
+            })
+        self._error(HTTPStatus.NOT_FOUND, "Not found.")
+
+
+def make_server(host: str = SERVER_HOST, port: int = SERVER_PORT,
+                workers: int = SERVER_WORKERS, max_queue: int = SERVER_MAX_QUEUE) -> ThreadingHTTPServer:
+    """Builds (but does not start) the service; port 0 picks a free port."""
+    handler = type("Handler", (GradingHandler,), {"manager": JobManager(workers, max_queue)})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run the C autograder HTTP service.")
+    ap.add_argument("--host", default=SERVER_HOST)
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    ap.add_argument("--max-queue", type=int, default=SERVER_MAX_QUEUE)
+    args = ap.parse_args(argv)
+
+    httpd = make_server(args.host, args.port, args.workers, args.max_queue)
+    logger.info(f"Grading service on http://{args.host}:{httpd.server_port} "
+                f"({args.workers} workers, queue {args.max_queue}).")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+    main()
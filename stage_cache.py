@@ -0,0 +1,107 @@
+"""
+stage_cache.py
+Per-stage results keyed by exactly the inputs each stage reads.
+
+Functions:
+  binary_hash(path)                        → sha256 of what a binary executes (symbols, build-id stripped)
+  cached_stage(stage, parts, compute, ...) → (value, reused) — compute() only on a key miss
+  peek(stage, parts)                       → stored value or None, without computing
+
+A resubmission recomputes only the stages whose inputs changed:
+
+  stage         key
+  design        source text, design rubric
+  inputs        stripped binary, title
+  tests         stripped binary, inputs, sandbox limits, tests rubric
+  timing        stripped binary
+  performance   source text, timing, performance rubric
+  sanitizer     source text, inputs (findings carry source line numbers)
+  optimization  source text, sanitizer result, optimization rubric
+  static        cppcheck report, static rubric
+  report        the aggregated report data (the prompt)
+
+gcc writes the temp file name into the symbol table and a build-id derived
+from it, so the raw binary differs on every upload; binary_hash() hashes a
+stripped copy instead. A comment-only edit therefore leaves "inputs",
+"tests" and "timing" untouched and no test case is executed again.
+
+Values are stored in DiskCache("stages"). A stage that degraded the budget
+(generic inputs, templated report, ...) is not stored, so a reduced result
+is never reused once the system has capacity again. Nor are wall-clock
+results that load can distort: "tests" with a timeout, limit kill or
+truncated output, and a "timing" run that failed (orchestrator.py).
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+import subprocess
+
+from cache import DiskCache, content_hash
+from config import STAGE_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Bump when an agent's output format or logic changes
+_VERSION = 1
+
+_store = DiskCache("stages")
+
+
+def binary_hash(path: str) -> str:
+    """
+    sha256 of `path` without symbols and build-id (objcopy --strip-all), so
+    two compiles of equivalent code from different temp files match. Falls
+    back to the raw file when objcopy is unavailable.
+    """
+    with tempfile.TemporaryDirectory(prefix="stage-") as tmp:
+        stripped = os.path.join(tmp, "a.out")
+        try:
+            proc = subprocess.run(
+                ["objcopy", "--strip-all", "--remove-section=.note.gnu.build-id", path, stripped],
+                capture_output=True,
+            )
+            target = stripped if proc.returncode == 0 else path
+        except OSError:
+            target = path
+        h = hashlib.sha256()
+        with open(target, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+
+def peek(stage: str, parts: tuple):
+    """The stored value for these inputs, or None."""
+    if not STAGE_CACHE_ENABLED:
+        return None
+    return _store.get(content_hash(stage, _VERSION, *parts))
+
+
+def cached_stage(stage: str, parts: tuple, compute, budget=None, store_if=None):
+    """
+    Returns (value, reused). `parts` are everything the stage reads (str,
+    bytes or JSON-able values). The computed value is stored unless the
+    budget degraded while computing it or `store_if(value)` says no.
+    """
+    if not STAGE_CACHE_ENABLED:
+        return compute(), False
+
+    key    = content_hash(stage, _VERSION, *parts)
+    cached = _store.get(key)
+    if cached is not None:
+        logger.info(f"stage_cache: {stage} reused ({key[:12]})")
+        return cached, True
+
+    degraded = len(budget.degraded) if budget is not None else 0
+    value    = compute()
+    if budget is not None and len(budget.degraded) > degraded:
+        return value, False
+    if store_if is not None and not store_if(value):
+        return value, False
+    try:
+        _store.set(key, value)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"stage_cache: {stage} result is not serialisable ({e}); not stored")
+    return value, False
@@ -4,15 +4,26 @@ Utility functions for the C Autograder system.
 
 Functions:
   compile_c_code(src)   → Compiles C source with gcc
-  run_cppcheck(src)     → Runs cppcheck static analysis
+  run_cppcheck(src)     → Runs cppcheck static analysis (a file or a project directory)
   generate_pdf(report)  → Produces a fully formatted academic PDF report
+  pdf_bytes(report)     → The same PDF as bytes, cached per report hash
 """
 
 import subprocess
 import os
+import io
+import json
+import hashlib
 import tempfile
 import datetime
 import re
+import threading
+from collections import OrderedDict
+
+from diagnostics import collect_diagnostics
+from scheduler import resource_slot
+from config import PDF_CACHE_ENTRIES
+from profiling import profile_calls
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -20,26 +31,33 @@ import re
 # ─────────────────────────────────────────────────────────────────────────────
 def compile_c_code(src: str) -> dict:
     bin_path = src[:-2]
-    proc = subprocess.run(
-        ["gcc", src, "-o", bin_path],
-        capture_output=True, text=True
-    )
-    return {
-        "success": proc.returncode == 0,
-        "errors":  proc.stderr,
-        "binary":  bin_path
-    }
+    with resource_slot("compile"):
+        proc = subprocess.run(
+            ["gcc", src, "-o", bin_path],
+            capture_output=True, text=True
+        )
+        success = proc.returncode == 0
+        return {
+            "success":     success,
+            "errors":      proc.stderr,
+            "binary":      bin_path,
+            # Structured diagnostics feed the error-signature cache (llm.py)
+            "diagnostics": None if success else collect_diagnostics(src)
+        }
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # STATIC ANALYSIS
 # ─────────────────────────────────────────────────────────────────────────────
-def run_cppcheck(src: str) -> str:
+def run_cppcheck(src: str, cwd: str | None = None) -> str:
+    # A project directory is checked from inside, so the report names
+    # files relative to it (build.Project.root)
     try:
-        proc = subprocess.run(
-            ["cppcheck", "--enable=all", src],
-            stderr=subprocess.PIPE, text=True
-        )
+        with resource_slot("compile"):
+            proc = subprocess.run(
+                ["cppcheck", "--enable=all", src],
+                cwd=cwd, stderr=subprocess.PIPE, text=True
+            )
         return proc.stderr
     except Exception:
         return "cppcheck not installed."
@@ -48,7 +66,13 @@ def run_cppcheck(src: str) -> str:
 # ─────────────────────────────────────────────────────────────────────────────
 # PDF GENERATION  — fully redesigned
 # ─────────────────────────────────────────────────────────────────────────────
-def generate_pdf(report: dict, student_name: str = "") -> str:
+@profile_calls("generate_pdf")
+def generate_pdf(report: dict, student_name: str = "", output=None):
+    """
+    Builds the report PDF into `output` — a path or a binary file object —
+    and returns it. By default a new unique temp file is created; the
+    caller owns (and should delete) it.
+    """
     from reportlab.lib.pagesizes import A4
     from reportlab.lib import colors
     from reportlab.lib.units import mm, cm
@@ -59,10 +83,10 @@ def generate_pdf(report: dict, student_name: str = "") -> str:
         HRFlowable, KeepTogether, PageBreak
     )
 
-    path = (
-        f"{tempfile.gettempdir()}/"
-        f"C_Autograder_Report_{int(datetime.datetime.now().timestamp())}.pdf"
-    )
+    if output is None:
+        fd, output = tempfile.mkstemp(prefix="C_Autograder_Report_", suffix=".pdf")
+        os.close(fd)
+    path = output
 
     PAGE_W, PAGE_H = A4
     MARGIN = 2 * cm
@@ -615,3 +639,38 @@ def generate_pdf(report: dict, student_name: str = "") -> str:
 
     doc.build(E)
     return path
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PDF BYTES — built on demand, cached per report hash
+# ─────────────────────────────────────────────────────────────────────────────
+_pdf_cache = OrderedDict()
+_pdf_cache_lock = threading.Lock()
+
+
+def report_hash(report: dict, student_name: str = "") -> str:
+    blob = json.dumps([report, student_name], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def pdf_bytes(report: dict, student_name: str = "") -> bytes:
+    """
+    The report PDF as bytes, built in memory (no temp file). The last
+    PDF_CACHE_ENTRIES documents are kept, so repeated downloads and UI
+    reruns of the same report never rebuild it.
+    """
+    key = report_hash(report, student_name)
+    with _pdf_cache_lock:
+        if key in _pdf_cache:
+            _pdf_cache.move_to_end(key)
+            return _pdf_cache[key]
+
+    buf = io.BytesIO()
+    generate_pdf(report, student_name=student_name, output=buf)
+    data = buf.getvalue()
+
+    with _pdf_cache_lock:
+        _pdf_cache[key] = data
+        while len(_pdf_cache) > PDF_CACHE_ENTRIES:
+            _pdf_cache.popitem(last=False)
+    return data